@@ -0,0 +1,213 @@
+"""
+article_store.py
+Tracks the stored article set and works out which crawled articles are new or changed.
+Articles are kept in one JSON file per publish day (Singapore time), so retention
+deletes whole days and readers only open the days they need.
+"""
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track the click and never change the article:
+# any utm_* parameter, and these exact names ('ref', but not 'reference')
+TRACKING_PARAM_PREFIXES = ('utm_',)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'cid', 'ref'}
+
+def canonical_url(url):
+    """
+    Normalize an article URL so the same story always maps to the same key:
+    lowercase scheme/host, no fragment, no tracking parameters, no trailing slash.
+    """
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not (k.lower().startswith(TRACKING_PARAM_PREFIXES) or k.lower() in TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+def article_key(article):
+    return canonical_url(article.get('url')) or article.get('title', '')
+
+def content_hash(article):
+    """Hash of the fields that feed sentiment/Gemini analysis (title and content)."""
+    text = f"{article.get('title', '')}\n{article.get('content', '')}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+SGT = timezone(timedelta(hours=8), 'SGT')
+LATEST_ARTICLES_DIR = 'latest_articles'
+ANALYZED_ARTICLES_DIR = 'articles_with_sentiment'
+RETENTION_DAYS = 3
+PARTITION_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2})\.json$')
+
+def normalize_timestamp(value, default=None):
+    """
+    Parse an RSS (RFC 2822) or ISO 8601 timestamp and return it as ISO 8601 in
+    Singapore time. Naive timestamps are taken as local time. Anything that
+    cannot be parsed becomes `default` (now, if not given).
+    """
+    dt = None
+    if isinstance(value, datetime):
+        dt = value
+    elif value:
+        text = str(value).strip()
+        try:
+            dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            try:
+                dt = parsedate_to_datetime(text)
+            except (TypeError, ValueError):
+                dt = None
+    if dt is None:
+        dt = default or datetime.now(SGT)
+    return dt.astimezone(SGT).isoformat()
+
+def normalize_article(article):
+    """Return a copy of the article with its timestamp normalized (done once, at ingest)."""
+    return {**article, 'timestamp': normalize_timestamp(article.get('timestamp'))}
+
+def partition_of(article):
+    """Publish day 'YYYY-MM-DD' (Singapore time) of a normalized article."""
+    timestamp = article.get('timestamp') or ''
+    if re.match(r'^\d{4}-\d{2}-\d{2}T.*\+08:00$', timestamp):
+        return timestamp[:10]
+    return normalize_timestamp(timestamp)[:10]
+
+def today_sgt():
+    return datetime.now(SGT).date()
+
+def load_articles(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return []
+
+def save_articles(articles, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(articles, f, ensure_ascii=False, indent=2)
+
+def diff_articles(crawled, stored):
+    """
+    Compare freshly crawled articles against the stored set.
+    Returns (new, changed, unchanged): new and changed are the crawled articles
+    (tagged with 'content_hash') that need processing, unchanged are the stored,
+    already processed versions of the rest. Duplicate crawled URLs are dropped.
+    """
+    stored_by_key = {article_key(a): a for a in stored}
+    new, changed, unchanged = [], [], []
+    seen = set()
+    for article in crawled:
+        key = article_key(article)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        article = {**article, 'content_hash': content_hash(article)}
+        previous = stored_by_key.get(key)
+        if previous is None:
+            new.append(article)
+        elif previous.get('content_hash', content_hash(previous)) != article['content_hash']:
+            changed.append(article)
+        else:
+            unchanged.append(previous)
+    return new, changed, unchanged
+
+def merge_articles(stored, updates):
+    """Merge updated articles into the stored set by canonical URL, keeping stored order."""
+    merged = {article_key(a): a for a in stored}
+    for article in updates:
+        merged[article_key(article)] = article
+    return list(merged.values())
+
+class PartitionedArticleStore:
+    """
+    Articles stored as <root>/YYYY-MM-DD.json, one file per publish day in
+    Singapore time. Saving rewrites only the days that received articles, and
+    prune() drops expired days by deleting their files. An article already
+    stored in a recent day is updated there rather than duplicated into a new
+    day (sources without publish dates are stamped with the crawl time).
+    On first open a legacy single-file JSON store is split into days.
+    """
+
+    def __init__(self, root, legacy_json=None):
+        self.root = root
+        if not os.path.isdir(root):
+            os.makedirs(root, exist_ok=True)
+            if legacy_json and os.path.exists(legacy_json):
+                legacy = load_articles(legacy_json)
+                self.save([normalize_article(a) for a in legacy])
+                print(f"Split {len(legacy)} articles from {legacy_json} into daily partitions in {root}/.")
+
+    def _path(self, day):
+        return os.path.join(self.root, f'{day}.json')
+
+    def days(self):
+        """Stored partition days, oldest first."""
+        days = []
+        for name in os.listdir(self.root):
+            match = PARTITION_PATTERN.match(name)
+            if match:
+                days.append(match.group(1))
+        return sorted(days)
+
+    def recent_days(self, window=RETENTION_DAYS, today=None):
+        """Stored days within `window` days before `today` (inclusive)."""
+        today = today or today_sgt()
+        cutoff = (today - timedelta(days=window)).isoformat()
+        return [day for day in self.days() if day >= cutoff]
+
+    def load_day(self, day):
+        return load_articles(self._path(str(day)))
+
+    def load(self, days=None):
+        """Articles of the given days (all stored days if None), oldest day first."""
+        articles = []
+        for day in (self.days() if days is None else days):
+            articles.extend(self.load_day(day))
+        return articles
+
+    def load_today(self):
+        return self.load_day(today_sgt().isoformat())
+
+    def save(self, articles, days=None):
+        """
+        Merge normalized articles into their day partitions. Articles whose key is
+        already stored in one of `days` (default: the recent days) stay in that day.
+        Returns the days that were rewritten.
+        """
+        existing = {}
+        for day in (self.recent_days() if days is None else days):
+            for article in self.load_day(day):
+                existing.setdefault(article_key(article), day)
+        by_day = {}
+        for article in articles:
+            day = existing.get(article_key(article)) or partition_of(article)
+            by_day.setdefault(day, []).append(article)
+        for day, updates in by_day.items():
+            merged = merge_articles(self.load_day(day), updates)
+            # A unique temp file, so concurrent writers never share (or replace) each other's
+            fd, tmp_path = tempfile.mkstemp(prefix=f'.{day}.', suffix='.tmp', dir=self.root)
+            os.close(fd)
+            try:
+                save_articles(merged, tmp_path)
+                os.replace(tmp_path, self._path(day))
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return sorted(by_day)
+
+    def prune(self, retention_days=RETENTION_DAYS, today=None):
+        """Delete partitions older than `retention_days` days; returns the removed days."""
+        keep = set(self.recent_days(retention_days, today))
+        removed = [day for day in self.days() if day not in keep]
+        for day in removed:
+            os.remove(self._path(day))
+        return removed
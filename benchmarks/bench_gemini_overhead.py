@@ -0,0 +1,68 @@
+"""
+bench_gemini_overhead.py
+Micro-benchmark of the per-article setup that GeminiAnalyzer and the module-level
+emoji normalizer remove: rebuilding the emoji pattern/mapping on every call and,
+when google-generativeai is installed, configuring a new client and model.
+
+Usage: python benchmarks/bench_gemini_overhead.py [iterations]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import map_visualization
+
+SAMPLES = ['😊', 'happy', 'neutral face (😐)', 'traffic jam', 'celebration']
+
+def legacy_map_to_emoji(emoji_value):
+    """The previous normalizer: defined per call, pattern and mapping rebuilt every time."""
+    def map_to_emoji(emoji_value):
+        if not emoji_value:
+            return None
+        emoji_pattern = re.compile(
+            r"[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF"
+            r"\U00002700-\U000027BF\U0001F900-\U0001F9FF\U00002600-\U000026FF\U0001FA70-\U0001FAFF]+",
+            flags=re.UNICODE)
+        if emoji_pattern.fullmatch(str(emoji_value).strip()):
+            return emoji_value.strip()
+        mapping = dict(map_visualization.EMOJI_MAPPING)
+        val = str(emoji_value).strip().lower()
+        if val in mapping:
+            return mapping[val]
+        match = re.search(r'[\U0001F600-\U0001FAFF\u2600-\u27BF]', emoji_value)
+        if match:
+            return match.group(0)
+        for k, v in mapping.items():
+            if k in val:
+                return v
+        return '😐'
+    return map_to_emoji(emoji_value)
+
+def bench(label, func, iterations):
+    seconds = timeit.timeit(func, number=iterations)
+    per_call_us = seconds / iterations * 1e6
+    print(f"{label:<45} {per_call_us:10.2f} us/article")
+    return per_call_us
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # Include the regex module's cache being cold, as happens once the cache churns
+    legacy = bench('emoji normalizer, rebuilt per call (cold re)', lambda: (re.purge(), [legacy_map_to_emoji(v) for v in SAMPLES]), iterations)
+    shared = bench('emoji normalizer, module-level', lambda: [map_visualization.map_to_emoji(v) for v in SAMPLES], iterations)
+    print(f"  -> {legacy - shared:.2f} us saved per article ({legacy / shared:.1f}x)")
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        print("google-generativeai not installed; skipping client/model setup benchmark.")
+        return
+    api_key = map_visualization.load_gemini_api_key() or 'benchmark-key'
+    per_call = bench('configure + GenerativeModel per call', lambda: (genai.configure(api_key=api_key), genai.GenerativeModel(map_visualization.GEMINI_MODEL_NAME)), iterations // 10)
+    map_visualization.get_gemini_analyzer(api_key)
+    reused = bench('reused GeminiAnalyzer', lambda: map_visualization.get_gemini_analyzer(api_key).model, iterations)
+    print(f"  -> {per_call - reused:.2f} us saved per article")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+bench_import_time.py
+Import-time budget check for the pipeline modules. Each module is imported in a
+fresh interpreter with `-X importtime`; the check fails (exit status 1) when a
+module takes longer than its budget or pulls in a heavy library that should
+only be imported when it is used.
+
+Usage: python benchmarks/bench_import_time.py [repeats]
+"""
+
+import os
+import re
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget (milliseconds) per module, best of `repeats` runs
+IMPORT_BUDGET_MS = {
+    'news_crawler': 250,
+    'sentiment_analysis': 300,
+    'map_visualization': 300,
+    'run_pipeline': 500,
+    'streamlit_app': None,  # imports streamlit itself; only checked for deferred imports
+}
+# Libraries that must not be imported just by importing a pipeline module
+DEFERRED_IMPORTS = ('folium', 'textblob', 'nltk', 'bs4', 'lxml', 'feedparser', 'yaml', 'selenium', 'webdriver_manager', 'google.generativeai')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def import_profile(module):
+    """Return ({imported module: cumulative us}, total us) for importing `module` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imported[match.group(4)] = int(match.group(2))
+    return imported, imported.get(module, 0)
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    failures = []
+    for module, budget in IMPORT_BUDGET_MS.items():
+        try:
+            profiles = [import_profile(module) for _ in range(repeats)]
+        except RuntimeError as e:
+            print(f"{module:<20} skipped ({str(e).splitlines()[-1]})")
+            continue
+        imported = profiles[0][0]
+        best_ms = min(total for _, total in profiles) / 1000
+        heavy = sorted(name for name in imported if name.split('.')[0] in DEFERRED_IMPORTS or name in DEFERRED_IMPORTS)
+        status = 'ok'
+        if budget is not None and best_ms > budget:
+            status = f'over budget ({budget} ms)'
+            failures.append(module)
+        if heavy:
+            status = f"imports {', '.join(sorted({name.split('.')[0] for name in heavy}))}"
+            failures.append(module)
+        budget_text = f"{budget} ms" if budget is not None else '-'
+        print(f"{module:<20} {best_ms:8.1f} ms  budget {budget_text:>7}  {status}")
+    if failures:
+        print(f"Import budget check failed for: {', '.join(dict.fromkeys(failures))}")
+        sys.exit(1)
+    print("Import budget check passed.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""
+bench_pipeline.py
+Offline end-to-end benchmark of the pipeline: crawl -> sentiment -> Gemini ->
+geocode -> map, with no live network access.
+
+- The news fetchers get recorded RSS/HTML pages from benchmarks/fixtures/, replayed
+  through a transport adapter mounted on the shared crawl session (refresh the
+  fixtures from the live sites with --record). With --bodies, article pages of
+  the body-enriched outlets are answered with fixtures/article_page.html.
+- Gemini is replaced by a fake model (GeminiAnalyzer(model=...)) that answers
+  every prompt after a configurable latency, failing a configurable fraction of
+  requests with a rate-limit error.
+- OneMap and Nominatim are served by a local stand-in HTTP server with its own
+  latency and error rate. Their rate limiters get generous quotas; pass
+  --onemap-rpm 250 --nominatim-rps 1 to run at the real providers' limits.
+- Corpora of 100, 1k and 10k articles are synthesized from latest_articles.json.
+
+Each corpus runs in a fresh interpreter and a fresh working directory, so every
+run starts with cold caches and its peak RSS is its own. Wall time, articles/s
+and the peak traced Python allocation are reported per stage.
+--save-baseline writes the results to a JSON file; --compare checks a run
+against one and fails (exit status 1) when a stage is slower or uses more memory
+than the baseline plus the tolerance.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 100,1000,10000] [--compare BASELINE.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+CORPUS_SOURCE = os.path.join(ROOT, 'latest_articles.json')
+DEFAULT_SIZES = (100, 1000, 10000)
+STAGES = ('crawl', 'bodies', 'sentiment', 'gemini', 'geocode', 'map')
+
+# Recorded feed/listing page of each source in sources.yaml
+FIXTURES = {
+    'The Straits Times': ('straits_times.xml', 'application/rss+xml'),
+    'Channel NewsAsia': ('channel_newsasia.xml', 'application/rss+xml'),
+    'Today Online': ('today_online.html', 'text/html; charset=utf-8'),
+    'Mothership': ('mothership.html', 'text/html; charset=utf-8'),
+}
+# Any other page on the host of a fetch_bodies source is an article page
+ARTICLE_FIXTURE = ('article_page.html', 'text/html; charset=utf-8')
+
+# Singapore bounding box for stand-in geocoder results
+SG_BOUNDS = ((1.24, 1.46), (103.62, 104.00))
+
+def fraction(key, salt=''):
+    """Deterministic value in [0, 1) for a string, so runs are repeatable."""
+    return zlib.crc32(f'{salt}:{key}'.encode('utf-8')) / 2 ** 32
+
+# --- Recorded fixtures ---
+
+def fixture_urls():
+    """({source url: fixture}, hosts whose other pages are article pages) for the registry sources."""
+    from news_crawler import get_sources
+    sources = get_sources()
+    urls = {source['url']: FIXTURES[source['name']] for source in sources if source['name'] in FIXTURES}
+    article_hosts = {urlsplit(source['url']).netloc for source in sources if source['fetch_bodies']}
+    return urls, article_hosts
+
+def fixture_response(url, latency=0.0, error_rate=0.0):
+    """requests.Response for a replayed fixture (503 for an injected error, 404 for an unknown URL)."""
+    import requests
+    time.sleep(latency)
+    response = requests.Response()
+    response.url = url
+    response.encoding = 'utf-8'
+    urls, article_hosts = fixture_urls()
+    fixture = urls.get(url)
+    if fixture is None and urlsplit(url).netloc in article_hosts:
+        fixture = ARTICLE_FIXTURE
+    if fixture is None:
+        response.status_code = 404
+        response._content = b''
+    elif random.random() < error_rate:
+        response.status_code = 503
+        response._content = b'Service Unavailable'
+    else:
+        name, content_type = fixture
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            response._content = f.read()
+        response.status_code = 200
+        response.headers['Content-Type'] = content_type
+    return response
+
+def replay_fixtures(session, latency=0.0, error_rate=0.0):
+    """Mount a transport adapter on `session` that answers every request from FIXTURES."""
+    from requests.adapters import BaseAdapter
+
+    class ReplayAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            response = fixture_response(request.url, latency, error_rate)
+            response.request = request
+            return response
+
+        def close(self):
+            pass
+
+    adapter = ReplayAdapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+def record_fixtures():
+    """Save the live feeds/pages as fixtures (the only mode that uses the network)."""
+    sys.path.insert(0, ROOT)
+    from news_crawler import get_session
+    for url, (name, _) in fixture_urls()[0].items():
+        resp = get_session().get(url, timeout=30)
+        resp.raise_for_status()
+        with open(os.path.join(FIXTURES_DIR, name), 'wb') as f:
+            f.write(resp.content)
+        print(f"Recorded {url} -> benchmarks/fixtures/{name} ({len(resp.content)} bytes)")
+
+# --- Gemini stand-in ---
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+class FakeResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = FakeUsage(len(prompt) // 4, len(text) // 4)
+
+class FakeGeminiModel:
+    """
+    Stands in for genai.GenerativeModel: answers batch and single-article
+    prompts with plausible results after `latency` seconds, and raises a
+    rate-limit error for `error_rate` of the requests. `remote_rate` of the
+    places are unknown to the gazetteer, so they go to the geocoders.
+    """
+
+    def __init__(self, places, latency=0.5, error_rate=0.0, remote_rate=0.2):
+        self.places = places
+        self.latency = latency
+        self.error_rate = error_rate
+        self.remote_rate = remote_rate
+
+    def analysis(self, title):
+        if fraction(title, 'remote') < self.remote_rate:
+            place = f"Blk {zlib.crc32(title.encode('utf-8')) % 900 + 100} Benchmark Street"
+        else:
+            place = self.places[zlib.crc32(title.encode('utf-8')) % len(self.places)]
+        sentiment = ('positive', 'neutral', 'negative')[int(fraction(title, 'sentiment') * 3)]
+        emoji = {'positive': '😊', 'neutral': '😐', 'negative': '😞'}[sentiment]
+        return {'is_sg_related': True, 'place': place, 'sentiment': sentiment, 'reason': 'benchmark', 'emoji': emoji}
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise RuntimeError('429 Resource exhausted (benchmark stand-in)')
+        import map_visualization
+        if prompt.startswith(map_visualization.GEMINI_BATCH_PROMPT):
+            payload = json.loads(prompt[len(map_visualization.GEMINI_BATCH_PROMPT):])
+            text = json.dumps([{'id': item['id'], **self.analysis(item['title'])} for item in payload], ensure_ascii=False)
+        else:
+            title = prompt.split('News title:', 1)[-1].split('\n', 1)[0].strip()
+            text = json.dumps(self.analysis(title), ensure_ascii=False)
+        return FakeResponse(text, prompt)
+
+# --- OneMap / Nominatim stand-in ---
+
+def start_geocoder_server(latency=0.05, error_rate=0.0, miss_rate=0.1):
+    """
+    Serve OneMap's /api/common/elastic/search and Nominatim's /search on a free
+    local port. `miss_rate` of the places are not found by OneMap (so Nominatim
+    is asked too). Returns the running server.
+    """
+
+    class GeocoderHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+            if random.random() < error_rate:
+                self.send_error(500)
+                return
+            if parts.path == '/api/common/elastic/search':
+                place = query.get('searchVal', [''])[0]
+                results = []
+                if fraction(place, 'onemap') >= miss_rate:
+                    lat, lon = self.coords(place)
+                    results.append({'SEARCHVAL': place.upper(), 'LATITUDE': str(lat), 'LONGITUDE': str(lon)})
+                body = {'found': len(results), 'totalNumPages': 1, 'pageNum': 1, 'results': results}
+            elif parts.path == '/search':
+                place = query.get('q', [''])[0]
+                lat, lon = self.coords(place)
+                body = [{'lat': str(lat), 'lon': str(lon), 'display_name': place}]
+            else:
+                self.send_error(404)
+                return
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        @staticmethod
+        def coords(place):
+            (lat_min, lat_max), (lon_min, lon_max) = SG_BOUNDS
+            return (round(lat_min + fraction(place, 'lat') * (lat_max - lat_min), 6),
+                    round(lon_min + fraction(place, 'lon') * (lon_max - lon_min), 6))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GeocoderHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='geocoder-stand-in', daemon=True).start()
+    return server
+
+# --- Corpus ---
+
+def synthesize_corpus(size, source_path=CORPUS_SOURCE):
+    """
+    `size` articles built by cycling through the recorded articles. Copies get a
+    distinct URL and a numbered title, so each one is a new article with its own
+    text (no cache hits), and timestamps spread over the last 12 hours.
+    """
+    from datetime import datetime, timedelta
+    from article_store import SGT
+    with open(source_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    now = datetime.now(SGT)
+    corpus = []
+    for i in range(size):
+        article = dict(base[i % len(base)])
+        copy = i // len(base)
+        if copy:
+            article['url'] = f"{article['url'].rstrip('/')}-bench-{copy}"
+            article['title'] = f"{article['title']} ({copy})"
+        article['timestamp'] = (now - timedelta(seconds=43200 * i / size)).isoformat()
+        corpus.append(article)
+    return corpus
+
+# --- One corpus, in a fresh interpreter ---
+
+def run_stage(results, name, size, func, trace_memory):
+    if trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    results[name] = {'seconds': round(seconds, 4), 'articles': size, 'articles_per_s': round(size / seconds, 1) if seconds else None,
+                     'peak_mb': round(peak / 2 ** 20, 2) if peak is not None else None}
+    return value
+
+def run_corpus(args):
+    """Run every stage on one synthesized corpus; prints the results as one JSON line."""
+    sys.path.insert(0, ROOT)
+    out = sys.stdout
+    workdir = tempfile.mkdtemp(prefix='sg-bench-')
+    os.chdir(workdir)
+    random.seed(args.seed)
+    os.environ['GEMINI_API_KEY'] = 'benchmark'
+    import news_crawler
+    import sentiment_analysis
+    import map_visualization
+    from rate_limit import RateLimiter, TokenBucket
+    from dedup import find_clusters
+    from gazetteer import get_gazetteer
+    from metrics import METRICS
+
+    replay_fixtures(news_crawler.get_session(), args.crawl_latency, args.crawl_error_rate)
+    places = [place['name'] for place in get_gazetteer().places]
+    model = FakeGeminiModel(places, args.gemini_latency, args.gemini_error_rate, args.remote_rate)
+    map_visualization._gemini_analyzers['benchmark'] = map_visualization.GeminiAnalyzer(model=model)
+    # The real quota would dominate a 10k run; the stand-in gets a generous one and short backoffs
+    map_visualization.GEMINI_LIMITER = RateLimiter(args.gemini_rpm, backoff_base=0.05, backoff_cap=1.0)
+    server = start_geocoder_server(args.geocode_latency, args.geocode_error_rate, args.onemap_miss_rate)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    map_visualization.ONEMAP_SEARCH_URL = base_url + '/api/common/elastic/search'
+    map_visualization.NOMINATIM_SEARCH_URL = base_url + '/search'
+    map_visualization.ONEMAP_LIMITER = TokenBucket(args.onemap_rpm)
+    map_visualization.NOMINATIM_LIMITER = TokenBucket(args.nominatim_rps, per=1.0)
+    geocode_workers = args.geocode_workers or map_visualization.GEOCODE_WORKERS
+
+    corpus = synthesize_corpus(args.size)
+    results = {}
+    if args.memory:
+        tracemalloc.start()
+    log = open(os.devnull, 'w') if not args.verbose else sys.stderr
+    with redirect_stdout(log):
+        crawled = run_stage(results, 'crawl', 0, news_crawler.crawl_news, args.memory)
+        results['crawl']['articles'] = len(crawled)
+        if args.bodies:
+            corpus = run_stage(results, 'bodies', args.size, lambda: news_crawler.fetch_article_bodies(corpus), args.memory)
+        scored = run_stage(results, 'sentiment', args.size, lambda: sentiment_analysis.analyze_sentiment(corpus), args.memory)
+        enriched = run_stage(results, 'gemini', args.size, lambda: map_visualization.process_articles_with_gemini(scored), args.memory)
+        clusters = find_clusters(enriched)
+        places = run_stage(results, 'geocode', args.size,
+                           lambda: map_visualization.geocode_articles(enriched, clusters, workers=geocode_workers), args.memory)
+        run_stage(results, 'map', args.size, lambda: map_visualization.render_map(
+            map_visualization.collect_map_markers(enriched, clusters, places=places), mode=args.mode), args.memory)
+    server.shutdown()
+    record = METRICS.to_record()
+    counters = {}
+    for series in record['counters']:
+        label = ','.join(f'{k}={v}' for k, v in sorted(series['labels'].items()))
+        counters[f"{series['name']}{{{label}}}" if label else series['name']] = series['value']
+    out.write(json.dumps({
+        'size': args.size,
+        'stages': results,
+        'total_seconds': round(sum(stage['seconds'] for stage in results.values()), 4),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'map_bytes': os.path.getsize(map_visualization.MAP_OUTPUT_PATH),
+        'counters': counters,
+    }) + '\n')
+
+# --- Driver ---
+
+def corpus_command(args, size):
+    command = [sys.executable, os.path.abspath(__file__), '--corpus', str(size)]
+    for option in ('seed', 'mode', 'crawl_latency', 'crawl_error_rate', 'gemini_latency', 'gemini_error_rate', 'gemini_rpm',
+                   'remote_rate', 'geocode_latency', 'geocode_error_rate', 'onemap_miss_rate', 'geocode_workers',
+                   'onemap_rpm', 'nominatim_rps'):
+        value = getattr(args, option)
+        if value is not None:
+            command += [f"--{option.replace('_', '-')}", str(value)]
+    if not args.memory:
+        command.append('--no-memory')
+    if args.bodies:
+        command.append('--bodies')
+    if args.verbose:
+        command.append('--verbose')
+    return command
+
+def print_result(result):
+    print(f"{result['size']} articles: {result['total_seconds']:.2f}s total, max RSS {result['max_rss_mb']:.0f} MB, map {result['map_bytes'] / 1024:.0f} KB")
+    for name in STAGES:
+        stage = result['stages'].get(name)
+        if not stage:
+            continue
+        rate = f"{stage['articles_per_s']:>9.1f}/s" if stage['articles_per_s'] else f"{'-':>11}"
+        peak = f"{stage['peak_mb']:8.1f} MB peak" if stage['peak_mb'] is not None else ''
+        print(f"  {name:<10} {stage['seconds']:9.3f}s  {stage['articles']:>6} articles {rate}  {peak}")
+    requests = {key: value for key, value in result['counters'].items() if 'requests_total' in key or 'retries_total' in key}
+    if requests:
+        print('  ' + ', '.join(f'{key} {value}' for key, value in sorted(requests.items())))
+
+def compare(results, baseline, tolerance):
+    """Stage regressions against a saved baseline, as human-readable strings."""
+    regressions = []
+    for result in results:
+        base = baseline.get(str(result['size']))
+        if not base:
+            continue
+        for name in STAGES:
+            now, then = result['stages'].get(name), base['stages'].get(name)
+            if not now or not then:
+                continue
+            if now['seconds'] > then['seconds'] * (1 + tolerance) and now['seconds'] - then['seconds'] > 0.05:
+                regressions.append(f"{result['size']} articles, {name}: {now['seconds']:.3f}s vs {then['seconds']:.3f}s")
+            if now['peak_mb'] is not None and then.get('peak_mb') is not None and \
+                    now['peak_mb'] > then['peak_mb'] * (1 + tolerance) and now['peak_mb'] - then['peak_mb'] > 1:
+                regressions.append(f"{result['size']} articles, {name}: {now['peak_mb']:.1f} MB vs {then['peak_mb']:.1f} MB peak")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Offline pipeline benchmark with recorded fixtures and local service stand-ins.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma-separated corpus sizes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--mode', default=None, help='map render mode (default: MAP_RENDER_MODE)')
+    parser.add_argument('--crawl-latency', type=float, default=0.2, help='seconds per replayed feed/page')
+    parser.add_argument('--crawl-error-rate', type=float, default=0.0)
+    parser.add_argument('--bodies', action='store_true', help='include the article body enrichment stage')
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help='seconds per Gemini request')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.02, help='fraction of Gemini requests answered with 429')
+    parser.add_argument('--gemini-rpm', type=int, default=100000, help='requests per minute allowed by the Gemini limiter')
+    parser.add_argument('--remote-rate', type=float, default=0.2, help='fraction of places not in the gazetteer')
+    parser.add_argument('--geocode-latency', type=float, default=0.05, help='seconds per geocoder request')
+    parser.add_argument('--geocode-error-rate', type=float, default=0.01)
+    parser.add_argument('--onemap-miss-rate', type=float, default=0.1, help='fraction of places OneMap does not find')
+    parser.add_argument('--geocode-workers', type=int, default=None, help='distinct places geocoded at once (default: GEOCODE_WORKERS)')
+    parser.add_argument('--onemap-rpm', type=int, default=100000, help='requests per minute allowed by the OneMap limiter')
+    parser.add_argument('--nominatim-rps', type=float, default=1000.0, help='requests per second allowed by the Nominatim limiter')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc (faster, no peak memory)')
+    parser.add_argument('--verbose', action='store_true', help="show the pipeline's own output (on stderr)")
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results to PATH')
+    parser.add_argument('--compare', metavar='PATH', help='fail if a stage regressed against the baseline at PATH')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown/growth vs the baseline (fraction)')
+    parser.add_argument('--record', action='store_true', help='re-record the fixtures from the live sites and exit')
+    parser.add_argument('--corpus', dest='size', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.record:
+        record_fixtures()
+        return
+    if args.size is not None:
+        run_corpus(args)
+        return
+    results = []
+    for size in (int(size) for size in args.sizes.split(',') if size.strip()):
+        proc = subprocess.run(corpus_command(args, size), capture_output=True, text=True, cwd=ROOT)
+        if proc.returncode != 0:
+            print(f"{size} articles: benchmark failed\n{proc.stderr[-3000:]}")
+            sys.exit(1)
+        if args.verbose:
+            sys.stderr.write(proc.stderr)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print_result(result)
+        results.append(result)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({str(result['size']): result for result in results}, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
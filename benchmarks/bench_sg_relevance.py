@@ -0,0 +1,70 @@
+"""
+bench_sg_relevance.py
+Throughput of the local Singapore-relevance classifier (sg_relevance.py) on the
+bundled latest_articles.json, repeated up to the requested corpus size, and how
+many of the articles it decides without Gemini. The articles it labels
+unrelated are listed so the thresholds can be checked by eye.
+It then checks that process_articles_with_gemini leaves those articles'
+TextBlob sentiment in place (exit status 1 if not); Gemini is stubbed out and
+the caches live in a temporary directory.
+
+Usage: python benchmarks/bench_sg_relevance.py [articles]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from sg_relevance import get_relevance_classifier
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with open(os.path.join(ROOT, 'latest_articles.json'), 'r', encoding='utf-8') as f:
+        sample = json.load(f)
+    articles = [sample[i % len(sample)] for i in range(size)]
+    start = time.perf_counter()
+    classifier = get_relevance_classifier()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    labels = Counter(classifier.classify(article)[0] for article in articles)
+    elapsed = time.perf_counter() - start
+    print(f"Classifier built in {build * 1000:.0f} ms ({len(classifier._words.phrases) + len(classifier._acronyms.phrases)} phrases)")
+    print(f"{size} articles in {elapsed * 1000:.0f} ms ({size / elapsed:,.0f}/s)")
+    for label in ('related', 'ambiguous', 'unrelated'):
+        print(f"  {label:<10} {labels[label] / size:6.1%}")
+    print(f"Gemini needed to decide relevance for {labels['ambiguous'] / size:.1%} of the articles; "
+          f"{labels['unrelated'] / size:.1%} are not sent at all.")
+    print("Unrelated in the sample:")
+    for article in sample:
+        label, score, entities = classifier.classify(article)
+        if label == 'unrelated':
+            print(f"  {score:.2f}  {article['title'][:70]}  {sorted(entities)}")
+
+def check_unrelated_keep_sentiment(sample):
+    """The prefilter only sets relevance on unrelated articles: their sentiment fields survive."""
+    os.chdir(tempfile.mkdtemp(prefix='sg-relevance-'))
+    import map_visualization
+    import sentiment_analysis
+    map_visualization.load_gemini_api_key = lambda: 'check'
+    map_visualization.gemini_analyze_batch = lambda api_key, items: {item[0]: ('Changi Airport', 'neutral', 'stub', '😐', True) for item in items}
+    scored = sentiment_analysis.analyze_sentiment([dict(article) for article in sample], use_cache=False)
+    before = {article['url']: (article['sentiment'], article.get('polarity')) for article in scored}
+    merged = map_visualization.process_articles_with_gemini(scored)
+    unrelated = [article for article in merged if article['is_sg_related'] is False]
+    broken = [article['title'] for article in unrelated
+              if not article.get('sentiment') or (article['sentiment'], article.get('polarity')) != before[article['url']]]
+    print(f"Unrelated articles keeping their TextBlob sentiment: {len(unrelated) - len(broken)} / {len(unrelated)}")
+    for title in broken:
+        print(f"  lost sentiment: {title[:70]}")
+    return not broken and bool(unrelated)
+
+if __name__ == "__main__":
+    main()
+    with open(os.path.join(ROOT, 'latest_articles.json'), 'r', encoding='utf-8') as f:
+        if not check_unrelated_keep_sentiment(json.load(f)):
+            sys.exit(1)
@@ -0,0 +1,58 @@
+"""
+bench_source_parsing.py
+Parse time of the HTML listing pages: the previous full BeautifulSoup
+html.parser tree per page against news_crawler.parse_html_listing, which only
+parses the elements the source's selectors start from (with lxml when installed).
+The fixtures in benchmarks/fixtures/ are padded with non-article markup to the
+size of a real homepage.
+
+Usage: python benchmarks/bench_source_parsing.py [iterations] [padding_kb]
+"""
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import news_crawler
+
+FIXTURES = {'Today Online': 'today_online.html', 'Mothership': 'mothership.html'}
+
+def legacy_parse(html, source):
+    """The previous scrapers: a full html.parser tree of the page, then the selectors."""
+    from urllib.parse import urljoin
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    include = source['url_filters']['include']
+    links = []
+    for item in soup.select(', '.join(source['selectors'])):
+        link = urljoin(source['url'], item.get('href') or '')
+        if item.get_text(strip=True) and any(part in link for part in include):
+            links.append(link)
+    return links
+
+def padded(html, kb):
+    """Pad a listing page with navigation/script/widget markup up to about `kb` KB."""
+    block = ('<div class="widget"><ul><li><span class="label">Trending</span></li><li>Weather</li></ul>'
+             '<script>window.__state = {"ads": [1, 2, 3], "user": null};</script>'
+             '<img src="/images/sprite.png" alt=""><p class="blurb">Sponsored content and promotions</p></div>')
+    return html.replace('<main>', '<main>' + block * (kb * 1024 // len(block)), 1)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    padding_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    sources = {source['name']: source for source in news_crawler.get_sources()}
+    print(f"HTML parser for listings: {news_crawler._html_parser_name()}")
+    for name, fixture in FIXTURES.items():
+        with open(os.path.join(ROOT, 'benchmarks', 'fixtures', fixture), 'r', encoding='utf-8') as f:
+            html = padded(f.read(), padding_kb)
+        source = sources[name]
+        legacy = timeit.timeit(lambda: legacy_parse(html, source), number=iterations) / iterations * 1000
+        strained = timeit.timeit(lambda: news_crawler.parse_html_listing(html, source), number=iterations) / iterations * 1000
+        articles = len(news_crawler.parse_html_listing(html, source))
+        print(f"{name:<14} {len(html) // 1024:5d} KB  full tree {legacy:8.1f} ms  targeted {strained:8.1f} ms  "
+              f"({legacy / strained:.1f}x, {articles} articles)")
+
+if __name__ == "__main__":
+    main()
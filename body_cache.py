@@ -0,0 +1,85 @@
+"""
+body_cache.py
+On-disk SQLite cache of extracted article bodies, keyed by canonical URL.
+"""
+
+import time
+import threading
+from sqlite_util import connect_sqlite
+from article_store import canonical_url
+
+BODY_CACHE_PATH = 'body_cache.sqlite'
+# Extracted text kept per article; callers truncate further when they read it
+BODY_STORE_CHARS = 8000
+# A failed download, or a page without text, is retried after this long; a fetched body is kept for good
+BODY_NEGATIVE_TTL = 6 * 3600
+
+class ArticleBodyCache:
+    """
+    Persistent URL -> article text cache. A published article does not change
+    its body, so a successfully fetched body is never fetched again. Failures,
+    and pages no text could be extracted from (an empty body), are remembered
+    as None for BODY_NEGATIVE_TTL so a broken page is not requested on every
+    crawl, but is tried again later.
+    """
+
+    def __init__(self, path=BODY_CACHE_PATH, negative_ttl=BODY_NEGATIVE_TTL):
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS bodies (
+                url TEXT PRIMARY KEY,
+                body TEXT,
+                status INTEGER,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+
+    def get_many(self, urls):
+        """Return {url: body} for the cached urls; body is None for a recent failure."""
+        keys = {canonical_url(url): url for url in urls}
+        found = {}
+        with self._lock:
+            items = list(keys)
+            for start in range(0, len(items), 500):
+                chunk = items[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT url, body, fetched_at FROM bodies WHERE url IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, body, fetched_at in rows:
+                    # Rows stored before empty bodies counted as failures hold ''
+                    body = body or None
+                    if body is not None or time.time() - fetched_at <= self.negative_ttl:
+                        found[keys[key]] = body
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, url, body, status=None):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO bodies (url, body, status, fetched_at) VALUES (?, ?, ?, ?)',
+                (canonical_url(url), body[:BODY_STORE_CHARS] if body else None, status, time.time())
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_body_cache():
+    """Return the process-wide ArticleBodyCache, opening it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArticleBodyCache()
+    return _default_cache
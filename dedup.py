@@ -0,0 +1,129 @@
+"""
+dedup.py
+Near-duplicate detection across outlets: MinHash signatures over the words of
+each article's headline, banded into an LSH index so only likely duplicates are
+compared, then confirmed by their actual Jaccard similarity.
+Headlines are used without the summary: the RSS outlets send one and the
+scraped ones do not, and the extra words drown out the shared headline.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from article_store import article_key
+
+# Jaccard similarity of two headlines' word sets from which they are the same story
+# (on the bundled latest_articles.json: 0.41-0.64 for the same story told by two
+# outlets, at most 0.30 for different stories)
+DEDUP_THRESHOLD = 0.35
+# 40 MinHash values in 20 bands of 2: pairs at the threshold become candidates
+# with ~93% probability, pairs at 0.05 with ~5%
+MINHASH_PERMUTATIONS = 40
+LSH_BANDS = 20
+MINHASH_PRIME = (1 << 61) - 1
+# Bump when article_id changes, so clusters stored by the pipeline are recomputed
+ARTICLE_ID_VERSION = 3
+
+STOPWORDS = frozenset('''
+a an and are as at be but by for from has have he her his in into is it its of on or our over s says
+she so than that the their them they this to up was we were what when who will with after about more
+new not no out one two how why you your all also can may said singapore sg spore
+'''.split())
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+def article_id(article):
+    """
+    The id articles are cached under (see map_visualization.process_articles_with_gemini):
+    the canonical URL, as in the article store, else the title.
+    """
+    return article_key(article)
+
+def article_words(article):
+    """Set of content words of the headline, with plural 's' dropped ('courses' -> 'course')."""
+    text = (article.get('title') or '').lower().replace('’', "'")
+    words = set()
+    for word in WORD_PATTERN.findall(text):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        words.add(word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word)
+    return words
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def minhash_signatures(word_sets, permutations=MINHASH_PERMUTATIONS, seed=1):
+    """(n, permutations) array of MinHash values, one row per word set."""
+    import numpy as np
+    rng = np.random.RandomState(seed)
+    # a * x stays below 2**61 for 32-bit word hashes, so nothing overflows uint64
+    a = rng.randint(1, 1 << 29, size=permutations, dtype=np.int64).astype(np.uint64)
+    b = rng.randint(0, 1 << 61, size=permutations, dtype=np.int64).astype(np.uint64)
+    signatures = np.full((len(word_sets), permutations), MINHASH_PRIME, dtype=np.uint64)
+    for row, words in enumerate(word_sets):
+        if words:
+            hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+            signatures[row] = ((hashes[:, None] * a + b) % np.uint64(MINHASH_PRIME)).min(axis=0)
+    return signatures
+
+def find_clusters(articles, threshold=DEDUP_THRESHOLD, bands=LSH_BANDS, permutations=MINHASH_PERMUTATIONS):
+    """
+    Group the same story as told by different outlets. Returns {representative
+    id: [member ids]} for every group of two or more articles; a group never has
+    two articles from the same source. The representative is the member with
+    the most text (the best one to send to Gemini) and is listed first.
+    Articles without an id or without words are never grouped.
+    """
+    ids = []
+    word_sets = []
+    texts = {}
+    sources = []
+    for article in articles:
+        key = article_id(article)
+        words = article_words(article)
+        if key and words and key not in texts:
+            ids.append(key)
+            word_sets.append(words)
+            texts[key] = len(article.get('title') or '') + len(article.get('content') or '')
+            sources.append({article.get('source')})
+    if len(ids) < 2:
+        return {}
+    signatures = minhash_signatures(word_sets, permutations)
+    rows = permutations // bands
+    parent = list(range(len(ids)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for i, signature in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets[signature.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if (i, j) in compared or find(i) == find(j):
+                        continue
+                    compared.add((i, j))
+                    root_i, root_j = find(i), find(j)
+                    if sources[root_i].isdisjoint(sources[root_j]) and jaccard(word_sets[i], word_sets[j]) >= threshold:
+                        parent[root_j] = root_i
+                        sources[root_i] |= sources[root_j]
+    groups = defaultdict(list)
+    for i in range(len(ids)):
+        groups[find(i)].append(ids[i])
+    clusters = {}
+    for members in groups.values():
+        if len(members) > 1:
+            members.sort(key=lambda key: -texts[key])
+            clusters[members[0]] = members
+    return clusters
+
+def cluster_index(clusters):
+    """{member id: representative id} for the output of find_clusters."""
+    return {member: representative for representative, members in (clusters or {}).items() for member in members}
@@ -0,0 +1,125 @@
+"""
+gazetteer.py
+Offline index of well-known Singapore places (landmarks, MRT stations, planning
+areas, government buildings) for resolving place names without a network call.
+"""
+
+import os
+import re
+import json
+import threading
+from collections import defaultdict
+from geocode_cache import normalize_place_name
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sg_gazetteer.json')
+# Minimum trigram Dice similarity for a fuzzy match, and shortest name worth fuzzy matching
+FUZZY_THRESHOLD = 0.85
+FUZZY_MIN_LENGTH = 6
+
+def name_variants(place_name):
+    """
+    Yield normalized forms of a place name, most specific first:
+    'Parliament House, Singapore' -> 'parliament house singapore', 'parliament house'.
+    Parenthesised notes, a trailing ', ...' qualifier, a leading 'the' and a
+    leading/trailing 'singapore' are dropped in turn.
+    """
+    seen = set()
+    raw = str(place_name)
+    candidates = [raw, re.sub(r'\([^)]*\)', ' ', raw), raw.split(',')[0]]
+    for candidate in candidates:
+        name = normalize_place_name(candidate)
+        for variant in (name, re.sub(r'^the ', '', name)):
+            stripped = re.sub(r'^singapore | singapore$', '', variant).strip()
+            for v in (variant, stripped):
+                if v and v not in seen:
+                    seen.add(v)
+                    yield v
+
+def _trigrams(name):
+    padded = f'  {name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class Gazetteer:
+    """
+    Name -> coordinates lookup over a list of places.
+    Exact lookups go through a dict of normalized names and aliases; anything
+    else falls back to a trigram index scored by Dice similarity.
+    """
+
+    def __init__(self, places):
+        self.places = places
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._keys = []
+        self._key_trigrams = []
+        self._trigram_index = defaultdict(list)
+        for place in places:
+            for name in [place['name'], *place.get('aliases', [])]:
+                for key in name_variants(name):
+                    if key in self._exact:
+                        continue
+                    self._exact[key] = place
+                    key_id = len(self._keys)
+                    grams = _trigrams(key)
+                    self._keys.append(key)
+                    self._key_trigrams.append(len(grams))
+                    for gram in grams:
+                        self._trigram_index[gram].append(key_id)
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['places'])
+
+    def match(self, place_name):
+        """Return (place, score) for the best match, or (None, 0.0). Exact matches score 1.0."""
+        variants = list(name_variants(place_name))
+        # 'Singapore' alone names no particular place
+        if variants == ['singapore']:
+            return None, 0.0
+        for variant in variants:
+            if variant in self._exact:
+                return self._exact[variant], 1.0
+        best, best_score = None, 0.0
+        for variant in variants:
+            if len(variant) < FUZZY_MIN_LENGTH:
+                continue
+            grams = _trigrams(variant)
+            shared = defaultdict(int)
+            for gram in grams:
+                for key_id in self._trigram_index.get(gram, ()):
+                    shared[key_id] += 1
+            for key_id, count in shared.items():
+                score = 2 * count / (len(grams) + self._key_trigrams[key_id])
+                if score > best_score:
+                    best, best_score = self._exact[self._keys[key_id]], score
+        if best_score >= FUZZY_THRESHOLD:
+            return best, best_score
+        return None, 0.0
+
+    def lookup(self, place_name):
+        """Return [lat, lon] for a known place, or None."""
+        place, _ = self.match(place_name)
+        with self._lock:
+            if place is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return [place['lat'], place['lon']] if place else None
+
+_default_gazetteer = None
+_default_gazetteer_lock = threading.Lock()
+
+def get_gazetteer():
+    """Return the bundled gazetteer, loading it on first use (empty if the file is missing)."""
+    global _default_gazetteer
+    with _default_gazetteer_lock:
+        if _default_gazetteer is None:
+            try:
+                _default_gazetteer = Gazetteer.load()
+            except Exception as e:
+                print(f"Could not load gazetteer {GAZETTEER_PATH}: {e}")
+                _default_gazetteer = Gazetteer([])
+    return _default_gazetteer
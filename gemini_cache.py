@@ -0,0 +1,201 @@
+"""
+gemini_cache.py
+Transactional SQLite store of Gemini results per article (replaces processed_articles.json).
+"""
+
+import os
+import json
+import time
+import threading
+from sqlite_util import connect_sqlite
+from article_store import canonical_url
+
+GEMINI_CACHE_PATH = 'gemini_cache.sqlite'
+LEGACY_JSON_PATH = 'processed_articles.json'
+RESULT_FIELDS = ('place', 'sentiment', 'reason', 'emoji', 'is_sg_related')
+# Which model and prompt produced a cached result; returned with it, not part of it
+PROVENANCE_FIELDS = ('model', 'prompt_version')
+
+def canonical_id(article_id):
+    """An article id in its cached form: URLs canonicalized (see article_store.canonical_url), titles as they are."""
+    return canonical_url(article_id) if '://' in article_id else article_id
+
+class GeminiResultStore:
+    """
+    Gemini results keyed by article id (canonical URL or title, see
+    dedup.article_id), with the article's content hash, the model/prompt
+    version that produced them and timestamps.
+    Rows are upserted individually inside transactions, and the database runs in
+    WAL mode so the scheduler and a Streamlit-triggered run can read and write
+    it at the same time. On first open, processed_articles.json is imported and
+    rows stored under a raw URL by earlier versions are re-keyed.
+    """
+
+    def __init__(self, path=GEMINI_CACHE_PATH, legacy_json=LEGACY_JSON_PATH):
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS results (
+                article_id TEXT PRIMARY KEY,
+                content_hash TEXT,
+                place TEXT,
+                sentiment TEXT,
+                reason TEXT,
+                emoji TEXT,
+                is_sg_related INTEGER,
+                model TEXT,
+                prompt_version TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_updated_at ON results (updated_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        ''')
+        if legacy_json:
+            self.migrate_from_json(legacy_json)
+        self.migrate_to_canonical_ids()
+
+    def migrate_from_json(self, path):
+        """Import a processed_articles.json file once; later calls are no-ops."""
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated_json'").fetchone()
+        if done or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                processed = json.load(f)
+        except Exception as e:
+            print(f"Could not read {path} for migration: {e}")
+            return 0
+        self.upsert_many(((canonical_id(article_id), result) for article_id, result in processed.items()), overwrite=False)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_json', ?)", (path,))
+        print(f"Migrated {len(processed)} cached Gemini results from {path} to the SQLite cache.")
+        return len(processed)
+
+    def migrate_to_canonical_ids(self):
+        """
+        Re-key rows stored under a raw URL to its canonical URL, once. When several
+        rows map to the same URL, the most recently updated one is kept.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT value FROM meta WHERE key = 'canonical_ids'").fetchone():
+                return 0
+            rows = self._conn.execute(
+                "SELECT article_id, updated_at FROM results WHERE article_id LIKE '%://%'"
+            ).fetchall()
+            updated = dict(rows)
+            renames = [(article_id, canonical_id(article_id)) for article_id, _ in rows if canonical_id(article_id) != article_id]
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for old, new in renames:
+                    if new in updated and updated[new] > updated[old]:
+                        self._conn.execute('DELETE FROM results WHERE article_id = ?', (old,))
+                        continue
+                    self._conn.execute('DELETE FROM results WHERE article_id = ?', (new,))
+                    self._conn.execute('UPDATE results SET article_id = ? WHERE article_id = ?', (new, old))
+                    updated[new] = updated[old]
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('canonical_ids', '1')")
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        if renames:
+            print(f"Re-keyed {len(renames)} cached Gemini results by canonical URL.")
+        return len(renames)
+
+    @staticmethod
+    def _row_to_result(row):
+        result = dict(zip(RESULT_FIELDS, row[1:6]))
+        if result['is_sg_related'] is not None:
+            result['is_sg_related'] = bool(result['is_sg_related'])
+        if row[6]:
+            result['content_hash'] = row[6]
+        for field, value in zip(PROVENANCE_FIELDS, row[7:9]):
+            if value is not None:
+                result[field] = value
+        return row[0], result
+
+    def get_many(self, article_ids):
+        """
+        Return {article_id: result} for the ids that are cached. A result carries
+        the content_hash, model and prompt_version it was stored with, when known.
+        """
+        ids = list(dict.fromkeys(article_ids))
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT article_id, place, sentiment, reason, emoji, is_sg_related, content_hash, model, prompt_version "
+                    f"FROM results WHERE article_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    article_id, result = self._row_to_result(row)
+                    found[article_id] = result
+        return found
+
+    def get(self, article_id):
+        return self.get_many([article_id]).get(article_id)
+
+    def upsert_many(self, items, model=None, prompt_version=None, overwrite=True):
+        """Insert or update (article_id, result) pairs in a single transaction."""
+        now = time.time()
+        rows = []
+        for article_id, result in items:
+            is_sg_related = result.get('is_sg_related')
+            rows.append((
+                article_id, result.get('content_hash'),
+                result.get('place'), result.get('sentiment'), result.get('reason'), result.get('emoji'),
+                None if is_sg_related is None else int(bool(is_sg_related)),
+                model, None if prompt_version is None else str(prompt_version), now, now,
+            ))
+        if not rows:
+            return 0
+        conflict = '''DO UPDATE SET
+                content_hash = excluded.content_hash, place = excluded.place, sentiment = excluded.sentiment,
+                reason = excluded.reason, emoji = excluded.emoji, is_sg_related = excluded.is_sg_related,
+                model = excluded.model, prompt_version = excluded.prompt_version, updated_at = excluded.updated_at''' if overwrite else 'DO NOTHING'
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(f'''
+                    INSERT INTO results (article_id, content_hash, place, sentiment, reason, emoji,
+                                         is_sg_related, model, prompt_version, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (article_id) {conflict}
+                ''', rows)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return len(rows)
+
+    def upsert(self, article_id, result, model=None, prompt_version=None):
+        self.upsert_many([(article_id, result)], model=model, prompt_version=prompt_version)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def export_json(self, path):
+        """Write the cache in the old processed_articles.json layout (for inspection)."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT article_id, place, sentiment, reason, emoji, is_sg_related, content_hash, model, prompt_version FROM results'
+            ).fetchall()
+        processed = dict(self._row_to_result(row) for row in rows)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(processed, f, ensure_ascii=False, indent=2)
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_gemini_store():
+    """Return the process-wide GeminiResultStore, opening (and migrating) it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = GeminiResultStore()
+    return _default_store
@@ -0,0 +1,86 @@
+"""
+geocode_cache.py
+On-disk SQLite cache of geocoding results, keyed by normalized place name.
+"""
+
+import re
+import time
+import threading
+from sqlite_util import connect_sqlite
+
+GEOCODE_CACHE_PATH = 'geocode_cache.sqlite'
+# Found places rarely move; failed lookups are retried sooner
+GEOCODE_TTL = 30 * 24 * 3600
+GEOCODE_NEGATIVE_TTL = 24 * 3600
+
+def normalize_place_name(place_name):
+    """Casefold, drop punctuation and collapse whitespace: ' Changi  Airport.' -> 'changi airport'."""
+    name = re.sub(r"[^\w\s]", ' ', str(place_name).casefold())
+    return ' '.join(name.split())
+
+class GeocodeCache:
+    """
+    Persistent place name -> (lat, lon) cache with a TTL.
+    Places that could not be geocoded are cached too (as None, with a shorter
+    TTL) so they are not looked up again on every run.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, ttl=GEOCODE_TTL, negative_ttl=GEOCODE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS geocode (
+                name TEXT PRIMARY KEY,
+                lat REAL,
+                lon REAL,
+                provider TEXT,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def get(self, place_name):
+        """Return (hit, coords); coords is [lat, lon] or None for a cached failure."""
+        key = normalize_place_name(place_name)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT lat, lon, updated_at FROM geocode WHERE name = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                lat, lon, updated_at = row
+                ttl = self.ttl if lat is not None else self.negative_ttl
+                if time.time() - updated_at <= ttl:
+                    self.hits += 1
+                    return True, ([lat, lon] if lat is not None else None)
+            self.misses += 1
+            return False, None
+
+    def put(self, place_name, coords, provider=None):
+        lat, lon = coords if coords else (None, None)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO geocode (name, lat, lon, provider, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (normalize_place_name(place_name), lat, lon, provider, time.time())
+            )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_geocode_cache():
+    """Return the process-wide GeocodeCache, opening it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = GeocodeCache()
+    return _default_cache
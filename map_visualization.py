@@ -3,44 +3,119 @@ map_visualization.py
 Visualizes sentiment/emojis on a Singapore map.
 """
 
+import re
 import json
-import folium
+import hashlib
 import requests
 from collections import Counter
-import yaml
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from rate_limit import RateLimiter, TokenBucket, is_rate_limit_error, is_auth_error
+from geocode_cache import get_geocode_cache, normalize_place_name
+from gazetteer import get_gazetteer
+from gemini_cache import get_gemini_store, RESULT_FIELDS, PROVENANCE_FIELDS
+from progress import emit_progress, progress_enabled
+from metrics import METRICS
+
+# Geocoding endpoints (module-level so the offline benchmarks can point them at a local stand-in)
+ONEMAP_SEARCH_URL = 'https://www.onemap.gov.sg/api/common/elastic/search'
+NOMINATIM_SEARCH_URL = 'https://nominatim.openstreetmap.org/search'
+# Distinct places resolved at once (see geocode_places)
+GEOCODE_WORKERS = 4
+# Provider quotas, shared by all geocoding threads: OneMap allows 250 requests
+# per minute, and Nominatim's usage policy at most 1 request per second
+ONEMAP_LIMITER = TokenBucket(250)
+NOMINATIM_LIMITER = TokenBucket(1, per=1.0)
+
+_geocode_session = None
+_geocode_session_lock = threading.Lock()
+
+def get_geocode_session():
+    """Return the HTTP session shared by the geocoding threads (one pooled connection per worker)."""
+    global _geocode_session
+    with _geocode_session_lock:
+        if _geocode_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=GEOCODE_WORKERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _geocode_session = session
+    return _geocode_session
 
 def get_sg_location_coords(place_name):
     """
     Try OneMap.sg API for Singapore place/building/office first.
     If not found, fallback to Nominatim.
     Returns (lat, lon) or None if not found.
+    Well-known places are resolved from the bundled offline gazetteer first.
+    Network results (including places that could not be found) are cached on
+    disk, so known places cost no network I/O.
+    """
+    hit, coords = lookup_place_offline(place_name)
+    if hit:
+        return coords
+    return lookup_place_remote(place_name)
+
+def lookup_place_offline(place_name):
+    """(True, coords) when the gazetteer or the geocode cache knows the place (coords may be None), else (False, None)."""
+    coords = get_gazetteer().lookup(place_name)
+    if coords:
+        print(f"  Gazetteer found: {coords[0]}, {coords[1]} for {place_name}")
+        METRICS.inc('geocode_lookups_total', source='gazetteer')
+        return True, coords
+    hit, coords = get_geocode_cache().get(place_name)
+    if hit:
+        print(f"  Geocode cache hit: {coords} for {place_name}")
+        METRICS.inc('geocode_lookups_total', source='cache')
+        return True, coords
+    return False, None
+
+def lookup_place_remote(place_name):
+    """Geocode a place the offline sources do not know, and cache the result."""
+    METRICS.inc('geocode_lookups_total', source='remote')
+    coords, provider, had_error = geocode_remote(place_name)
+    # Do not cache failures caused by network/API errors; they may succeed next run
+    if coords or not had_error:
+        get_geocode_cache().put(place_name, coords, provider)
+    return coords
+
+def geocode_remote(place_name):
+    """
+    Geocode via OneMap.sg, then Nominatim.
+    Returns (coords, provider, had_error); coords is [lat, lon] or None.
     """
-    import requests
-    import time
+    had_error = False
     # 1. Try OneMap.sg API
     try:
-        url = f"https://www.onemap.gov.sg/api/common/elastic/search"
+        url = ONEMAP_SEARCH_URL
         params = {
             'searchVal': place_name,
             'returnGeom': 'Y',
             'getAddrDetails': 'Y',
             'pageNum': 1
         }
-        resp = requests.get(url, params=params, timeout=10)
+        ONEMAP_LIMITER.acquire()
+        METRICS.inc('geocode_provider_requests_total', provider='onemap')
+        with METRICS.timer('geocode_request_seconds', provider='onemap'):
+            resp = get_geocode_session().get(url, params=params, timeout=10)
         data = resp.json()
         results = data.get('results', [])
         for r in results:
             if r.get('LATITUDE') and r.get('LONGITUDE'):
                 lat, lon = float(r['LATITUDE']), float(r['LONGITUDE'])
                 print(f"  OneMap.sg found: {lat}, {lon} for {place_name}")
-                return [lat, lon]
+                METRICS.inc('geocode_provider_found_total', provider='onemap')
+                return [lat, lon], 'onemap', had_error
     except Exception as e:
+        had_error = True
+        METRICS.inc('geocode_provider_errors_total', provider='onemap')
         print(f"OneMap.sg geocoding error for '{place_name}': {e}")
     # 2. Fallback: Nominatim
     try:
-        url = f"https://nominatim.openstreetmap.org/search"
+        url = NOMINATIM_SEARCH_URL
         params = {
             'q': f"{place_name}, Singapore",
             'format': 'json',
@@ -48,15 +123,21 @@ def get_sg_location_coords(place_name):
             'addressdetails': 0
         }
         headers = {'User-Agent': 'HappinessIndexBot/1.0'}
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
+        NOMINATIM_LIMITER.acquire()
+        METRICS.inc('geocode_provider_requests_total', provider='nominatim')
+        with METRICS.timer('geocode_request_seconds', provider='nominatim'):
+            resp = get_geocode_session().get(url, params=params, headers=headers, timeout=10)
         data = resp.json()
         if data:
             print(f"  Nominatim found: {data[0]['lat']}, {data[0]['lon']} for {place_name}")
-            return [float(data[0]['lat']), float(data[0]['lon'])]
+            METRICS.inc('geocode_provider_found_total', provider='nominatim')
+            return [float(data[0]['lat']), float(data[0]['lon'])], 'nominatim', had_error
     except Exception as e:
+        had_error = True
+        METRICS.inc('geocode_provider_errors_total', provider='nominatim')
         print(f"Nominatim geocoding error for '{place_name}': {e}")
     print(f"  Could not geocode place: {place_name}")
-    return None
+    return None, None, had_error
 
 def load_gemini_api_key():
     load_dotenv()
@@ -65,18 +146,151 @@ def load_gemini_api_key():
 # Global counters for Gemini token usage
 GEMINI_TOTAL_IN_TOKENS = 0
 GEMINI_TOTAL_OUT_TOKENS = 0
+_gemini_usage_lock = threading.Lock()
 
-def gemini_analyze_article(api_key, title, content, idx=None, total=None):
+# Gemini quota: requests/tokens per minute shared by all worker threads
+GEMINI_CONCURRENCY = 4
+GEMINI_REQUESTS_PER_MINUTE = 15
+GEMINI_TOKENS_PER_MINUTE = 1000000
+GEMINI_MAX_ATTEMPTS = 4
+GEMINI_LIMITER = RateLimiter(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
+
+# --- Emoji mapping: map common text/labels to Unicode emoji ---
+# Compiled once at import; shared by the Gemini analyzer and the map renderer
+EMOJI_PATTERN = re.compile(
+    r"[\U0001F600-\U0001F64F"  # emoticons
+    r"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    r"\U0001F680-\U0001F6FF"  # transport & map symbols
+    r"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    r"\U00002700-\U000027BF"  # Dingbats
+    r"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
+    r"\U00002600-\U000026FF"  # Misc symbols
+    r"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
+    r"]+", flags=re.UNICODE)
+EMOJI_SEARCH_PATTERN = re.compile(r'[\U0001F600-\U0001FAFF\u2600-\u27BF]')
+EMOJI_MAPPING = {
+    'happy': '😊', 'smile': '😊', 'smiling': '😊', 'positive': '😊', 'joy': '😊', 'good': '😊',
+    'sad': '😞', 'frown': '😞', 'negative': '😞', 'unhappy': '😞', 'cry': '😢', 'angry': '😠',
+    'neutral': '😐', 'meh': '😐', 'ok': '😐', 'indifferent': '😐', 'traffic light': '🚦',
+    'warning': '⚠️', 'alert': '⚠️', 'danger': '🚨', 'fire': '🔥', 'money': '💰', 'love': '❤️',
+    'hospital': '🏥', 'police': '👮', 'school': '🏫', 'rain': '🌧️', 'sun': '☀️', 'cloud': '☁️',
+    'storm': '🌩️', 'flood': '🌊', 'accident': '💥', 'virus': '🦠', 'health': '🩺', 'crime': '🚔',
+    'protest': '✊', 'celebration': '🎉', 'party': '🥳', 'confused': '😕', 'shocked': '😲',
+    'surprised': '😮', 'disappointed': '😞', 'success': '🏆', 'failure': '❌', 'question': '❓',
+    'exclamation': '❗', 'star': '⭐', 'earth': '🌏', 'singapore': '🦁', 'lion': '🦁',
+    'government': '🏛️', 'airport': '🛫', 'train': '🚆', 'bus': '🚌', 'car': '🚗', 'plane': '✈️',
+    'food': '🍲', 'restaurant': '🍽️', 'shopping': '🛍️', 'market': '🛒', 'sports': '🏟️',
+    'music': '🎵', 'art': '🎨', 'technology': '💻', 'science': '🔬', 'education': '🎓',
+    'environment': '🌳', 'nature': '🌿', 'energy': '⚡', 'water': '💧', 'fireworks': '🎆',
+    'award': '🏅', 'medal': '🏅', 'trophy': '🏆', 'winner': '🏆', 'loser': '😞',
+}
+
+def map_to_emoji(emoji_value):
+    if not emoji_value:
+        return None
+    # If it's already a single emoji, return as is
+    if EMOJI_PATTERN.fullmatch(str(emoji_value).strip()):
+        return emoji_value.strip()
+    val = str(emoji_value).strip().lower()
+    # Try direct mapping
+    if val in EMOJI_MAPPING:
+        return EMOJI_MAPPING[val]
+    # Try to extract emoji from text (e.g. "neutral face (😐)")
+    match = EMOJI_SEARCH_PATTERN.search(str(emoji_value))
+    if match:
+        return match.group(0)
+    # Try to map by keywords in the value
+    for k, v in EMOJI_MAPPING.items():
+        if k in val:
+            return v
+    # Fallback: neutral face
+    return '😐'
+
+def record_gemini_usage(response):
+    """Add a response's token usage to the global counters and print it."""
     global GEMINI_TOTAL_IN_TOKENS, GEMINI_TOTAL_OUT_TOKENS
+    usage = getattr(response, 'usage_metadata', None)
+    if usage:
+        in_tokens = usage.prompt_token_count
+        out_tokens = usage.candidates_token_count
+        with _gemini_usage_lock:
+            if in_tokens is not None:
+                GEMINI_TOTAL_IN_TOKENS += in_tokens
+            if out_tokens is not None:
+                GEMINI_TOTAL_OUT_TOKENS += out_tokens
+        METRICS.inc('gemini_tokens_total', in_tokens or 0, direction='in')
+        METRICS.inc('gemini_tokens_total', out_tokens or 0, direction='out')
+        print(f"Gemini tokens used: in={in_tokens}, out={out_tokens}, total in={GEMINI_TOTAL_IN_TOKENS}, total out={GEMINI_TOTAL_OUT_TOKENS}")
+
+# Batched Gemini analysis: several articles share one prompt preamble and one round trip
+GEMINI_BATCH_SIZE = 10
+# Approximate input-token budget per batched request (~4 characters per token)
+GEMINI_BATCH_TOKEN_BUDGET = 6000
+
+GEMINI_BATCH_PROMPT = """
+Given the following news articles, respond ONLY with a valid JSON array (no explanation, no markdown, no extra text) containing one object per article, each with these fields:
+- id: the id of the article, exactly as given
+- is_sg_related: true if the article is about Singapore, false otherwise
+- place: The best Singapore place/building/office to put a map marker for this article (be specific, e.g. 'Changi Airport', 'Orchard Towers', 'Google Asia Pacific', etc.)
+- sentiment: positive, negative, or neutral
+- reason: a short reason for the sentiment
+- emoji: a single emoji that best represents the sentiment
+News articles (JSON):
+"""
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def make_gemini_batches(items, max_items=GEMINI_BATCH_SIZE, token_budget=GEMINI_BATCH_TOKEN_BUDGET):
+    """Split (id, title, content) items into batches bounded by item count and estimated tokens."""
+    batches = []
+    batch = []
+    tokens = estimate_tokens(GEMINI_BATCH_PROMPT)
+    for item in items:
+        cost = estimate_tokens(item[1]) + estimate_tokens(item[2]) + 20
+        if batch and (len(batch) >= max_items or tokens + cost > token_budget):
+            batches.append(batch)
+            batch = []
+            tokens = estimate_tokens(GEMINI_BATCH_PROMPT)
+        batch.append(item)
+        tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def parse_gemini_batch_response(text, ids):
     """
-    Use Google Gemini 2.0 Flash to get best place in Singapore for marker and sentiment analysis.
-    Returns (place_name, sentiment, reason, emoji, is_sg_related)
+    Parse a batched Gemini reply into {id: parsed_object} for the expected ids.
+    Objects with unknown ids or malformed JSON are ignored.
     """
-    import google.generativeai as genai
-    import time
-    import re
-    genai.configure(api_key=api_key)
-    prompt = f"""
+    text_clean = text.strip()
+    if text_clean.startswith('```'):
+        text_clean = re.sub(r'^```[a-zA-Z]*\n?', '', text_clean)
+        text_clean = re.sub(r'```$', '', text_clean).strip()
+    try:
+        parsed = json.loads(text_clean)
+    except Exception:
+        match = re.search(r'\[[\s\S]*\]', text_clean)
+        if not match:
+            return {}
+        json_str = re.sub(r'("sentiment"\s*:\s*)(neutral|positive|negative)([\s,}])', r'\1"\2"\3', match.group(0))
+        try:
+            parsed = json.loads(json_str)
+        except Exception:
+            return {}
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+    results = {}
+    for obj in parsed if isinstance(parsed, list) else []:
+        if isinstance(obj, dict) and str(obj.get('id')) in ids:
+            results[str(obj['id'])] = obj
+    return results
+
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+# Bump when the prompts change, so cached results record which prompt produced them
+GEMINI_PROMPT_VERSION = 2
+
+GEMINI_ARTICLE_PROMPT = """
     Given the following news article, respond ONLY with a valid JSON object with these fields (no explanation, no markdown, no extra text):\n
     - is_sg_related: true if the article is about Singapore, false otherwise
     - place: The best Singapore place/building/office to put a map marker for this article (be specific, e.g. 'Changi Airport', 'Orchard Towers', 'Google Asia Pacific', etc.)
@@ -86,219 +300,306 @@ def gemini_analyze_article(api_key, title, content, idx=None, total=None):
     News title: {title}
     News content: {content}
     """
-    model = genai.GenerativeModel('gemini-2.0-flash')  # Use Gemini Pro for best compatibility
-    # --- Emoji mapping: map common text/labels to Unicode emoji ---
-    def map_to_emoji(emoji_value):
-        if not emoji_value:
-            return None
-        # If it's already a single emoji, return as is
-        import re
-        emoji_pattern = re.compile(
-            r"[\U0001F600-\U0001F64F"  # emoticons
-            r"\U0001F300-\U0001F5FF"  # symbols & pictographs
-            r"\U0001F680-\U0001F6FF"  # transport & map symbols
-            r"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-            r"\U00002700-\U000027BF"  # Dingbats
-            r"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
-            r"\U00002600-\U000026FF"  # Misc symbols
-            r"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
-            r"]+", flags=re.UNICODE)
-        if emoji_pattern.fullmatch(str(emoji_value).strip()):
-            return emoji_value.strip()
-        # Common mappings
-        mapping = {
-            'happy': '😊', 'smile': '😊', 'smiling': '😊', 'positive': '😊', 'joy': '😊', 'good': '😊',
-            'sad': '😞', 'frown': '😞', 'negative': '😞', 'unhappy': '😞', 'cry': '😢', 'angry': '😠',
-            'neutral': '😐', 'meh': '😐', 'ok': '😐', 'indifferent': '😐', 'traffic light': '🚦',
-            'warning': '⚠️', 'alert': '⚠️', 'danger': '🚨', 'fire': '🔥', 'money': '💰', 'love': '❤️',
-            'hospital': '🏥', 'police': '👮', 'school': '🏫', 'rain': '🌧️', 'sun': '☀️', 'cloud': '☁️',
-            'storm': '🌩️', 'flood': '🌊', 'accident': '💥', 'virus': '🦠', 'health': '🩺', 'crime': '🚔',
-            'protest': '✊', 'celebration': '🎉', 'party': '🥳', 'confused': '😕', 'shocked': '😲',
-            'surprised': '😮', 'disappointed': '😞', 'success': '🏆', 'failure': '❌', 'question': '❓',
-            'exclamation': '❗', 'star': '⭐', 'earth': '🌏', 'singapore': '🦁', 'lion': '🦁',
-            'government': '🏛️', 'airport': '🛫', 'train': '🚆', 'bus': '🚌', 'car': '🚗', 'plane': '✈️',
-            'food': '🍲', 'restaurant': '🍽️', 'shopping': '🛍️', 'market': '🛒', 'sports': '🏟️',
-            'music': '🎵', 'art': '🎨', 'technology': '💻', 'science': '🔬', 'education': '🎓',
-            'environment': '🌳', 'nature': '🌿', 'energy': '⚡', 'water': '💧', 'fireworks': '🎆',
-            'award': '🏅', 'medal': '🏅', 'trophy': '🏆', 'winner': '🏆', 'loser': '😞',
-        }
-        val = str(emoji_value).strip().lower()
-        # Try direct mapping
-        if val in mapping:
-            return mapping[val]
-        # Try to extract emoji from text (e.g. "neutral face (😐)")
-        match = re.search(r'[\U0001F600-\U0001FAFF\u2600-\u27BF]', emoji_value)
-        if match:
-            return match.group(0)
-        # Try to map by keywords in the value
-        for k, v in mapping.items():
-            if k in val:
-                return v
-        # Fallback: neutral face
-        return '😐'
-
-    for attempt in range(2):  # Try at most twice
-        try:
-            response = model.generate_content(prompt)
-            # Print Gemini token usage if available
-            usage = getattr(response, 'usage_metadata', None)
-            if usage:
-                in_tokens = usage.prompt_token_count
-                out_tokens = usage.candidates_token_count
-                if in_tokens is not None:
-                    GEMINI_TOTAL_IN_TOKENS += in_tokens
-                if out_tokens is not None:
-                    GEMINI_TOTAL_OUT_TOKENS += out_tokens
-                print(f"Gemini tokens used: in={in_tokens}, out={out_tokens}, total in={GEMINI_TOTAL_IN_TOKENS}, total out={GEMINI_TOTAL_OUT_TOKENS}")
-            text = response.text if hasattr(response, 'text') else str(response)
-            if not text:
-                print(f"Gemini API error: No text in response: {response}")
+
+class GeminiAnalyzer:
+    """
+    Configured Gemini client and model, created once and reused for every
+    article and batch (google.generativeai is imported and configured here only).
+    Pass `model` to use any object with a generate_content(prompt) method instead.
+    """
+
+    def __init__(self, api_key=None, model_name=GEMINI_MODEL_NAME, model=None):
+        if model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(model_name)
+        self.model = model
+
+    def analyze_article(self, title, content):
+        """
+        Use Google Gemini 2.0 Flash to get best place in Singapore for marker and sentiment analysis.
+        Returns (place_name, sentiment, reason, emoji, is_sg_related)
+        """
+        prompt = GEMINI_ARTICLE_PROMPT.format(title=title, content=content)
+        for attempt in range(GEMINI_MAX_ATTEMPTS):
+            try:
+                GEMINI_LIMITER.acquire(estimate_tokens(prompt))
+                METRICS.inc('gemini_requests_total', kind='article')
+                with METRICS.timer('gemini_request_seconds', kind='article'):
+                    response = self.model.generate_content(prompt)
+                record_gemini_usage(response)
+                text = response.text if hasattr(response, 'text') else str(response)
+                if not text:
+                    print(f"Gemini API error: No text in response: {response}")
+                    continue
+                # --- Try to extract JSON object from the response, even with extra text ---
+                text_clean = text.strip()
+                # Remove Markdown code block if present
+                if text_clean.startswith('```'):
+                    text_clean = re.sub(r'^```[a-zA-Z]*\n?', '', text_clean)
+                    text_clean = re.sub(r'```$', '', text_clean).strip()
+                try:
+                    # Try direct parse
+                    parsed = json.loads(text_clean)
+                    emoji_fixed = map_to_emoji(parsed.get('emoji'))
+                    return parsed.get('place'), parsed.get('sentiment'), parsed.get('reason'), emoji_fixed, parsed.get('is_sg_related')
+                except Exception as e:
+                    # Try to extract JSON object from within extra text
+                    match = re.search(r'\{[\s\S]*\}', text_clean)
+                    if match:
+                        json_str = match.group(0)
+                        # Fix common Gemini mistakes: unquoted values, bad unicode, etc.
+                        # 1. Add quotes around unquoted neutral/positive/negative
+                        json_str = re.sub(r'("sentiment"\s*:\s*)(neutral|positive|negative)([\s,}])', r'\1"\2"\3', json_str)
+                        # 2. Fix bad unicode (replace \u-style escapes and invalid chars)
+                        json_str = json_str.encode('utf-8', 'replace').decode('utf-8', 'replace')
+                        try:
+                            parsed = json.loads(json_str)
+                            emoji_fixed = map_to_emoji(parsed.get('emoji'))
+                            return parsed.get('place'), parsed.get('sentiment'), parsed.get('reason'), emoji_fixed, parsed.get('is_sg_related')
+                        except Exception as e2:
+                            print(f"Gemini API JSON extract error: {e2}\nRaw text: {text}")
+                    print(f"Gemini API JSON parse error: {e}\nRaw text: {text}")
+                    continue
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                print(f"Gemini API request error: {e}")
+                if is_auth_error(e):
+                    print("Gemini API: API key rejected, not retrying.")
+                    return None, None, None, None, None
+                if attempt + 1 < GEMINI_MAX_ATTEMPTS:
+                    METRICS.inc('gemini_retries_total', reason='rate_limit' if rate_limited else 'error')
+                    delay = GEMINI_LIMITER.backoff(attempt, rate_limited=rate_limited)
+                    print(f"  Retrying in {delay:.1f}s{' (rate limited)' if rate_limited else ''}")
                 continue
-            # --- Try to extract JSON object from the response, even with extra text ---
-            text_clean = text.strip()
-            # Remove Markdown code block if present
-            if text_clean.startswith('```'):
-                text_clean = re.sub(r'^```[a-zA-Z]*\n?', '', text_clean)
-                text_clean = re.sub(r'```$', '', text_clean).strip()
-            import json as pyjson
+        print("Gemini API: Exceeded retry attempts after rate limit or errors.")
+        return None, None, None, None, None
+
+    def analyze_batch(self, items):
+        """
+        Analyze several articles in one Gemini request.
+        items is a list of (article_id, title, content); returns {article_id: (place_name,
+        sentiment, reason, emoji, is_sg_related)}. Articles missing from a reply that
+        arrived (unknown ids, malformed JSON) are retried by splitting the batch in
+        halves, down to single-article requests. A request that raises is retried
+        with backoff up to GEMINI_MAX_ATTEMPTS times, except when the API key is
+        rejected; if it still fails, every article gets (None, None, None, None, None),
+        as analyze_article returns, without further requests.
+        """
+        if len(items) == 1:
+            article_id, title, content = items[0]
+            return {article_id: self.analyze_article(title, content)}
+        # Short positional ids keep the prompt small; map them back afterwards
+        short_ids = {str(i): item for i, item in enumerate(items, 1)}
+        payload = [{'id': sid, 'title': title, 'content': content} for sid, (_, title, content) in short_ids.items()]
+        prompt = GEMINI_BATCH_PROMPT + json.dumps(payload, ensure_ascii=False)
+        parsed = {}
+        for attempt in range(GEMINI_MAX_ATTEMPTS):
             try:
-                # Try direct parse
-                parsed = pyjson.loads(text_clean)
-                emoji_fixed = map_to_emoji(parsed.get('emoji'))
-                return parsed.get('place'), parsed.get('sentiment'), parsed.get('reason'), emoji_fixed, parsed.get('is_sg_related')
+                GEMINI_LIMITER.acquire(estimate_tokens(prompt))
+                METRICS.inc('gemini_requests_total', kind='batch')
+                with METRICS.timer('gemini_request_seconds', kind='batch'):
+                    response = self.model.generate_content(prompt)
+                record_gemini_usage(response)
+                text = response.text if hasattr(response, 'text') else str(response)
+                parsed = parse_gemini_batch_response(text or '', short_ids)
+                break
             except Exception as e:
-                # Try to extract JSON object from within extra text
-                import re as _re
-                match = _re.search(r'\{[\s\S]*\}', text_clean)
-                if match:
-                    json_str = match.group(0)
-                    # Fix common Gemini mistakes: unquoted values, bad unicode, etc.
-                    # 1. Add quotes around unquoted neutral/positive/negative
-                    json_str = _re.sub(r'("sentiment"\s*:\s*)(neutral|positive|negative)([\s,}])', r'\1"\2"\3', json_str)
-                    # 2. Fix bad unicode (replace \u-style escapes and invalid chars)
-                    json_str = json_str.encode('utf-8', 'replace').decode('utf-8', 'replace')
-                    try:
-                        parsed = pyjson.loads(json_str)
-                        emoji_fixed = map_to_emoji(parsed.get('emoji'))
-                        return parsed.get('place'), parsed.get('sentiment'), parsed.get('reason'), emoji_fixed, parsed.get('is_sg_related')
-                    except Exception as e2:
-                        print(f"Gemini API JSON extract error: {e2}\nRaw text: {text}")
-                print(f"Gemini API JSON parse error: {e}\nRaw text: {text}")
+                rate_limited = is_rate_limit_error(e)
+                print(f"Gemini API batch request error: {e}")
+                # A rejected key fails every retry, and smaller requests would fail the same way
+                if is_auth_error(e) or attempt + 1 == GEMINI_MAX_ATTEMPTS:
+                    print(f"Gemini batch: request failed, {len(items)} articles left without a result.")
+                    METRICS.inc('gemini_batch_failures_total')
+                    return {article_id: (None, None, None, None, None) for article_id, _, _ in items}
+                METRICS.inc('gemini_retries_total', reason='rate_limit' if rate_limited else 'error')
+                delay = GEMINI_LIMITER.backoff(attempt, rate_limited=rate_limited)
+                print(f"  Retrying batch in {delay:.1f}s{' (rate limited)' if rate_limited else ''}")
+        results = {}
+        missing = []
+        for sid, item in short_ids.items():
+            obj = parsed.get(sid)
+            if obj is None:
+                missing.append(item)
                 continue
-        except Exception as e:
-            print(f"Gemini API request error: {e}")
-            time.sleep(2)
-            continue
-    print("Gemini API: Exceeded retry attempts after rate limit or errors.")
-    return None, None, None, None, None
+            results[item[0]] = (obj.get('place'), obj.get('sentiment'), obj.get('reason'), map_to_emoji(obj.get('emoji')), obj.get('is_sg_related'))
+        if missing:
+            print(f"Gemini batch: {len(missing)} of {len(items)} articles missing from reply, retrying in smaller batches.")
+            METRICS.inc('gemini_retries_total', reason='split')
+            half = (len(missing) + 1) // 2
+            for part in (missing[:half], missing[half:]):
+                if part:
+                    results.update(self.analyze_batch(part))
+        return results
+
+_gemini_analyzers = {}
+_gemini_analyzers_lock = threading.Lock()
+
+def get_gemini_analyzer(api_key):
+    """Return the long-lived GeminiAnalyzer for api_key, creating it on first use."""
+    with _gemini_analyzers_lock:
+        if api_key not in _gemini_analyzers:
+            _gemini_analyzers[api_key] = GeminiAnalyzer(api_key)
+        return _gemini_analyzers[api_key]
+
+def gemini_analyze_article(api_key, title, content, idx=None, total=None):
+    """
+    Use Google Gemini 2.0 Flash to get best place in Singapore for marker and sentiment analysis.
+    Returns (place_name, sentiment, reason, emoji, is_sg_related)
+    """
+    return get_gemini_analyzer(api_key).analyze_article(title, content)
+
+def gemini_analyze_batch(api_key, items):
+    """Analyze (article_id, title, content) items in batched requests; see GeminiAnalyzer.analyze_batch."""
+    return get_gemini_analyzer(api_key).analyze_batch(items)
 
 def is_in_singapore(lat, lon):
     """Return True if coordinates are within Singapore's bounding box."""
     return 1.130 <= lat <= 1.480 and 103.6 <= lon <= 104.1
 
-def plot_emojis_on_map(articles_with_sentiment):
-    # --- Emoji mapping: map common text/labels to Unicode emoji ---
-    def map_to_emoji(emoji_value):
-        if not emoji_value:
+# How article markers are drawn: 'geojson' puts them all in one clustered GeoJSON
+# layer with shared CSS and lazily built popups; 'markers' adds one folium.Marker each
+MAP_RENDER_MODE = os.environ.get('MAP_RENDER_MODE', 'geojson')
+MAP_OUTPUT_PATH = 'singapore_news_sentiment_map.html'
+# 'shell' output: a static map page that fetches its markers from this JSON file
+MAP_DATA_PATH = 'singapore_news_sentiment_map.json'
+MAP_DATA_VERSION = 1
+MAP_SHELL_VERSION = 3
+OVERALL_COORDS = [1.285, 103.905]  # Approx. sea below Marine Parade
+SG_COORDS = [1.3521, 103.8198]
+SENTIMENT_EMOJIS = {'positive': '😊', 'negative': '😞', 'neutral': '😐'}
+
+def marker_groups(articles_with_sentiment, clusters=None, report=True):
+    """
+    The articles that get a map marker, as a list of groups: one group per
+    near-duplicate cluster (see dedup.find_clusters) or per unclustered
+    article, holding its Singapore-related articles with complete Gemini
+    results. The first article of a group is the one that is geocoded and
+    shown. With report, skipped articles are printed and logged.
+    """
+    from dedup import cluster_index, article_id as cache_id
+    member_of = cluster_index(clusters)
+    # Articles grouped by cluster, in order of each group's first article
+    groups = {}
+    for article in articles_with_sentiment:
+        article_id = cache_id(article)
+        groups.setdefault(member_of.get(article_id, ('article', id(article))), []).append(article)
+    usable_groups = []
+    for members in groups.values():
+        usable = [article for article in members if usable_for_marker(article, report=report)]
+        if usable:
+            usable_groups.append(usable)
+    return usable_groups
+
+def geocode_articles(articles_with_sentiment, clusters=None, workers=GEOCODE_WORKERS):
+    """
+    Geocode the places of the articles that get a marker (one place per
+    near-duplicate cluster). Returns {normalized place name: [lat, lon] or None}
+    for collect_map_markers(places=...).
+    """
+    groups = marker_groups(articles_with_sentiment, clusters)
+    return geocode_places([usable[0].get('place') for usable in groups], workers=workers)
+
+def geocode_places(place_names, workers=GEOCODE_WORKERS):
+    """
+    Resolve place names to Singapore coordinates, each distinct name once.
+    Names are deduplicated by normalize_place_name ('Changi Airport.' and
+    'changi airport' are one lookup). Places known to the gazetteer or the
+    geocode cache are resolved first; the rest are geocoded on up to `workers`
+    threads, within the shared OneMap/Nominatim rate limits.
+    Returns {normalized place name: [lat, lon] or None}.
+    """
+    unique = {}
+    for place_name in place_names:
+        if place_name:
+            unique.setdefault(normalize_place_name(place_name), place_name)
+    print(f"Geocoding {len(unique)} distinct places for {len(place_names)} markers...")
+    places = {}
+    remote = {}
+    for key, place_name in unique.items():
+        hit, coords = lookup_place_offline(place_name)
+        if hit and (not coords or is_in_singapore(coords[0], coords[1])):
+            places[key] = coords
+        else:
+            remote[key] = (place_name, (hit, coords))
+    _report_geocoding(len(places), len(unique))
+    if remote:
+        print(f"Geocoding {len(remote)} places remotely, {max(1, min(workers, len(remote)))} at a time...")
+        if workers > 1 and len(remote) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(remote)), thread_name_prefix='geocode') as executor:
+                futures = {executor.submit(resolve_place, *remote[key]): key for key in remote}
+                for future in as_completed(futures):
+                    places[futures[future]] = future.result()
+                    _report_geocoding(len(places), len(unique))
+        else:
+            for key, (place_name, offline) in remote.items():
+                places[key] = resolve_place(place_name, offline)
+                _report_geocoding(len(places), len(unique))
+    gazetteer = get_gazetteer()
+    print(f"Gazetteer: {gazetteer.hits} hits, {gazetteer.misses} misses")
+    geocode_stats = get_geocode_cache().stats()
+    print(f"Geocode cache: {geocode_stats['hits']} hits, {geocode_stats['misses']} misses ({geocode_stats['hit_rate']:.0%} hit rate)")
+    METRICS.set('geocode_cache_hit_ratio', round(geocode_stats['hit_rate'], 4))
+    METRICS.set('geocode_places', len(unique))
+    return places
+
+def resolve_place(place_name, offline=None):
+    """
+    Coordinates of a place in Singapore, retrying with 'Singapore' appended if
+    it resolves elsewhere; None if not found. `offline` is the result of
+    lookup_place_offline(place_name) when the caller already has it.
+    """
+    hit, coord = offline or lookup_place_offline(place_name)
+    if not hit:
+        coord = lookup_place_remote(place_name)
+    # Check if coordinates are in Singapore
+    if coord and not is_in_singapore(coord[0], coord[1]):
+        print(f"  Geocoded place out of Singapore: {coord} for {place_name}. Retrying with 'Singapore' appended.")
+        coord = get_sg_location_coords(f"{place_name} Singapore")
+        if coord and not is_in_singapore(coord[0], coord[1]):
+            print(f"  Still out of Singapore: {coord}. Skipping marker.")
             return None
-        import re
-        emoji_pattern = re.compile(
-            r"[\U0001F600-\U0001F64F"  # emoticons
-            r"\U0001F300-\U0001F5FF"  # symbols & pictographs
-            r"\U0001F680-\U0001F6FF"  # transport & map symbols
-            r"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-            r"\U00002700-\U000027BF"  # Dingbats
-            r"\U0001F900-\U0001F9FF"  # Supplemental Symbols and Pictographs
-            r"\U00002600-\U000026FF"  # Misc symbols
-            r"\U0001FA70-\U0001FAFF"  # Symbols and Pictographs Extended-A
-            r"]+", flags=re.UNICODE)
-        if emoji_pattern.fullmatch(str(emoji_value).strip()):
-            return emoji_value.strip()
-        mapping = {
-            'happy': '😊', 'smile': '😊', 'smiling': '😊', 'positive': '😊', 'joy': '😊', 'good': '😊',
-            'sad': '😞', 'frown': '😞', 'negative': '😞', 'unhappy': '😞', 'cry': '😢', 'angry': '😠',
-            'neutral': '😐', 'meh': '😐', 'ok': '😐', 'indifferent': '😐', 'traffic light': '🚦',
-            'warning': '⚠️', 'alert': '⚠️', 'danger': '🚨', 'fire': '🔥', 'money': '💰', 'love': '❤️',
-            'hospital': '🏥', 'police': '👮', 'school': '🏫', 'rain': '🌧️', 'sun': '☀️', 'cloud': '☁️',
-            'storm': '🌩️', 'flood': '🌊', 'accident': '💥', 'virus': '🦠', 'health': '🩺', 'crime': '🚔',
-            'protest': '✊', 'celebration': '🎉', 'party': '🥳', 'confused': '😕', 'shocked': '😲',
-            'surprised': '😮', 'disappointed': '😞', 'success': '🏆', 'failure': '❌', 'question': '❓',
-            'exclamation': '❗', 'star': '⭐', 'earth': '🌏', 'singapore': '🦁', 'lion': '🦁',
-            'government': '🏛️', 'airport': '🛫', 'train': '🚆', 'bus': '🚌', 'car': '🚗', 'plane': '✈️',
-            'food': '🍲', 'restaurant': '🍽️', 'shopping': '🛍️', 'market': '🛒', 'sports': '🏟️',
-            'music': '🎵', 'art': '🎨', 'technology': '💻', 'science': '🔬', 'education': '🎓',
-            'environment': '🌳', 'nature': '🌿', 'energy': '⚡', 'water': '💧', 'fireworks': '🎆',
-            'award': '🏅', 'medal': '🏅', 'trophy': '🏆', 'winner': '🏆', 'loser': '😞',
-        }
-        val = str(emoji_value).strip().lower()
-        if val in mapping:
-            return mapping[val]
-        match = re.search(r'[\U0001F600-\U0001FAFF\u2600-\u27BF]', emoji_value)
-        if match:
-            return match.group(0)
-        for k, v in mapping.items():
-            if k in val:
-                return v
-        return '😐'
-    api_key = load_gemini_api_key()
-    overall_coords = [1.285, 103.905]  # Approx. sea below Marine Parade
-    sg_coords = [1.3521, 103.8198]
-    m = folium.Map(location=sg_coords, zoom_start=12)
-    sentiments = []
-    marker_count = 0
-    outlet_sentiment = {}
+    return coord
+
+def collect_map_markers(articles_with_sentiment, clusters=None, places=None):
+    """
+    Map markers for the Singapore-related articles that have complete Gemini results.
+    Returns a list of marker dicts (lat, lon, emoji, source, title, reason,
+    sentiment, url, cluster_size, related); markers at the same spot are
+    spread out slightly.
+    With `clusters` (see dedup.find_clusters), near-duplicate articles get one
+    marker: the first usable member is shown, and the others are listed in its
+    `related` entries (source, title, url, sentiment). cluster_size counts every
+    article of the story, including members that get no marker of their own
+    (not Singapore-related, or without complete Gemini results).
+    `places` are the coordinates from geocode_articles; without them the
+    articles are geocoded first. With them no network or cache lookup is made.
+    """
+    import math
+    from dedup import cluster_index, article_id as cache_id
+    member_of = cluster_index(clusters)
+    if places is None:
+        groups = marker_groups(articles_with_sentiment, clusters)
+        places = geocode_places([usable[0].get('place') for usable in groups])
+    else:
+        groups = marker_groups(articles_with_sentiment, clusters, report=False)
+    markers = []
     # Track marker positions to avoid overlap
     marker_positions = {}
-    # Debug: count articles with valid Gemini fields
-    valid_articles = [a for a in articles_with_sentiment if a.get('place') and a.get('sentiment') and a.get('emoji')]
-    print(f"Articles with valid Gemini fields: {len(valid_articles)} / {len(articles_with_sentiment)}")
-    if len(valid_articles) == 0 and len(articles_with_sentiment) > 0:
-        print("No articles with valid Gemini fields found. Forcing reprocessing with Gemini...")
-        articles_with_sentiment = process_articles_with_gemini(articles_with_sentiment)
-    total_articles = len(articles_with_sentiment)
-    for idx, article in enumerate(articles_with_sentiment, 1):
-        print(f"Processing article {idx} of {total_articles}: {article.get('title', '')[:60]}")
+    for usable in groups:
+        article = usable[0]
         title = article.get('title', '')
-        content = article.get('content', '')
         url = article.get('url', '')
         # Use Gemini results from cache (do NOT call Gemini here)
         place_name = article.get('place')
         sentiment = article.get('sentiment')
         reason = article.get('reason')
         emoji = map_to_emoji(article.get('emoji'))
-        is_sg_related = article.get('is_sg_related')
-        if is_sg_related is not True:
-            print(f"  Skipping non-Singapore related article: {title}")
-            continue
-        missing_fields = []
-        if not place_name:
-            missing_fields.append('place')
-        if not sentiment:
-            missing_fields.append('sentiment')
-        if not emoji:
-            missing_fields.append('emoji')
-        if missing_fields:
-            print(f"  Gemini result missing fields {missing_fields} for: {title}")
-            # Optionally log the problematic article for debugging
-            try:
-                with open('gemini_missing_results.log', 'a', encoding='utf-8') as logf:
-                    import json as _json
-                    logf.write(_json.dumps({'title': title, 'missing_fields': missing_fields, 'article': article}, ensure_ascii=False) + '\n')
-            except Exception as log_exc:
-                print(f"    (Could not log missing Gemini result: {log_exc})")
-            continue
-        # Geocode the place_name
-        coord = get_sg_location_coords(place_name)
-        # Check if coordinates are in Singapore
-        if coord and not is_in_singapore(coord[0], coord[1]):
-            print(f"  Geocoded place out of Singapore: {coord} for {place_name}. Retrying with 'Singapore' appended.")
-            coord = get_sg_location_coords(f"{place_name} Singapore")
-            if coord and not is_in_singapore(coord[0], coord[1]):
-                print(f"  Still out of Singapore: {coord}. Skipping marker.")
-                continue
+        coord = places.get(normalize_place_name(place_name))
         if not coord:
             print(f"  Could not geocode place: {place_name}")
             continue
+        cluster = member_of.get(cache_id(article))
         # --- Overlap avoidance logic ---
         coord_key = (round(coord[0], 6), round(coord[1], 6))
         count = marker_positions.get(coord_key, 0)
@@ -306,71 +607,399 @@ def plot_emojis_on_map(articles_with_sentiment):
         # Offset each marker slightly if there are overlaps
         offset_distance = 0.00015  # ~15 meters
         angle = (count * 45) % 360  # Spread out in a circle
-        import math
-        lat_offset = offset_distance * math.cos(math.radians(angle))
-        lon_offset = offset_distance * math.sin(math.radians(angle))
-        marker_lat = coord[0] + lat_offset
-        marker_lon = coord[1] + lon_offset
-        print(f"  Placing marker at: {[marker_lat, marker_lon]} for {place_name} (offset {count})")
+        marker_lat = coord[0] + offset_distance * math.cos(math.radians(angle))
+        marker_lon = coord[1] + offset_distance * math.sin(math.radians(angle))
+        markers.append({
+            'lat': marker_lat, 'lon': marker_lon, 'emoji': emoji,
+            'source': article.get('source', 'Unknown'), 'title': title,
+            'reason': reason, 'sentiment': sentiment, 'url': url,
+            'cluster_size': max(len(usable), len(clusters[cluster]) if cluster else 1),
+            'related': [
+                {'source': other.get('source', 'Unknown'), 'title': other.get('title', ''),
+                 'url': other.get('url', ''), 'sentiment': other.get('sentiment')}
+                for other in usable[1:]
+            ],
+        })
+    print(f"Placed {len(markers)} markers for {sum(len(usable) for usable in groups)} articles.")
+    return markers
+
+def usable_for_marker(article, report=True):
+    """True for a Singapore-related article with complete Gemini results (with report, problems are printed and logged)."""
+    title = article.get('title', '')
+    if article.get('is_sg_related') is not True:
+        if report:
+            print(f"  Skipping non-Singapore related article: {title}")
+        return False
+    missing_fields = []
+    if not article.get('place'):
+        missing_fields.append('place')
+    if not article.get('sentiment'):
+        missing_fields.append('sentiment')
+    if not map_to_emoji(article.get('emoji')):
+        missing_fields.append('emoji')
+    if missing_fields and not report:
+        return False
+    if missing_fields:
+        print(f"  Gemini result missing fields {missing_fields} for: {title}")
+        # Optionally log the problematic article for debugging
+        try:
+            with open('gemini_missing_results.log', 'a', encoding='utf-8') as logf:
+                logf.write(json.dumps({'title': title, 'missing_fields': missing_fields, 'article': article}, ensure_ascii=False) + '\n')
+        except Exception as log_exc:
+            print(f"    (Could not log missing Gemini result: {log_exc})")
+        return False
+    return True
+
+def _report_geocoding(done, total):
+    if done and progress_enabled():
+        emit_progress('progress', 'geocode', i=done, n=total, gazetteer_hits=get_gazetteer().hits, geocode_cache_hits=get_geocode_cache().hits)
+
+def overview_summary(markers):
+    """Overall sentiment and per-outlet counts of the markers, or None if there are none."""
+    if not markers:
+        return None
+    from datetime import datetime
+    import pytz
+    outlet_sentiment = {}
+    # Every article counts, including the other articles of a clustered story
+    articles = [article for marker in markers for article in [marker, *(marker.get('related') or [])]]
+    for article in articles:
+        counts = outlet_sentiment.setdefault(article['source'], {'positive': 0, 'negative': 0, 'neutral': 0})
+        if article['sentiment'] in counts:
+            counts[article['sentiment']] += 1
+    overall = Counter(article['sentiment'] for article in articles).most_common(1)[0][0]
+    now = datetime.now(pytz.timezone('Asia/Singapore'))
+    return {
+        'overall': overall,
+        'overall_emoji': SENTIMENT_EMOJIS.get(overall, '😐'),
+        'outlets': outlet_sentiment,
+        # Last updated date and time (Singapore time)
+        'last_updated': now.strftime('%d-%m-%Y %I:%M:%S %p'),
+        'date': now.strftime('%d-%m-%Y'),
+    }
+
+def add_overview_marker(m, summary):
+    import folium
+    # Build HTML table for outlet sentiment counts
+    table_html = '<table border="1" style="border-collapse:collapse;font-size:12px;margin-top:6px;">'
+    table_html += '<tr><th>News Outlet</th><th>Positive</th><th>Neutral</th><th>Negative</th></tr>'
+    pos_total = neg_total = neu_total = 0
+    for outlet, counts in summary['outlets'].items():
+        table_html += f'<tr><td>{outlet}</td><td>{counts["positive"]}</td><td>{counts["neutral"]}</td><td>{counts["negative"]}</td></tr>'
+        pos_total += counts["positive"]
+        neg_total += counts["negative"]
+        neu_total += counts["neutral"]
+    total_articles = pos_total + neg_total + neu_total
+    table_html += f'<tr style="font-weight:bold;background:#f0f0f0;"><td>Subtotal</td><td>{pos_total}</td><td>{neu_total}</td><td>{neg_total}</td></tr>'
+    table_html += f'<tr style="font-weight:bold;background:#e0e0e0;"><td colspan="4">Total News Articles: {total_articles}</td></tr>'
+    table_html += '</table>'
+    last_updated_html = f'<div style="font-size:11px;color:#555;margin-top:4px;">Last updated: {summary["last_updated"]}</div>'
+    overall, overall_emoji = summary['overall'], summary['overall_emoji']
+    # Last updated date in DD-MM-YYYY, styled below "Overview"
+    folium.Marker(
+        location=OVERALL_COORDS,
+        popup=folium.Popup(f"<b>Overall Singapore Sentiment</b><br>{overall.title()} {overall_emoji}{table_html}{last_updated_html}", max_width=400),
+        icon=folium.DivIcon(html=f"""
+            <div style='font-size:40px; line-height:40px; text-align:center; background: white; border: 2px solid #0000FF; border-radius: 12px; width: 260px; height: 110px; display: flex; flex-direction: column; align-items: center; justify-content: center; box-shadow: 0 0 8px #0003; font-family: 'Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji', 'Twemoji Mozilla', 'Arial';'>
+                <div style='display: flex; align-items: center; justify-content: center; margin-top: 8px;'>
+                    {overall_emoji}<span style='font-size:28px; font-weight:bold; color:#111; margin-left:14px;'>Overview</span>
+                </div>
+                <div style='font-size:20px; color:#333; margin-top:8px; font-weight:normal;'>{summary['date']}</div>
+            </div>
+        """.strip())
+    ).add_to(m)
+
+def add_folium_markers(m, markers):
+    """One folium.Marker with an inline-styled DivIcon and popup per article (legacy rendering)."""
+    import folium
+    for marker in markers:
         # Add news source URL to popup if available
+        url = marker['url']
         url_html = f'<br><a href="{url}" target="_blank">Read full article</a>' if url else ''
-        popup = folium.Popup(f"<b>{article['source']}</b><br>{title}<br>{reason}<br>Sentiment: {sentiment} {emoji}{url_html}", max_width=300)
+        related = marker.get('related') or []
+        related_html = ''
+        if marker.get('cluster_size', 1) > 1:
+            related_html = f"<br><i>Same story in {marker['cluster_size']} articles{':' if related else ''}</i>" + ''.join(
+                f'<br><a href="{other["url"]}" target="_blank">{other["source"]}</a>: {other["title"]}' if other['url']
+                else f'<br>{other["source"]}: {other["title"]}'
+                for other in related
+            )
+        popup = folium.Popup(f"<b>{marker['source']}</b><br>{marker['title']}<br>{marker['reason']}<br>Sentiment: {marker['sentiment']} {marker['emoji']}{url_html}{related_html}", max_width=300)
         folium.Marker(
-            location=[marker_lat, marker_lon],
+            location=[marker['lat'], marker['lon']],
             popup=popup,
             icon=folium.DivIcon(html=f"""
                 <div style='font-size:32px; line-height:32px; text-align:center; background: white; border-radius: 50%; width: 40px; height: 40px; display: flex; align-items: center; justify-content: center; border: 1px solid #888; font-family: 'Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji', 'Twemoji Mozilla', 'Arial';'>
-                    {emoji}<span style='font-size:10px; color:#888;'>(news)</span>
-                </div>
-            """.strip())
-        ).add_to(m)
-        # Track sentiment counts by outlet
-        source = article.get('source', 'Unknown')
-        if source not in outlet_sentiment:
-            outlet_sentiment[source] = {'positive': 0, 'negative': 0, 'neutral': 0}
-        if sentiment in outlet_sentiment[source]:
-            outlet_sentiment[source][sentiment] += 1
-        sentiments.append(sentiment)
-        marker_count += 1
-    # Overall sentiment
-    if sentiments:
-        from collections import Counter
-        from datetime import datetime
-        import pytz
-        overall = Counter(sentiments).most_common(1)[0][0]
-        overall_emoji = {'positive': '😊', 'negative': '😞', 'neutral': '😐'}.get(overall, '😐')
-        # Build HTML table for outlet sentiment counts
-        table_html = '<table border="1" style="border-collapse:collapse;font-size:12px;margin-top:6px;">'
-        table_html += '<tr><th>News Outlet</th><th>Positive</th><th>Neutral</th><th>Negative</th></tr>'
-        pos_total = neg_total = neu_total = 0
-        for outlet, counts in outlet_sentiment.items():
-            table_html += f'<tr><td>{outlet}</td><td>{counts["positive"]}</td><td>{counts["neutral"]}</td><td>{counts["negative"]}</td></tr>'
-            pos_total += counts["positive"]
-            neg_total += counts["negative"]
-            neu_total += counts["neutral"]
-        total_articles = pos_total + neg_total + neu_total
-        table_html += f'<tr style="font-weight:bold;background:#f0f0f0;"><td>Subtotal</td><td>{pos_total}</td><td>{neu_total}</td><td>{neg_total}</td></tr>'
-        table_html += f'<tr style="font-weight:bold;background:#e0e0e0;"><td colspan="4">Total News Articles: {total_articles}</td></tr>'
-        table_html += '</table>'
-        # Add last updated date and time (Singapore time)
-        now = datetime.now(pytz.timezone('Asia/Singapore'))
-        last_updated = now.strftime('%d-%m-%Y %I:%M:%S %p')
-        last_updated_html = f'<div style="font-size:11px;color:#555;margin-top:4px;">Last updated: {last_updated}</div>'
-        # Format last updated date in DD-MM-YYYY and style it below "Overview"
-        last_updated_ddmmyyyy = now.strftime('%d-%m-%Y')
-        folium.Marker(
-            location=overall_coords,
-            popup=folium.Popup(f"<b>Overall Singapore Sentiment</b><br>{overall.title()} {overall_emoji}{table_html}{last_updated_html}", max_width=400),
-            icon=folium.DivIcon(html=f"""
-                <div style='font-size:40px; line-height:40px; text-align:center; background: white; border: 2px solid #0000FF; border-radius: 12px; width: 260px; height: 110px; display: flex; flex-direction: column; align-items: center; justify-content: center; box-shadow: 0 0 8px #0003; font-family: 'Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji', 'Twemoji Mozilla', 'Arial';'>
-                    <div style='display: flex; align-items: center; justify-content: center; margin-top: 8px;'>
-                        {overall_emoji}<span style='font-size:28px; font-weight:bold; color:#111; margin-left:14px;'>Overview</span>
-                    </div>
-                    <div style='font-size:20px; color:#333; margin-top:8px; font-weight:normal;'>{last_updated_ddmmyyyy}</div>
+                    {marker['emoji']}<span style='font-size:10px; color:#888;'>(news)</span>
                 </div>
             """.strip())
         ).add_to(m)
-    # --- Inject JS to expose Leaflet map as window.map for Home button ---
+
+def markers_to_geojson(markers):
+    """
+    Compact GeoJSON FeatureCollection of markers, with short property names.
+    Markers for a story told in several articles get 'n', the number of
+    articles, and 'o': [[source, title, url], ...] for the others shown on the map.
+    """
+    features = []
+    for marker in markers:
+        properties = {
+            'e': marker['emoji'], 's': marker['source'], 't': marker['title'],
+            'r': marker['reason'] or '', 'm': marker['sentiment'], 'u': marker['url'] or '',
+        }
+        if marker.get('cluster_size', 1) > 1:
+            properties['n'] = marker['cluster_size']
+        if marker.get('related'):
+            properties['o'] = [[other['source'], other['title'], other['url'] or ''] for other in marker['related']]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(marker['lon'], 6), round(marker['lat'], 6)]},
+            'properties': properties,
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+# Shared marker/popup code for clustered GeoJSON layers. Popups are built from the
+# feature's properties when first opened, with text inserted as text (not HTML).
+NEWS_LAYER_CSS = """
+.sg-news-icon { background: none; border: none; }
+.sg-news-marker { font-size: 32px; line-height: 32px; text-align: center; background: white; border-radius: 50%; width: 40px; height: 40px; display: flex; align-items: center; justify-content: center; border: 1px solid #888; font-family: 'Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji', 'Twemoji Mozilla', 'Arial'; }
+.sg-news-marker span { font-size: 10px; color: #888; }
+"""
+NEWS_LAYER_JS = """
+function sgNewsPopup(p) {
+    var div = document.createElement('div');
+    var source = document.createElement('b');
+    source.textContent = p.s;
+    div.appendChild(source);
+    [p.t, p.r, 'Sentiment: ' + p.m + ' ' + p.e].forEach(function(text) {
+        div.appendChild(document.createElement('br'));
+        div.appendChild(document.createTextNode(text));
+    });
+    if (p.u) {
+        var link = document.createElement('a');
+        link.href = p.u;
+        link.target = '_blank';
+        link.textContent = 'Read full article';
+        div.appendChild(document.createElement('br'));
+        div.appendChild(link);
+    }
+    if (p.n > 1) {
+        var heading = document.createElement('i');
+        heading.textContent = 'Same story in ' + p.n + ' articles' + (p.o && p.o.length ? ':' : '');
+        div.appendChild(document.createElement('br'));
+        div.appendChild(heading);
+    }
+    if (p.o) {
+        p.o.forEach(function(other) {
+            var source = document.createElement(other[2] ? 'a' : 'span');
+            source.textContent = other[0];
+            if (other[2]) {
+                source.href = other[2];
+                source.target = '_blank';
+            }
+            div.appendChild(document.createElement('br'));
+            div.appendChild(source);
+            div.appendChild(document.createTextNode(': ' + other[1]));
+        });
+    }
+    return div;
+}
+function sgNewsLayer(data) {
+    var icons = {};
+    var cluster = L.markerClusterGroup({maxClusterRadius: 40, showCoverageOnHover: false});
+    L.geoJSON(data, {
+        pointToLayer: function(feature, latlng) {
+            var emoji = feature.properties.e;
+            if (!icons[emoji]) {
+                var html = document.createElement('div');
+                html.className = 'sg-news-marker';
+                html.textContent = emoji;
+                html.innerHTML += '<span>(news)</span>';
+                icons[emoji] = L.divIcon({className: 'sg-news-icon', html: html.outerHTML, iconSize: [40, 40]});
+            }
+            return L.marker(latlng, {icon: icons[emoji]});
+        },
+        onEachFeature: function(feature, layer) {
+            layer.bindPopup(function() { return sgNewsPopup(feature.properties); }, {maxWidth: 300});
+        }
+    }).eachLayer(function(layer) { cluster.addLayer(layer); });
+    return cluster;
+}
+"""
+
+# Overview marker drawn from the summary in a map data file (same look as add_overview_marker)
+OVERVIEW_JS = """
+function sgEscape(text) {
+    var div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+function sgOverviewMarker(summary, latlng) {
+    var table = '<table border="1" style="border-collapse:collapse;font-size:12px;margin-top:6px;">'
+        + '<tr><th>News Outlet</th><th>Positive</th><th>Neutral</th><th>Negative</th></tr>';
+    var pos = 0, neu = 0, neg = 0;
+    Object.keys(summary.outlets).forEach(function(outlet) {
+        var c = summary.outlets[outlet];
+        table += '<tr><td>' + sgEscape(outlet) + '</td><td>' + c.positive + '</td><td>' + c.neutral + '</td><td>' + c.negative + '</td></tr>';
+        pos += c.positive; neu += c.neutral; neg += c.negative;
+    });
+    table += '<tr style="font-weight:bold;background:#f0f0f0;"><td>Subtotal</td><td>' + pos + '</td><td>' + neu + '</td><td>' + neg + '</td></tr>'
+        + '<tr style="font-weight:bold;background:#e0e0e0;"><td colspan="4">Total News Articles: ' + (pos + neu + neg) + '</td></tr></table>';
+    var overall = summary.overall.charAt(0).toUpperCase() + summary.overall.slice(1);
+    var popup = '<b>Overall Singapore Sentiment</b><br>' + overall + ' ' + summary.overall_emoji + table
+        + '<div style="font-size:11px;color:#555;margin-top:4px;">Last updated: ' + summary.last_updated + '</div>';
+    var icon = L.divIcon({className: 'sg-news-icon', iconSize: [260, 110], html:
+        '<div class="sg-overview-marker"><div>' + summary.overall_emoji + '<span>Overview</span></div>'
+        + '<div class="sg-overview-date">' + summary.date + '</div></div>'});
+    return L.marker(latlng, {icon: icon}).bindPopup(popup, {maxWidth: 400});
+}
+"""
+OVERVIEW_CSS = """
+.sg-overview-marker { font-size: 40px; line-height: 40px; text-align: center; background: white; border: 2px solid #0000FF; border-radius: 12px; width: 260px; height: 110px; display: flex; flex-direction: column; align-items: center; justify-content: center; box-shadow: 0 0 8px #0003; font-family: 'Segoe UI Emoji', 'Apple Color Emoji', 'Noto Color Emoji', 'Twemoji Mozilla', 'Arial'; }
+.sg-overview-marker > div:first-child { display: flex; align-items: center; justify-content: center; margin-top: 8px; }
+.sg-overview-marker span { font-size: 28px; font-weight: bold; color: #111; margin-left: 14px; }
+.sg-overview-date { font-size: 20px; color: #333; margin-top: 8px; font-weight: normal; }
+"""
+
+def _news_layer_class():
+    from branca.element import MacroElement, Template
+    from folium.elements import JSCSSMixin
+    from folium.plugins import MarkerCluster
+
+    class ClusteredNewsLayer(JSCSSMixin, MacroElement):
+        """All article markers as one GeoJSON layer, clustered client-side."""
+        _template = Template("""
+            {% macro header(this, kwargs) %}
+                <style>{{ this.css }}</style>
+            {% endmacro %}
+            {% macro script(this, kwargs) %}
+                {{ this.js }}
+                var {{ this.get_name() }} = sgNewsLayer({{ this.data }}).addTo({{ this._parent.get_name() }});
+            {% endmacro %}
+        """)
+        default_js = MarkerCluster.default_js
+        default_css = MarkerCluster.default_css
+
+        def __init__(self, geojson):
+            super().__init__()
+            self._name = 'ClusteredNewsLayer'
+            self.css = NEWS_LAYER_CSS
+            self.js = NEWS_LAYER_JS
+            # Keep '</script>' in article text from closing the script element
+            self.data = json.dumps(geojson, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+    return ClusteredNewsLayer
+
+def _map_shell_loader_class():
+    from branca.element import MacroElement, Template
+    from folium.elements import JSCSSMixin
+    from folium.plugins import MarkerCluster
+
+    class MapDataLoader(JSCSSMixin, MacroElement):
+        """
+        Draws the markers and overview of a map data file. Uses window.SG_MAP_DATA
+        when the page was given the data inline, otherwise fetches data_url.
+        """
+        _template = Template("""
+            {% macro header(this, kwargs) %}
+                <meta name="sg-map-shell" content="{{ this.shell_id }}">
+                <style>{{ this.css }}</style>
+            {% endmacro %}
+            {% macro script(this, kwargs) %}
+                {{ this.js }}
+                (function(map) {
+                    function render(data) {
+                        sgNewsLayer(data.markers).addTo(map);
+                        if (data.summary) {
+                            sgOverviewMarker(data.summary, {{ this.overall_coords }}).addTo(map);
+                        }
+                    }
+                    if (window.SG_MAP_DATA) {
+                        render(window.SG_MAP_DATA);
+                        return;
+                    }
+                    fetch({{ this.data_url }} + '?t=' + Date.now(), {cache: 'no-store'})
+                        .then(function(response) { return response.json(); })
+                        .then(render)
+                        .catch(function(error) { console.error('Could not load map data', error); });
+                })({{ this._parent.get_name() }});
+            {% endmacro %}
+        """)
+        default_js = MarkerCluster.default_js
+        default_css = MarkerCluster.default_css
+
+        def __init__(self, data_url, shell_id):
+            super().__init__()
+            self._name = 'MapDataLoader'
+            self.css = NEWS_LAYER_CSS + OVERVIEW_CSS
+            self.js = NEWS_LAYER_JS + OVERVIEW_JS
+            self.data_url = json.dumps(data_url)
+            self.overall_coords = json.dumps(OVERALL_COORDS)
+            self.shell_id = shell_id
+
+    return MapDataLoader
+
+def write_map_shell(path=MAP_OUTPUT_PATH, data_path=MAP_DATA_PATH):
+    """
+    Write the static map page that loads its markers from data_path (relative to
+    the page). The page is only rewritten when missing, built for another data
+    file or by an older MAP_SHELL_VERSION. Returns True if it was written.
+    """
+    import folium
+    data_url = os.path.relpath(data_path, os.path.dirname(os.path.abspath(path))).replace(os.sep, '/')
+    shell_id = f"{MAP_SHELL_VERSION} {data_url}"
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f'<meta name="sg-map-shell" content="{shell_id}">' in f.read():
+                return False
+    except OSError:
+        pass
+    m = folium.Map(location=SG_COORDS, zoom_start=12)
+    _map_shell_loader_class()(data_url, shell_id).add_to(m)
+    add_map_controls(m)
+    m.save(path)
+    print(f"Map shell saved to {path}")
+    return True
+
+def build_map_data(markers):
+    """
+    Map data file contents: the markers as GeoJSON and the overview summary.
+    'revision' hashes everything except the update time, so an unchanged set
+    of markers always gets the same revision.
+    """
+    summary = overview_summary(markers)
+    stable_summary = {k: v for k, v in summary.items() if k not in ('last_updated', 'date')} if summary else None
+    payload = {'version': MAP_DATA_VERSION, 'markers': markers_to_geojson(markers), 'summary': stable_summary}
+    revision = hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+    return {**payload, 'revision': revision, 'summary': summary}
+
+def write_map_data(markers, path=MAP_DATA_PATH):
+    """
+    Write the map data file unless it already holds the same revision; an
+    unchanged article set leaves the file (and its mtime) untouched.
+    Returns True if the file was written.
+    """
+    data = build_map_data(markers)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('revision') == data['revision']:
+                print(f"Map data unchanged (revision {data['revision'][:12]}), not rewriting {path}")
+                return False
+    except (OSError, ValueError):
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    print(f"Map data saved to {path} (revision {data['revision'][:12]})")
+    return True
+
+def add_geojson_markers(m, markers):
+    """All markers as one clustered GeoJSON layer with shared CSS classes and lazy popups."""
+    _news_layer_class()(markers_to_geojson(markers)).add_to(m)
+
+def add_map_controls(m):
+    """Expose the Leaflet map as window.map and add the Home button."""
     from branca.element import Element, MacroElement, Template
     # --- Inject JS to expose Leaflet map as window.map for Home button ---
     class ExposeMapMacro(MacroElement):
@@ -396,105 +1025,236 @@ def plot_emojis_on_map(articles_with_sentiment):
         </div>
     '''
     m.get_root().html.add_child(Element(home_button_html))
-    print(f"Actually added {marker_count} Gemini markers to the map.")
-    m.save('singapore_news_sentiment_map.html')
-    print("Map saved to singapore_news_sentiment_map.html")
 
-def load_processed_articles(path='processed_articles.json'):
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+def plot_emojis_on_map(articles_with_sentiment, mode=None, path=MAP_OUTPUT_PATH, data_path=MAP_DATA_PATH, dedup=True):
+    """
+    Geocode the analyzed articles and save the emoji map; see render_map for the modes.
+    With dedup, near-duplicate articles (dedup.find_clusters) share one Gemini
+    result, one geocode and one marker.
+    """
+    from dedup import find_clusters
+    clusters = find_clusters(articles_with_sentiment) if dedup else None
+    # Debug: count articles with valid Gemini fields
+    valid_articles = [a for a in articles_with_sentiment if a.get('place') and a.get('sentiment') and a.get('emoji')]
+    print(f"Articles with valid Gemini fields: {len(valid_articles)} / {len(articles_with_sentiment)}")
+    if len(valid_articles) == 0 and len(articles_with_sentiment) > 0:
+        print("No articles with valid Gemini fields found. Forcing reprocessing with Gemini...")
+        articles_with_sentiment = process_articles_with_gemini(articles_with_sentiment, clusters=clusters)
+    markers = collect_map_markers(articles_with_sentiment, clusters=clusters)
+    render_map(markers, mode=mode, path=path, data_path=data_path)
+
+def render_map(markers, mode=None, path=MAP_OUTPUT_PATH, data_path=MAP_DATA_PATH):
+    """
+    Save the emoji map of already geocoded markers (see collect_map_markers) to `path`.
+    mode is 'geojson' (one clustered layer; HTML size stays small with thousands
+    of markers), 'markers' (one folium.Marker per article) or 'shell' (a static
+    page at `path` plus the markers in the versioned JSON file `data_path`, which
+    is only rewritten when the markers changed); default MAP_RENDER_MODE.
+    """
+    mode = mode or MAP_RENDER_MODE
+    if mode not in ('geojson', 'markers', 'shell'):
+        raise ValueError(f"Unknown map render mode: {mode}")
+    print(f"Actually added {len(markers)} Gemini markers to the map ({mode}).")
+    if mode == 'shell':
+        write_map_shell(path, data_path)
+        write_map_data(markers, data_path)
+        return
+    import folium
+    m = folium.Map(location=SG_COORDS, zoom_start=12)
+    if mode == 'geojson':
+        add_geojson_markers(m, markers)
+    else:
+        add_folium_markers(m, markers)
+    # Overall sentiment
+    summary = overview_summary(markers)
+    if summary:
+        add_overview_marker(m, summary)
+    add_map_controls(m)
+    m.save(path)
+    print(f"Map saved to {path}")
+
+def load_processed_articles(article_ids):
+    """Return cached Gemini results {article_id: result} for the given ids."""
+    return get_gemini_store().get_many(article_ids)
+
+def save_processed_articles(processed):
+    """Upsert {article_id: result} into the Gemini result store."""
+    get_gemini_store().upsert_many(processed.items(), model=GEMINI_MODEL_NAME, prompt_version=GEMINI_PROMPT_VERSION)
+
+def is_current_result(result):
+    """
+    True if a cached Gemini result was produced by the current model and prompt.
+    Results that do not record them (imported from processed_articles.json) count as current.
+    """
+    model, prompt_version = result.get('model'), result.get('prompt_version')
+    return ((not model or model == GEMINI_MODEL_NAME)
+            and (prompt_version is None or str(prompt_version) == str(GEMINI_PROMPT_VERSION)))
+
+def is_failed_result(result):
+    """True if a Gemini result holds no answer: the request failed (see GeminiAnalyzer.analyze_batch)."""
+    return all(result.get(field) is None for field in ('place', 'sentiment', 'reason', 'emoji'))
 
-def save_processed_articles(processed, path='processed_articles.json'):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(processed, f, ensure_ascii=False, indent=2)
+def needs_gemini_result(article):
+    """
+    True if a processed article has no Gemini result yet: the request for it
+    failed, so the next run should send it again even if it is unchanged.
+    """
+    return 'place' not in article or is_failed_result(article)
 
-def process_articles_with_gemini(articles):
-    processed = load_processed_articles()
+def is_cache_fresh(processed, article_id, article):
+    """
+    A cached Gemini result is reused unless the article content has changed
+    since, it came from another model or prompt version, or the request failed.
+    """
+    if (article_id not in processed or not is_current_result(processed[article_id])
+            or is_failed_result(processed[article_id])):
+        return False
+    cached_hash = processed[article_id].get('content_hash')
+    return not cached_hash or not article.get('content_hash') or cached_hash == article['content_hash']
+
+def process_articles_with_gemini(articles, batch_size=GEMINI_BATCH_SIZE, token_budget=GEMINI_BATCH_TOKEN_BUDGET, concurrency=GEMINI_CONCURRENCY, clusters=None):
+    """
+    Merge Gemini place/sentiment results into each article, using the cache where
+    possible. Uncached articles are sent to Gemini in batches of up to batch_size
+    articles (and about token_budget input tokens); batch_size=1 sends one request
+    per article. Up to `concurrency` batches are in flight at once, all sharing
+    GEMINI_LIMITER so the requests/tokens-per-minute quota is respected.
+    With `clusters` (see dedup.find_clusters), one article per cluster is sent
+    and its result is shared with the others; a cluster member analyzed in an
+    earlier run answers for the new ones without a request.
+    Every article is first scored by the local relevance classifier
+    (sg_relevance.py), stored as 'sg_relevance': clearly Singapore-related
+    articles are marked related whatever Gemini answers, and clearly unrelated
+    ones are not sent at all.
+    """
+    from dedup import cluster_index, article_id as cache_id
+    from sg_relevance import get_relevance_classifier
+    member_of = cluster_index(clusters)
+    classifier = get_relevance_classifier()
+    ids = [cache_id(article) for article in articles]
+    processed = load_processed_articles(set(ids) | set(member_of))
     api_key = load_gemini_api_key()
-    updated = False
     results = []
-    total_articles = len(articles)
-    for idx, article in enumerate(articles, 1):
-        article_id = article.get('url') or article.get('title')
+    pending = {}
+    force_sg = set()
+    unrelated = {}
+    for article, article_id in zip(articles, ids):
         if not article_id:
             continue
         title = article.get('title', '')
         content = article.get('content', '')
-        location = article.get('location', '')
-        category = article.get('category', '')
-        # If 'Singapore' is mentioned in title/content, or location is Singapore, or category is Singapore/local, set is_sg_related = True
-        if (
-            'singapore' in title.lower() or
-            'singapore' in content.lower() or
-            location.lower() == 'singapore' or
-            ('singapore' in category.lower() if isinstance(category, str) else False) or
-            ('local' in category.lower() if isinstance(category, str) else False)
-        ):
-            is_sg_related = True
+        results.append((article_id, article))
+        relevance, article['sg_relevance'], _ = classifier.classify(article)
+        METRICS.inc('relevance_prefilter_total', label=relevance)
+        # Clearly about Singapore (by name, place, agency or a Singapore/local category): is_sg_related = True
+        if relevance == 'related':
+            force_sg.add(article_id)
             # Optionally, use previous Gemini result for place/sentiment if available
-            if article_id in processed:
-                gemini_result = processed[article_id]
-                gemini_result['is_sg_related'] = True
-            else:
-                # Only run Gemini for place/sentiment, but force is_sg_related True
-                place_name, sentiment, reason, emoji, _ = gemini_analyze_article(api_key, title, content, idx, total_articles)
-                gemini_result = {
-                    'place': place_name,
-                    'sentiment': sentiment,
-                    'reason': reason,
-                    'emoji': emoji,
-                    'is_sg_related': True
-                }
-                processed[article_id] = gemini_result
-                updated = True
+            if is_cache_fresh(processed, article_id, article):
+                processed[article_id]['is_sg_related'] = True
+                continue
+        # Only call Gemini if not already cached
+        elif is_cache_fresh(processed, article_id, article) and processed[article_id].get('is_sg_related') is not None:
+            continue
+        elif relevance == 'unrelated':
+            # Clearly about somewhere else: not worth a Gemini request, and not saved to its cache.
+            # Only relevance is set; the article keeps the sentiment it was scored with
+            processed[article_id] = {'place': None, 'is_sg_related': False}
+            unrelated[article_id] = (article_id, title, content)
+            continue
+        pending[article_id] = (article_id, title, content)
+    # Near-duplicates: one request per cluster, or none if a member already has a result
+    shared = {}
+    for article_id in list(pending):
+        cluster = member_of.get(article_id)
+        if cluster is None:
+            continue
+        analyzed = next((member for member in clusters[cluster] if member in processed and member not in pending
+                         and member not in unrelated and is_current_result(processed[member])
+                         and not is_failed_result(processed[member])), None)
+        if analyzed is None:
+            # The first pending member asks Gemini for the whole cluster
+            analyzed = next(member for member in clusters[cluster] if member in pending)
+        if analyzed != article_id:
+            shared[article_id] = analyzed
+            del pending[article_id]
+    if shared:
+        print(f"Near-duplicates: {len(shared)} articles share the Gemini result of another article in their cluster.")
+        METRICS.inc('gemini_dedup_saved_total', len(shared))
+    if unrelated:
+        # Requests saved: what sending these articles along would have cost
+        items = list(pending.values())
+        requests_saved = (len(make_gemini_batches(items + list(unrelated.values()), max_items=batch_size, token_budget=token_budget))
+                          - len(make_gemini_batches(items, max_items=batch_size, token_budget=token_budget)))
+        print(f"Relevance prefilter: {len(unrelated)} articles not about Singapore skipped, {requests_saved} Gemini request(s) saved.")
+        METRICS.inc('gemini_prefilter_saved_total', len(unrelated), unit='articles')
+        METRICS.inc('gemini_prefilter_saved_total', requests_saved, unit='requests')
+    failed = set()
+    if pending:
+        items = list(pending.values())
+        batches = make_gemini_batches(items, max_items=batch_size, token_budget=token_budget)
+        print(f"Sending {len(items)} articles to Gemini in {len(batches)} request(s), {min(concurrency, len(batches))} at a time...")
+        completed = []
+        cache_hits = len(results) - len(pending)
+        def run_batch(numbered_batch):
+            batch_no, batch = numbered_batch
+            print(f"Gemini batch {batch_no} of {len(batches)} ({len(batch)} articles)")
+            batch_result = gemini_analyze_batch(api_key, batch)
+            completed.append(batch_no)
+            emit_progress('progress', 'gemini', i=len(completed), n=len(batches), cache_hits=cache_hits)
+            return batch_result
+        if concurrency > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(batches)), thread_name_prefix='gemini') as executor:
+                # map() yields in submission order, so results merge in article order
+                batch_results = list(executor.map(run_batch, enumerate(batches, 1)))
         else:
-            # Only call Gemini if not already cached
-            if article_id in processed and 'is_sg_related' in processed[article_id]:
-                gemini_result = processed[article_id]
-            else:
-                place_name, sentiment, reason, emoji, is_sg_related = gemini_analyze_article(api_key, title, content, idx, total_articles)
+            batch_results = [run_batch(numbered) for numbered in enumerate(batches, 1)]
+        if GEMINI_LIMITER.throttled:
+            print(f"Gemini rate limiting: backed off {GEMINI_LIMITER.throttled} time(s).")
+        for batch_result in batch_results:
+            for article_id, (place_name, sentiment, reason, emoji, is_sg_related) in batch_result.items():
+                if place_name is None and sentiment is None and reason is None and emoji is None:
+                    # No answer: not cached, and the article keeps its own sentiment until a later run
+                    failed.add(article_id)
+                    processed[article_id] = {'is_sg_related': True} if article_id in force_sg else {}
+                    continue
                 gemini_result = {
                     'place': place_name,
                     'sentiment': sentiment,
                     'reason': reason,
                     'emoji': emoji,
-                    'is_sg_related': is_sg_related
+                    # Articles that mention Singapore are related regardless of Gemini's answer
+                    'is_sg_related': True if article_id in force_sg else is_sg_related
                 }
                 processed[article_id] = gemini_result
-                updated = True
+    for article_id, analyzed in shared.items():
+        if analyzed in failed:
+            processed[article_id] = {'is_sg_related': True} if article_id in force_sg else {}
+        elif analyzed in processed:
+            processed[article_id] = {
+                **{field: processed[analyzed].get(field) for field in RESULT_FIELDS},
+                'is_sg_related': True if article_id in force_sg else processed[analyzed].get('is_sg_related'),
+            }
+            pending[article_id] = None
+    for article_id in failed:
+        del pending[article_id]
+    merged = []
+    for article_id, article in results:
+        if article_id in pending and article.get('content_hash'):
+            processed[article_id]['content_hash'] = article['content_hash']
         # Merge Gemini result into article
-        article.update(gemini_result)
-        results.append(article)
-    if updated:
-        save_processed_articles(processed)
-    return results
+        article.update({key: value for key, value in processed[article_id].items() if key not in PROVENANCE_FIELDS})
+        merged.append(article)
+    if pending:
+        save_processed_articles({article_id: processed[article_id] for article_id in pending if article_id in processed})
+    return merged
 
 if __name__ == "__main__":
-    from datetime import datetime
-    import pytz
-    # Load all articles
-    with open('articles_with_sentiment.json', 'r', encoding='utf-8') as f:
-        articles = json.load(f)
-    # Filter for today's news only (assume 'published' or 'date' field in ISO format)
-    today = datetime.now(pytz.timezone('Asia/Singapore')).date()
-    def is_today(article):
-        for key in ['published', 'date', 'datetime']:
-            if key in article:
-                try:
-                    dt = datetime.fromisoformat(article[key])
-                    return dt.date() == today
-                except Exception:
-                    continue
-        return False
-    today_articles = [a for a in articles if is_today(a)]
+    from article_store import PartitionedArticleStore, ANALYZED_ARTICLES_DIR
+    # Today's news only: just today's partition is read
+    store = PartitionedArticleStore(ANALYZED_ARTICLES_DIR, legacy_json='articles_with_sentiment.json')
+    today_articles = store.load_today()
     print(f"Found {len(today_articles)} articles for today.")
     # Only call Gemini for new articles, use cache for others
     today_articles_with_gemini = process_articles_with_gemini(today_articles)
-    # Ensure processed_articles.json is always updated with the latest cache
-    # (process_articles_with_gemini already saves if updated, but force save here for safety)
-    processed_cache = load_processed_articles()
-    save_processed_articles(processed_cache)
     plot_emojis_on_map(today_articles_with_gemini)
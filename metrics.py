@@ -0,0 +1,166 @@
+"""
+metrics.py
+In-process metrics for pipeline runs (counters, gauges and latency histograms),
+written per run as a Prometheus text file and/or a JSON line, plus an opt-in
+cProfile hook.
+"""
+
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+METRICS_PROM_PATH = os.path.join('.pipeline', 'metrics.prom')
+METRICS_JSONL_PATH = os.path.join('.pipeline', 'metrics.jsonl')
+# Which files write_metrics() produces: 'prom', 'jsonl', 'both' or 'none'
+METRICS_FORMAT = os.environ.get('PIPELINE_METRICS', 'both')
+# Stages to run under cProfile: comma-separated names, or 'all'
+PROFILE_STAGES = os.environ.get('PIPELINE_PROFILE', '')
+PROFILE_DIR = '.pipeline'
+# Latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Metrics:
+    """
+    Thread-safe registry keyed by (metric name, sorted label pairs).
+    Counters only go up, gauges hold the last value set, and histograms keep
+    cumulative bucket counts with their sum and count, as in Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self.started_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the with-block (in seconds) in histogram `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (e.g. for node_exporter's textfile collector)."""
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+        lines = []
+        with self._lock:
+            for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f'# TYPE sg_{name} {kind}')
+                    for (metric, labels), value in sorted(series.items()):
+                        if metric == name:
+                            lines.append(f'sg_{name}{fmt(labels)} {value}')
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f'# TYPE sg_{name} histogram')
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                        lines.append(f'sg_{name}_bucket{fmt(labels, [("le", bound)])} {count}')
+                    lines.append(f'sg_{name}_bucket{fmt(labels, [("le", "+Inf")])} {histogram["count"]}')
+                    lines.append(f'sg_{name}_sum{fmt(labels)} {histogram["sum"]:.6f}')
+                    lines.append(f'sg_{name}_count{fmt(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def to_record(self):
+        """All metrics of the run as one JSON-serializable dict."""
+        def series(items):
+            return [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(items)]
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'finished_at': time.time(),
+                'counters': series(self.counters.items()),
+                'gauges': series(self.gauges.items()),
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), 'buckets': dict(zip(map(str, LATENCY_BUCKETS), h['buckets'])),
+                     'sum': round(h['sum'], 6), 'count': h['count']}
+                    for (name, labels), h in sorted(self.histograms.items())
+                ],
+            }
+
+METRICS = Metrics()
+
+def write_metrics(fmt=None, prom_path=METRICS_PROM_PATH, jsonl_path=METRICS_JSONL_PATH):
+    """
+    Write the current run's metrics: the Prometheus file is replaced, the
+    JSON-lines file gets one line appended per run.
+    """
+    fmt = fmt or METRICS_FORMAT
+    if fmt in ('prom', 'both'):
+        os.makedirs(os.path.dirname(prom_path) or '.', exist_ok=True)
+        tmp_path = prom_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(METRICS.to_prometheus())
+        os.replace(tmp_path, prom_path)
+    if fmt in ('jsonl', 'both'):
+        os.makedirs(os.path.dirname(jsonl_path) or '.', exist_ok=True)
+        with open(jsonl_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(METRICS.to_record(), ensure_ascii=False) + '\n')
+
+def profiling_enabled(stage_name, stages=None):
+    stages = PROFILE_STAGES if stages is None else stages
+    names = {name.strip() for name in stages.split(',') if name.strip()}
+    return 'all' in names or stage_name in names
+
+@contextmanager
+def profiled(stage_name, directory=PROFILE_DIR, top=15):
+    """
+    Run the with-block under cProfile, save the stats to
+    <directory>/profile-<stage>.prof and print the top functions by cumulative time.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'profile-{stage_name}.prof')
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        print(f"Profile of stage {stage_name} saved to {path}")
+        print(out.getvalue())
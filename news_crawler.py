@@ -3,129 +3,529 @@ news_crawler.py
 Crawls news articles from major Singapore news outlets.
 """
 
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urljoin
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from datetime import datetime
-import feedparser
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-
-def fetch_strait_times():
-    url = "https://www.straitstimes.com/news/singapore/rss.xml"
-    articles = []
+from article_store import normalize_article
+from body_cache import get_body_cache, BODY_STORE_CHARS
+from progress import emit_progress
+from metrics import METRICS
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# Timeout (seconds) for each HTTP request made by a fetcher
+SOURCE_TIMEOUT = 10
+# Wall-clock limit (seconds) for a single source, and for the whole crawl
+SOURCE_DEADLINE = 15
+CRAWL_BUDGET = 30
+
+# Per-source latency/article counts of the last crawl_news() call
+CRAWL_STATS = {}
+
+# Optional body enrichment (see fetch_article_bodies) for the sources marked
+# fetch_bodies in sources.yaml, whose listing pages only give headlines
+FETCH_ARTICLE_BODIES = os.environ.get('FETCH_ARTICLE_BODIES', '0') == '1'
+# Characters of body text kept per article (sentiment and Gemini see this much)
+BODY_MAX_CHARS = int(os.environ.get('ARTICLE_BODY_MAX_CHARS', 1500))
+BODY_WORKERS = 8
+# Simultaneous article downloads per host, to stay polite to each outlet
+BODY_HOST_CONCURRENCY = 3
+
+# ETag/Last-Modified validators and parsed articles per fetched URL
+HTTP_CACHE_PATH = 'http_cache.json'
+_http_cache = None
+_http_cache_dirty = False
+_http_cache_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the shared HTTP session used by all fetchers.
+    Connections are kept alive and pooled, so repeated crawls (and concurrent
+    fetchers) reuse sockets instead of reconnecting to every outlet.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(HEADERS)
+            _session = session
+    return _session
+
+def load_http_cache(path=HTTP_CACHE_PATH):
     try:
-        feed = feedparser.parse(url)
-        for entry in feed.entries:
-            articles.append({
-                'title': entry.title,
-                'url': entry.link,
-                'content': entry.get('summary', ''),
-                'source': 'The Straits Times',
-                'timestamp': entry.get('published', datetime.now().isoformat()),
-                'location': 'Singapore'
-            })
-    except Exception as e:
-        print(f"Error fetching The Straits Times: {e}")
-    print(f"Fetched {len(articles)} articles from The Straits Times.")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_http_cache(path=HTTP_CACHE_PATH):
+    """Persist the validator cache if any fetcher updated it since the last save."""
+    global _http_cache_dirty
+    with _http_cache_lock:
+        if _http_cache is None or not _http_cache_dirty:
+            return
+        # A unique temp file, so a concurrent crawl never writes or replaces the same one
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(_http_cache, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        _http_cache_dirty = False
+
+def _get_http_cache():
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = load_http_cache()
+        return _http_cache
+
+def cached_fetch(url, timeout, parse, poll_interval=0):
+    """
+    GET url with the ETag/Last-Modified validators from the previous fetch.
+    On 304 Not Modified the previously parsed articles are returned without
+    parsing anything; any other error status raises requests.HTTPError;
+    otherwise parse(resp) builds the article list, which is cached together
+    with the new validators. If the previous fetch is less
+    than poll_interval seconds old, its articles are returned without a request.
+    """
+    global _http_cache_dirty
+    cache = _get_http_cache()
+    entry = cache.get(url)
+    if entry and poll_interval and time.time() - entry.get('fetched_at', 0) < poll_interval:
+        print(f"  Polled {time.time() - entry['fetched_at']:.0f}s ago, reusing previous articles: {url}")
+        return [dict(article) for article in entry['articles']]
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    resp = get_session().get(url, headers=headers, timeout=timeout)
+    if resp.status_code == 304 and entry:
+        print(f"  Not modified since last fetch: {url}")
+        with _http_cache_lock:
+            entry['fetched_at'] = time.time()
+            _http_cache_dirty = True
+        return [dict(article) for article in entry['articles']]
+    # An error page is not a listing: the source is reported as failed
+    resp.raise_for_status()
+    articles = parse(resp)
+    etag = resp.headers.get('ETag')
+    last_modified = resp.headers.get('Last-Modified')
+    if resp.status_code == 200 and (etag or last_modified or poll_interval):
+        with _http_cache_lock:
+            cache[url] = {'etag': etag, 'last_modified': last_modified, 'fetched_at': time.time(), 'articles': articles}
+            _http_cache_dirty = True
     return articles
 
-def fetch_channel_newsasia():
-    url = "https://www.channelnewsasia.com/rssfeeds/8395986"
+# --- Source registry (sources.yaml) ---
+
+SOURCES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sources.yaml')
+SOURCE_TYPES = ('rss', 'html')
+SOURCE_DEFAULTS = {
+    'poll_interval': 0,
+    'fetch_bodies': False,
+    'selectors': ['a[href]'],
+    'url_filters': {},
+    'min_title_length': 1,
+}
+
+def load_sources(path=SOURCES_PATH):
+    """
+    Read the source registry: a list of dicts with name, type, url and the
+    optional fields in SOURCE_DEFAULTS (see sources.yaml for what they mean).
+    """
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    sources = []
+    for entry in config.get('sources', []):
+        source = {**SOURCE_DEFAULTS, **entry}
+        missing = [field for field in ('name', 'type', 'url') if not source.get(field)]
+        if missing:
+            raise ValueError(f"Source {entry!r} in {path} is missing {', '.join(missing)}")
+        if source['type'] not in SOURCE_TYPES:
+            raise ValueError(f"Source {source['name']!r} in {path} has unknown type {source['type']!r}")
+        if isinstance(source['selectors'], str):
+            source['selectors'] = [source['selectors']]
+        source['url_filters'] = {
+            'include': list(source['url_filters'].get('include') or []),
+            'exclude': list(source['url_filters'].get('exclude') or []),
+        }
+        sources.append(source)
+    return sources
+
+_sources = None
+
+def get_sources():
+    """Return the sources in SOURCES_PATH, loading the file on first use."""
+    global _sources
+    if _sources is None:
+        _sources = load_sources()
+    return _sources
+
+def _parse_rss(resp, source):
+    import feedparser
+    feed = feedparser.parse(resp.content)
     articles = []
-    try:
-        feed = feedparser.parse(url)
-        for entry in feed.entries:
+    for entry in feed.entries:
+        articles.append({
+            'title': entry.title,
+            'url': entry.link,
+            'content': entry.get('summary', ''),
+            'source': source['name'],
+            'timestamp': entry.get('published', datetime.now().isoformat()),
+            'location': 'Singapore'
+        })
+    return articles
+
+def _html_parser_name():
+    """lxml when it is installed (several times faster), else the stdlib parser."""
+    from bs4.builder import builder_registry
+    return 'lxml' if builder_registry.lookup('lxml') else 'html.parser'
+
+def _strainer_tags(selectors):
+    """
+    Tag names the selectors start from ('article a' -> 'article'), or None when
+    a selector does not start with a tag name and the whole page must be parsed.
+    """
+    tags = set()
+    for selector in selectors:
+        match = re.match(r'[a-zA-Z][\w-]*', selector.strip())
+        if not match:
+            return None
+        tags.add(match.group(0).lower())
+    return tags
+
+def parse_html_listing(html, source, page_url=None):
+    """
+    Article links on a listing page. Only the elements the selectors start from
+    (usually just <a>) are parsed, via a SoupStrainer, instead of building a
+    tree of the whole page.
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+    tags = _strainer_tags(source['selectors'])
+    strainer = SoupStrainer(list(tags)) if tags else None
+    soup = BeautifulSoup(html, _html_parser_name(), parse_only=strainer)
+    include = source['url_filters']['include']
+    exclude = source['url_filters']['exclude']
+    page_url = page_url or source['url']
+    articles = []
+    seen = set()
+    for item in soup.select(', '.join(source['selectors'])):
+        href = item.get('href')
+        if not href:
+            continue
+        link = urljoin(page_url, href)
+        title = item.get_text(strip=True)
+        if (
+            link not in seen and
+            len(title) >= source['min_title_length'] and
+            (not include or any(part in link for part in include)) and
+            not any(part in link for part in exclude)
+        ):
+            seen.add(link)
             articles.append({
-                'title': entry.title,
-                'url': entry.link,
-                'content': entry.get('summary', ''),
-                'source': 'Channel NewsAsia',
-                'timestamp': entry.get('published', datetime.now().isoformat()),
+                'title': title,
+                'url': link,
+                'content': '',
+                'source': source['name'],
+                'timestamp': datetime.now().isoformat(),
                 'location': 'Singapore'
             })
-    except Exception as e:
-        print(f"Error fetching Channel NewsAsia: {e}")
-    print(f"Fetched {len(articles)} articles from Channel NewsAsia.")
     return articles
 
-def fetch_today_online():
-    url = "https://www.todayonline.com/singapore"
-    articles = []
+def fetch_source(source, timeout=SOURCE_TIMEOUT):
+    """
+    Fetch and parse one registry source. Returns (articles, error): on failure
+    the error is printed and returned with no articles.
+    """
+    if source['type'] == 'rss':
+        parse = lambda resp: _parse_rss(resp, source)
+    else:
+        parse = lambda resp: parse_html_listing(resp.text, source, resp.url or source['url'])
     try:
-        resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        seen = set()
-        # Try multiple selectors and fallback to <article> links
-        for item in soup.select('a.card__link, a.teaser__link, article a'):
-            link = item.get('href')
-            title = item.get_text(strip=True)
-            if link and not link.startswith('http'):
-                link = 'https://www.todayonline.com' + link
-            if link and link not in seen and title and '/singapore/' in link:
-                seen.add(link)
-                articles.append({
-                    'title': title,
-                    'url': link,
-                    'content': '',
-                    'source': 'Today Online',
-                    'timestamp': datetime.now().isoformat(),
-                    'location': 'Singapore'
-                })
+        articles = cached_fetch(source['url'], timeout, parse, poll_interval=source['poll_interval'])
     except Exception as e:
-        print(f"Error scraping Today Online: {e}")
-    print(f"Fetched {len(articles)} articles from Today Online.")
-    return articles
+        print(f"Error fetching {source['name']}: {e}")
+        return [], e
+    print(f"Fetched {len(articles)} articles from {source['name']}.")
+    return articles, None
+
+def _timed_fetch(source, timeout):
+    start = time.perf_counter()
+    articles, error = fetch_source(source, timeout=timeout)
+    return articles, time.perf_counter() - start, 'ok' if error is None else 'error'
+
+def print_crawl_stats(stats=None):
+    stats = CRAWL_STATS if stats is None else stats
+    for name, stat in stats.items():
+        print(f"  {name}: {stat['articles']} articles in {stat['seconds']:.2f}s ({stat['status']})")
 
-def fetch_mothership():
+def crawl_news(concurrent=True, source_timeout=SOURCE_TIMEOUT, source_deadline=SOURCE_DEADLINE, crawl_budget=CRAWL_BUDGET, sources=None):
     """
-    Scrape latest news articles from mothership.sg homepage.
+    Crawl news articles from the outlets in sources.yaml (The Straits Times,
+    Channel NewsAsia, Today Online, Mothership), or from `sources`.
+    Returns a list of articles with metadata (title, url, content, source, timestamp, location if available).
+    Timestamps are ISO 8601 in Singapore time.
+
+    With concurrent=True all sources are fetched in parallel over the shared
+    session, so wall time is roughly that of the slowest source. A source that
+    has not finished within source_deadline seconds (or once crawl_budget is
+    spent) is dropped from this crawl. Per-source latency and article counts
+    are printed and kept in CRAWL_STATS.
     """
-    url = "https://mothership.sg/"
+    crawl_start = time.perf_counter()
+    sources = get_sources() if sources is None else sources
+    CRAWL_STATS.clear()
+    if not sources:
+        print("No news sources to crawl.")
+        return []
+    fetched = {}
+    if concurrent:
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='crawl')
+        futures = {executor.submit(_timed_fetch, source, source_timeout): source['name'] for source in sources}
+        finished = []
+        def report_source(name):
+            finished.append(name)
+            emit_progress('progress', 'crawl', i=len(finished), n=len(sources), source=name)
+        for future, name in futures.items():
+            future.add_done_callback(lambda _, name=name: report_source(name))
+        done, not_done = wait(futures, timeout=min(source_deadline, crawl_budget))
+        for future in done:
+            name = futures[future]
+            try:
+                fetched[name] = future.result()
+            except Exception as e:
+                print(f"Error fetching {name}: {e}")
+                fetched[name] = ([], time.perf_counter() - crawl_start, 'error')
+        for future in not_done:
+            name = futures[future]
+            print(f"{name} did not finish within its deadline, skipping.")
+            CRAWL_STATS[name] = {'articles': 0, 'seconds': time.perf_counter() - crawl_start, 'status': 'timeout'}
+        # Do not block on stragglers; their sockets time out on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        for source in sources:
+            name = source['name']
+            if time.perf_counter() - crawl_start > crawl_budget:
+                print(f"Crawl budget of {crawl_budget}s exhausted, skipping {name}.")
+                CRAWL_STATS[name] = {'articles': 0, 'seconds': 0.0, 'status': 'skipped'}
+                continue
+            fetched[name] = _timed_fetch(source, source_timeout)
+            emit_progress('progress', 'crawl', i=len(fetched), n=len(sources), source=name)
     articles = []
+    for source in sources:
+        name = source['name']
+        if name not in fetched:
+            continue
+        source_articles, seconds, status = fetched[name]
+        CRAWL_STATS[name] = {'articles': len(source_articles), 'seconds': seconds, 'status': status}
+        # Timestamps are normalized to ISO 8601 Singapore time once, here
+        articles.extend(normalize_article(a) for a in source_articles)
+    # Keep the report in source order
+    for name in (source['name'] for source in sources):
+        CRAWL_STATS[name] = CRAWL_STATS.pop(name)
+        stat = CRAWL_STATS[name]
+        METRICS.observe('crawl_source_seconds', stat['seconds'], source=name)
+        METRICS.inc('crawl_articles_total', stat['articles'], source=name)
+        METRICS.inc('crawl_source_status_total', source=name, status=stat['status'])
+    save_http_cache()
+    print(f"Total articles fetched: {len(articles)} in {time.perf_counter() - crawl_start:.2f}s")
+    print_crawl_stats()
+    return articles
+
+class ArticleTextParser(HTMLParser):
+    """
+    Streaming extractor for the main text of an article page: the text of <p>
+    elements outside navigation, header, footer, aside, script and style, with
+    the page's description meta tag as a fallback. No tree is built, and
+    parsing stops as soon as `limit` characters have been collected.
+    """
+
+    SKIP_TAGS = {'script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form', 'figure', 'template', 'svg'}
+    # Shorter paragraphs are bylines, captions, "Advertisement" and the like
+    MIN_PARAGRAPH_CHARS = 25
+
+    def __init__(self, limit):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.paragraphs = []
+        self.length = 0
+        self.description = ''
+        self.done = False
+        self._skip_depth = 0
+        self._paragraph = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'p' and not self._skip_depth:
+            self._end_paragraph()
+            self._paragraph = []
+        elif tag == 'meta' and not self.description:
+            attrs = dict(attrs)
+            if attrs.get('property') == 'og:description' or attrs.get('name') == 'description':
+                self.description = (attrs.get('content') or '').strip()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'p':
+            self._end_paragraph()
+
+    def handle_data(self, data):
+        if self._paragraph is not None and not self._skip_depth:
+            self._paragraph.append(data)
+
+    def _end_paragraph(self):
+        if self._paragraph is None:
+            return
+        text = ' '.join(''.join(self._paragraph).split())
+        self._paragraph = None
+        if len(text) >= self.MIN_PARAGRAPH_CHARS:
+            self.paragraphs.append(text)
+            self.length += len(text) + 1
+            self.done = self.length >= self.limit
+
+    def text(self):
+        self._end_paragraph()
+        return '\n'.join(self.paragraphs) or self.description
+
+def _extract_article_text_lxml(html, limit):
+    """extract_article_text with lxml: same rules as ArticleTextParser, over a parsed tree."""
+    import lxml.html
+    if not html.strip():
+        return ''
+    doc = lxml.html.document_fromstring(html)
+    description = ''
+    for meta in doc.iter('meta'):
+        if meta.get('property') == 'og:description' or meta.get('name') == 'description':
+            description = (meta.get('content') or '').strip()
+            if description:
+                break
+    for element in list(doc.iter(*ArticleTextParser.SKIP_TAGS)):
+        element.drop_tree()
+    paragraphs = []
+    length = 0
+    for paragraph in doc.iter('p'):
+        text = ' '.join(paragraph.text_content().split())
+        if len(text) >= ArticleTextParser.MIN_PARAGRAPH_CHARS:
+            paragraphs.append(text)
+            length += len(text) + 1
+            if length >= limit:
+                break
+    return '\n'.join(paragraphs) or description
+
+def extract_article_text(html, limit=BODY_STORE_CHARS, chunk_size=16384):
+    """
+    Main text of an article page, up to about `limit` characters. With lxml
+    installed the page is parsed whole (several times faster); otherwise the
+    stdlib parser is fed `chunk_size` characters at a time until it has enough.
+    """
     try:
-        resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        seen = set()
-        # Mothership articles are in <a> tags with hrefs containing '/202'
-        for item in soup.find_all('a', href=True):
-            link = item['href']
-            title = item.get_text(strip=True)
-            if link.startswith('/'):
-                link = 'https://mothership.sg' + link
-            if (
-                link not in seen and
-                title and
-                '/202' in link and  # likely a news article (year in URL)
-                len(title) > 10
-            ):
-                seen.add(link)
-                articles.append({
-                    'title': title,
-                    'url': link,
-                    'content': '',
-                    'source': 'Mothership',
-                    'timestamp': datetime.now().isoformat(),
-                    'location': 'Singapore'
-                })
+        return _extract_article_text_lxml(html, limit)[:limit]
+    except ImportError:
+        pass
     except Exception as e:
-        print(f"Error scraping Mothership: {e}")
-    print(f"Fetched {len(articles)} articles from Mothership.")
-    return articles
+        # Pages lxml rejects (an encoding declaration in a str, say) go to the stdlib parser
+        print(f"lxml could not parse an article page ({e}); using html.parser.")
+    parser = ArticleTextParser(limit)
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        if parser.done:
+            break
+    return parser.text()[:limit]
 
-def crawl_news():
+def truncate_text(text, max_chars):
+    """Cut text to max_chars, at a word boundary where there is one."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    return cut.rsplit(' ', 1)[0] if ' ' in cut else cut
+
+def fetch_article_bodies(articles, sources=None, max_chars=BODY_MAX_CHARS, workers=BODY_WORKERS,
+                         per_host=BODY_HOST_CONCURRENCY, timeout=SOURCE_TIMEOUT, cache=None):
     """
-    Crawl news articles from The Straits Times, Channel NewsAsia, Today Online, Mothership.
-    Returns a list of articles with metadata (title, url, content, source, timestamp, location if available).
+    Fill in `content` for articles from `sources` (default: the registry sources
+    with fetch_bodies) that came without one, using
+    the text of each article's page truncated to max_chars.
+    Pages are downloaded concurrently over the shared session, at most
+    `per_host` at a time per host. Bodies are cached by URL, so an article is
+    downloaded once in its lifetime however many crawls it appears in.
+    Returns a new list; articles without a body are returned unchanged.
     """
-    articles = []
-    articles.extend(fetch_strait_times())
-    articles.extend(fetch_channel_newsasia())
-    articles.extend(fetch_today_online())
-    articles.extend(fetch_mothership())
-    print(f"Total articles fetched: {len(articles)}")
-    return articles
+    cache = cache or get_body_cache()
+    if sources is None:
+        sources = {source['name'] for source in get_sources() if source['fetch_bodies']}
+    targets = [a for a in articles if a.get('source') in sources and not a.get('content') and a.get('url')]
+    if not targets:
+        return list(articles)
+    start = time.perf_counter()
+    bodies = cache.get_many(a['url'] for a in targets)
+    to_fetch = list(dict.fromkeys(a['url'] for a in targets if a['url'] not in bodies))
+    host_slots = {}
+    for url in to_fetch:
+        host_slots.setdefault(urlsplit(url).netloc, threading.BoundedSemaphore(per_host))
+    failed = []
+    finished = []
+
+    def download(url):
+        host = urlsplit(url).netloc
+        try:
+            with host_slots[host], METRICS.timer('body_fetch_seconds', host=host):
+                resp = get_session().get(url, timeout=timeout)
+            body = extract_article_text(resp.text) if resp.status_code == 200 else None
+            if not body:
+                body = None
+                failed.append(url)
+            # HTTP errors and pages without text are remembered for a while; network errors are retried next crawl
+            cache.put(url, body, resp.status_code)
+            bodies[url] = body
+        except Exception as e:
+            failed.append(url)
+            print(f"Error fetching article body {url}: {e}")
+        finished.append(url)
+        emit_progress('progress', 'bodies', i=len(finished), n=len(to_fetch))
+
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=min(workers, len(to_fetch)), thread_name_prefix='bodies') as executor:
+            list(executor.map(download, to_fetch))
+    METRICS.inc('article_bodies_total', len(targets) - len(to_fetch), status='cached')
+    METRICS.inc('article_bodies_total', len(to_fetch) - len(failed), status='fetched')
+    METRICS.inc('article_bodies_total', len(failed), status='failed')
+    target_ids = {id(a) for a in targets}
+    enriched = []
+    filled = 0
+    for article in articles:
+        body = bodies.get(article['url']) if id(article) in target_ids else None
+        if body:
+            article = {**article, 'content': truncate_text(body, max_chars)}
+            filled += 1
+        enriched.append(article)
+    print(f"Article bodies: {filled} of {len(targets)} filled ({len(targets) - len(to_fetch)} cached, "
+          f"{len(to_fetch) - len(failed)} downloaded, {len(failed)} failed) in {time.perf_counter() - start:.2f}s")
+    return enriched
 
 if __name__ == "__main__":
-    crawl_news()
+    import sys
+    articles = crawl_news(concurrent='--sequential' not in sys.argv)
+    if FETCH_ARTICLE_BODIES or '--bodies' in sys.argv:
+        fetch_article_bodies(articles)
@@ -0,0 +1,118 @@
+"""
+pipeline_lock.py
+Cross-process single-flight lock for pipeline runs, and a record of the last
+successful run so callers can tell how old the data is.
+"""
+
+import os
+import json
+import time
+
+PIPELINE_LOCK_PATH = 'pipeline.lock'
+PIPELINE_STATE_PATH = 'pipeline_state.json'
+# A lock older than this is assumed to belong to a crashed run and is taken over
+PIPELINE_LOCK_TIMEOUT = 60 * 60
+
+class PipelineLock:
+    """
+    Lock file created with O_EXCL, so only one process (on any platform) can hold
+    it. The file records the holder's pid and start time; a lock left behind
+    for longer than `timeout` seconds is treated as abandoned.
+    """
+
+    def __init__(self, path=PIPELINE_LOCK_PATH, timeout=PIPELINE_LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.acquired = False
+        self.token = None
+
+    def _age(self):
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def is_locked(self):
+        age = self._age()
+        return age is not None and age <= self.timeout
+
+    def acquire(self):
+        """Take the lock without blocking; returns False if another run holds it."""
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.is_locked() or not self._take_over_stale():
+                    return False
+                continue
+            self.token = f'{os.getpid()}-{time.time()}'
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'pid': os.getpid(), 'started_at': time.time(), 'token': self.token}, f)
+            self.acquired = True
+            return True
+        return False
+
+    def _take_over_stale(self):
+        """
+        Move an abandoned lock out of the way; returns False if it turns out not
+        to be abandoned. The file is renamed away first (only one process can
+        rename it) and only deleted if it is still the stale file that was
+        checked: a lock another process created in between is put back.
+        """
+        try:
+            stale = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        if time.time() - stale.st_mtime <= self.timeout:
+            return False
+        moved = f'{self.path}.{os.getpid()}.{time.monotonic_ns()}.stale'
+        try:
+            os.rename(self.path, moved)
+        except FileNotFoundError:
+            # Someone else moved it first; the O_EXCL create decides who gets the lock
+            return True
+        current = os.stat(moved)
+        if (current.st_ino, current.st_mtime) == (stale.st_ino, stale.st_mtime):
+            os.remove(moved)
+            return True
+        # We moved a fresh lock: restore it (unless yet another run created one meanwhile)
+        try:
+            os.link(moved, self.path)
+        except FileExistsError:
+            print(f"Pipeline lock {self.path} was taken over concurrently; another run may overlap.")
+        os.remove(moved)
+        return False
+
+    def release(self):
+        """Remove the lock file, unless another run has since taken it over."""
+        if not self.acquired:
+            return
+        self.acquired = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                if json.load(f).get('token') != self.token:
+                    return
+            os.remove(self.path)
+        except (OSError, ValueError):
+            pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+def record_success(path=PIPELINE_STATE_PATH):
+    """Remember that a pipeline run just completed."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_success': time.time()}, f)
+    os.replace(tmp_path, path)
+
+def last_success(path=PIPELINE_STATE_PATH):
+    """Unix time of the last completed pipeline run, or None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('last_success')
+    except (OSError, ValueError):
+        return None
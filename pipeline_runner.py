@@ -0,0 +1,153 @@
+"""
+pipeline_runner.py
+Small DAG runner: a pipeline is a list of stages with named inputs and outputs.
+Outputs are kept on disk as JSON artifacts, and a stage is skipped when the
+fingerprint of its inputs matches the one it last ran with.
+"""
+
+import os
+import json
+import time
+import hashlib
+from progress import emit_progress
+from metrics import METRICS, profiling_enabled, profiled
+from contextlib import nullcontext
+
+PIPELINE_DIR = '.pipeline'
+
+def fingerprint(value):
+    """Stable sha1 of a JSON-serializable value."""
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class Stage:
+    """
+    A pipeline step. `func(inputs, context)` receives {input name: value} and
+    returns {output name: value} for every name in `outputs`.
+    `params(context)` adds anything else the result depends on (settings, the
+    date, a model version) to the fingerprint. always_run stages (e.g. ones that
+    read the outside world) are never skipped; `files` are paths the stage
+    writes that must exist for it to be skipped.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, always_run=False, files=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.params = params
+        self.always_run = always_run
+        self.files = tuple(files)
+
+class Pipeline:
+    """
+    Runs stages in order. Every output is saved to <root>/<name>.json together
+    with its fingerprint in <root>/state.json, so a later run (or a single
+    stage run from the CLI) can pick up inputs produced earlier.
+    """
+
+    def __init__(self, stages, root=PIPELINE_DIR):
+        self.stages = list(stages)
+        self.root = root
+        self.by_name = {stage.name: stage for stage in self.stages}
+        self.producers = {output: stage.name for stage in self.stages for output in stage.outputs}
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in self.producers:
+                    raise ValueError(f"Stage {stage.name!r} needs {name!r}, which no stage produces")
+        self.state = self._load_state()
+        self.values = {}
+
+    def _state_path(self):
+        return os.path.join(self.root, 'state.json')
+
+    def _artifact_path(self, name):
+        return os.path.join(self.root, f'{name}.json')
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'stages': {}, 'artifacts': {}}
+
+    def _save_state(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._state_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self._state_path())
+
+    def _write_artifact(self, name, value):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._artifact_path(name) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, self._artifact_path(name))
+        self.state['artifacts'][name] = fingerprint(value)
+
+    def load(self, name):
+        """Value of an artifact from this run, or as saved by an earlier one."""
+        if name not in self.values:
+            path = self._artifact_path(name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No {name!r} artifact yet; run stage {self.producers[name]!r} first")
+            with open(path, 'r', encoding='utf-8') as f:
+                self.values[name] = json.load(f)
+        return self.values[name]
+
+    def stage_fingerprint(self, stage, context):
+        inputs = {name: self.state['artifacts'].get(name) for name in stage.inputs}
+        params = stage.params(context) if stage.params else None
+        return fingerprint({'inputs': inputs, 'params': params})
+
+    def is_fresh(self, stage, context):
+        """True if the stage last ran with the same input fingerprint and its outputs are on disk."""
+        if stage.always_run:
+            return False
+        previous = self.state['stages'].get(stage.name, {})
+        if previous.get('fingerprint') != self.stage_fingerprint(stage, context):
+            return False
+        outputs = [self._artifact_path(name) for name in stage.outputs] + list(stage.files)
+        return all(os.path.exists(path) for path in outputs)
+
+    def run_stage(self, stage, context, force=False):
+        """Run one stage (unless it is fresh); returns True if it ran."""
+        emit_progress('stage', stage.name)
+        if not force and self.is_fresh(stage, context):
+            print(f"[{stage.name}] inputs unchanged, skipped.")
+            METRICS.inc('stage_skipped_total', stage=stage.name)
+            return False
+        start = time.perf_counter()
+        inputs = {name: self.load(name) for name in stage.inputs}
+        # PIPELINE_PROFILE=<stage>[,<stage>...] or 'all' runs stages under cProfile
+        with profiled(stage.name) if profiling_enabled(stage.name) else nullcontext():
+            outputs = stage.func(inputs, context) or {}
+        missing = [name for name in stage.outputs if name not in outputs]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} did not return {missing}")
+        for name in stage.outputs:
+            self.values[name] = outputs[name]
+            self._write_artifact(name, outputs[name])
+        seconds = time.perf_counter() - start
+        METRICS.observe('stage_seconds', seconds, stage=stage.name)
+        self.state['stages'][stage.name] = {
+            'fingerprint': self.stage_fingerprint(stage, context),
+            'finished_at': time.time(),
+            'seconds': round(seconds, 3),
+        }
+        self._save_state()
+        print(f"[{stage.name}] done in {seconds:.2f}s.")
+        return True
+
+    def run(self, context=None, only=None, force=False):
+        """
+        Run all stages in order, or just the stages named in `only`.
+        force=True runs them even when their inputs are unchanged.
+        Returns the names of the stages that ran.
+        """
+        selected = self.stages if not only else [self.by_name[name] for name in only]
+        emit_progress('start', stages=[stage.name for stage in selected])
+        ran = [stage.name for stage in selected if self.run_stage(stage, context, force=force)]
+        emit_progress('done', ran=ran)
+        return ran
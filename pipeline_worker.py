@@ -0,0 +1,167 @@
+"""
+pipeline_worker.py
+Long-lived pipeline worker. It imports the pipeline modules once and keeps the
+HTTP session, TextBlob lexicon, Gemini model and caches warm, then runs the
+pipeline whenever a client asks over a local socket.
+Start it with `python pipeline_worker.py`; the Streamlit app starts one on demand.
+"""
+
+import os
+import sys
+import time
+import secrets
+import threading
+import traceback
+import importlib
+from contextlib import nullcontext, redirect_stdout, redirect_stderr
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+from progress import PROGRESS_ENV
+
+WORKER_HOST = '127.0.0.1'
+WORKER_PORT = int(os.environ.get('PIPELINE_WORKER_PORT', 8765))
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Shared secret of the worker and its clients, created on first use (readable by the owner only)
+WORKER_KEY_PATH = os.path.join(APP_DIR, '.pipeline_worker_key')
+# Where a worker run writes its output and progress events; clients cannot choose other paths
+WORKER_LOG_FILE = os.path.join(APP_DIR, 'pipeline_log.txt')
+WORKER_PROGRESS_FILE = os.path.join(APP_DIR, 'pipeline_progress.jsonl')
+
+def worker_authkey(path=WORKER_KEY_PATH):
+    """
+    The worker's authkey. multiprocessing.connection unpickles what an
+    authenticated client sends, so the key must not be guessable: a random key
+    is generated the first time and kept in a file only its owner can read.
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process may have just created it and not written the key yet
+        for _ in range(50):
+            with open(path, 'r', encoding='ascii') as f:
+                key = f.read().strip()
+            if key:
+                return key.encode()
+            time.sleep(0.02)
+        raise RuntimeError(f"Pipeline worker key file {path} is empty")
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(key)
+    return key.encode()
+
+class PipelineWorker:
+    """
+    Serves 'ping', 'status', 'run' and 'stop' requests (dicts with a 'cmd' key).
+    Runs happen one at a time on a background thread, so the worker keeps
+    answering while a run is in progress; each run still takes the cross-process
+    pipeline lock, so it cannot overlap with a run started elsewhere.
+    """
+
+    def __init__(self):
+        self.pipeline = None
+        self.runs = 0
+        self.last_error = None
+        self._run_lock = threading.Lock()
+
+    def warm_up(self):
+        """Import the pipeline and open the clients and caches a run needs."""
+        import run_pipeline
+        from news_crawler import get_session
+        from gazetteer import get_gazetteer
+        from geocode_cache import get_geocode_cache
+        from gemini_cache import get_gemini_store
+        # Loaded only to have folium and its plugins in the module cache before the first map
+        importlib.import_module('folium.plugins')
+        get_session()
+        # The first TextBlob call loads its lexicon
+        run_pipeline.sentiment_analysis.score_polarity('good')
+        get_gazetteer()
+        get_geocode_cache()
+        get_gemini_store()
+        api_key = run_pipeline.map_visualization.load_gemini_api_key()
+        if api_key:
+            run_pipeline.map_visualization.get_gemini_analyzer(api_key)
+        self.pipeline = run_pipeline
+
+    def busy(self):
+        return self._run_lock.locked()
+
+    def start_run(self, full_run=False, progress_file=WORKER_PROGRESS_FILE, log_file=WORKER_LOG_FILE):
+        """Start a run in the background; returns False if one is already running."""
+        if not self._run_lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._run, args=(full_run, progress_file, log_file), name='pipeline-run', daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, full_run, progress_file, log_file):
+        try:
+            if progress_file:
+                os.environ[PROGRESS_ENV] = progress_file
+            else:
+                os.environ.pop(PROGRESS_ENV, None)
+            log = open(log_file, 'w', encoding='utf-8', buffering=1) if log_file else nullcontext(sys.stdout)
+            with log as out, redirect_stdout(out), redirect_stderr(out):
+                try:
+                    self.pipeline.run_locked(full_run=full_run)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    traceback.print_exc()
+        finally:
+            self.runs += 1
+            self._run_lock.release()
+
+    def handle(self, request):
+        cmd = request.get('cmd') if isinstance(request, dict) else None
+        if cmd == 'ping':
+            return {'ok': True}
+        if cmd == 'status':
+            return {'ok': True, 'busy': self.busy(), 'runs': self.runs, 'last_error': self.last_error}
+        if cmd == 'run':
+            # Log and progress paths are the worker's own: a request only says whether to do a full run
+            started = self.start_run(bool(request.get('full_run', False)))
+            return {'ok': True, 'started': started, 'busy': not started}
+        if cmd == 'stop':
+            return {'ok': True, 'stopping': True}
+        return {'ok': False, 'error': f'unknown command {cmd!r}'}
+
+    def serve(self, host=WORKER_HOST, port=WORKER_PORT, authkey=None):
+        with Listener((host, port), authkey=authkey or worker_authkey()) as listener:
+            print(f"Pipeline worker listening on {host}:{port}")
+            while True:
+                try:
+                    with listener.accept() as conn:
+                        reply = self.handle(conn.recv())
+                        conn.send(reply)
+                except Exception as e:
+                    # A bad client (wrong key, dropped connection) must not stop the worker
+                    print(f"Pipeline worker: request failed: {e}")
+                    continue
+                if reply.get('stopping'):
+                    return
+
+def request_worker(request, host=WORKER_HOST, port=WORKER_PORT, authkey=None):
+    """Send one request to the worker; returns its reply, or None if no worker is listening."""
+    try:
+        with Client((host, port), authkey=authkey or worker_authkey()) as conn:
+            conn.send(request)
+            return conn.recv()
+    except (OSError, EOFError, multiprocessing.AuthenticationError):
+        return None
+
+def request_run(full_run=False):
+    """
+    Ask the worker to start a run. Returns 'started', 'busy', or None when no
+    worker is running. The run writes to WORKER_LOG_FILE and WORKER_PROGRESS_FILE.
+    """
+    reply = request_worker({'cmd': 'run', 'full_run': full_run})
+    if reply is None:
+        return None
+    return 'started' if reply.get('started') else 'busy'
+
+if __name__ == "__main__":
+    worker = PipelineWorker()
+    print("Warming up pipeline modules...")
+    worker.warm_up()
+    worker.serve()
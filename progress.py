@@ -0,0 +1,116 @@
+"""
+progress.py
+Machine-readable progress events, written as JSON lines to a side channel so a
+UI can follow a pipeline run without parsing its log output.
+"""
+
+import os
+import json
+import time
+import threading
+
+# The file to append events to; progress reporting is off when it is not set
+PROGRESS_ENV = 'PIPELINE_PROGRESS_FILE'
+
+_progress_lock = threading.Lock()
+_progress_start = time.monotonic()
+
+def progress_enabled():
+    return bool(os.environ.get(PROGRESS_ENV))
+
+def emit_progress(event, stage=None, i=None, n=None, **fields):
+    """
+    Append one event to the progress file named by $PIPELINE_PROGRESS_FILE:
+    {"event", "stage", "i", "n", "elapsed", ...}. event is 'start' (with the
+    list of stages), 'stage' (a stage began), 'progress' (item i of n done),
+    'done' or 'error'. Extra fields such as cache_hits are passed through.
+    """
+    global _progress_start
+    path = os.environ.get(PROGRESS_ENV)
+    if not path:
+        return
+    if event == 'start':
+        # Elapsed times count from the start of each run, also in a long-lived worker
+        _progress_start = time.monotonic()
+    record = {'event': event, 'stage': stage, 'elapsed': round(time.monotonic() - _progress_start, 3)}
+    if i is not None:
+        record['i'] = i
+    if n is not None:
+        record['n'] = n
+    record.update(fields)
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _progress_lock:
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            pass
+
+def read_progress(path, offset=0):
+    """
+    Read events appended since byte `offset`. Returns (events, new_offset);
+    a trailing partial line is left for the next call.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read()
+    except OSError:
+        return [], offset
+    end = chunk.rfind(b'\n') + 1
+    events = []
+    for line in chunk[:end].splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events, offset + end
+
+class ProgressState:
+    """
+    Folds events into an overall fraction done: each stage is an equal share,
+    and 'progress' events fill in the current stage's share.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.stage = None
+        self.i = 0
+        self.n = 0
+        self.detail = {}
+        self.finished = False
+        self.elapsed = 0.0
+
+    def apply(self, event):
+        self.elapsed = event.get('elapsed', self.elapsed)
+        kind = event.get('event')
+        if kind == 'start':
+            self.stages = event.get('stages') or []
+        elif kind == 'stage':
+            self.stage, self.i, self.n, self.detail = event.get('stage'), 0, 0, {}
+        elif kind == 'progress':
+            self.stage = event.get('stage', self.stage)
+            self.i, self.n = event.get('i', 0), event.get('n', 0)
+            self.detail = {k: v for k, v in event.items() if k not in ('event', 'stage', 'i', 'n', 'elapsed')}
+        elif kind in ('done', 'error'):
+            self.finished = True
+
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        if not self.stages or self.stage not in self.stages:
+            return 0.0
+        within = self.i / self.n if self.n else 0.0
+        return min(1.0, (self.stages.index(self.stage) + within) / len(self.stages))
+
+    def describe(self):
+        if self.finished:
+            return f"Finished in {self.elapsed:.1f}s"
+        if self.stage is None:
+            return "Starting..."
+        text = f"{self.stage}"
+        if self.n:
+            text += f": {self.i} of {self.n}"
+        if self.detail:
+            text += ' (' + ', '.join(f"{k.replace('_', ' ')} {v}" for k, v in self.detail.items()) + ')'
+        return text + f" - {self.elapsed:.1f}s"
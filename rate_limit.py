@@ -0,0 +1,89 @@
+"""
+rate_limit.py
+Thread-safe token buckets for keeping API calls within a provider's quota.
+"""
+
+import time
+import random
+import threading
+
+class TokenBucket:
+    """
+    Allows `rate` units per `per` seconds, with bursts of up to `capacity` units.
+    acquire() blocks until enough units are available; pause() holds every
+    caller off for a while (e.g. after the provider answered 429).
+    """
+
+    def __init__(self, rate, per=60.0, capacity=None):
+        self.rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        # A request larger than the whole bucket is let through once the bucket is full
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= amount:
+                        self.tokens -= amount
+                        return
+                    wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class RateLimiter:
+    """
+    Requests-per-minute and (optionally) tokens-per-minute limits shared by all
+    worker threads, with exponential backoff that slows every worker down when
+    the provider reports it is rate limiting us.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, backoff_base=2.0, backoff_cap=60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.throttled = 0
+
+    def acquire(self, tokens=0):
+        self.requests.acquire()
+        if self.tokens and tokens:
+            self.tokens.acquire(tokens)
+
+    def backoff(self, attempt, rate_limited=True):
+        """
+        Sleep before retry number `attempt` (0-based) with jittered exponential delay.
+        When rate_limited, every other worker is held off for the same delay.
+        Returns the delay in seconds.
+        """
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        delay *= random.uniform(0.75, 1.25)
+        if rate_limited:
+            self.throttled += 1
+            self.requests.pause(delay)
+            if self.tokens:
+                self.tokens.pause(delay)
+        time.sleep(delay)
+        return delay
+
+def is_rate_limit_error(error):
+    """True for HTTP 429 / quota-exhausted errors from an API client."""
+    text = f"{type(error).__name__} {error}".lower()
+    return '429' in text or 'resourceexhausted' in text or 'resource exhausted' in text or 'quota' in text or 'rate limit' in text
+
+def is_auth_error(error):
+    """True for errors retrying cannot fix: a missing, invalid or unauthorized API key (HTTP 401 / 403)."""
+    text = f"{type(error).__name__} {error}".lower()
+    return ('401' in text or '403' in text or 'permissiondenied' in text or 'permission denied' in text
+            or 'unauthenticated' in text or 'api key' in text or 'api_key' in text)
@@ -1,75 +1,202 @@
 """
 run_pipeline.py
 Automates the full pipeline: crawl news, analyze sentiment, and visualize on map.
+The pipeline is a list of stages (retention, crawl, bodies, sentiment, dedup,
+gemini, geocode, map) with declared inputs and outputs; a stage whose inputs are unchanged since
+its last run is skipped (see pipeline_runner.Pipeline).
+Only new or changed articles (by canonical URL and content hash) are analyzed;
+run with --full to reprocess every crawled article. Articles are stored in daily
+partitions (see article_store.PartitionedArticleStore). Only one run can be
+in progress at a time (see pipeline_lock.PipelineLock).
+The pipeline can also be run in a warm, long-lived process: see pipeline_worker.py.
+
+Usage: python run_pipeline.py [--full] [--force] [--bodies] [--stage NAME ...] [--profile STAGES]
 """
 
 import importlib
-import json
-import datetime
 
 # Import modules
+pipeline_lock = importlib.import_module('pipeline_lock')
+pipeline_runner = importlib.import_module('pipeline_runner')
 news_crawler = importlib.import_module('news_crawler')
 sentiment_analysis = importlib.import_module('sentiment_analysis')
 map_visualization = importlib.import_module('map_visualization')
+article_store = importlib.import_module('article_store')
+metrics = importlib.import_module('metrics')
+dedup = importlib.import_module('dedup')
+sg_relevance = importlib.import_module('sg_relevance')
+
+def latest_store():
+    return article_store.PartitionedArticleStore(article_store.LATEST_ARTICLES_DIR, legacy_json='latest_articles.json')
+
+def analyzed_store():
+    return article_store.PartitionedArticleStore(article_store.ANALYZED_ARTICLES_DIR, legacy_json='articles_with_sentiment.json')
+
+def retention_stage(inputs, context):
+    # Retention: drop whole day partitions older than RETENTION_DAYS
+    removed = {}
+    for store in (latest_store(), analyzed_store()):
+        removed[store.root] = store.prune()
+        if removed[store.root]:
+            print(f"Removed expired partitions from {store.root}/: {', '.join(removed[store.root])}")
+    return {'retention': removed}
+
+def crawl_stage(inputs, context):
+    print("Crawling news...")
+    articles = news_crawler.crawl_news()
+    print(f"Crawled {len(articles)} articles.")
+    metrics.METRICS.set('articles', len(articles), stage='crawl')
+    store = latest_store()
+    days = store.save(articles)
+    print(f"Saved {len(articles)} articles to {store.root}/ ({', '.join(days) or 'no partitions'}).")
+    return {'crawled': articles}
+
+def bodies_stage(inputs, context):
+    # Optional: fill in article text for the outlets whose listings only give headlines
+    articles = inputs['crawled']
+    if context['bodies']:
+        print("Fetching article bodies...")
+        articles = news_crawler.fetch_article_bodies(articles)
+        latest_store().save(articles)
+    return {'articles': articles}
+
+def sentiment_stage(inputs, context):
+    # Delta mode (default): only new or changed articles are analyzed; full_run reprocesses everything
+    store = analyzed_store()
+    stored = store.load(store.recent_days())
+    new, changed, unchanged = article_store.diff_articles(inputs['articles'], stored)
+    if context['full_run']:
+        pending = new + changed + [{**a, 'content_hash': article_store.content_hash(a)} for a in unchanged]
+        unchanged = []
+    else:
+        # Unchanged articles whose Gemini request failed last time are sent again
+        retry = [a for a in unchanged if map_visualization.needs_gemini_result(a)]
+        unchanged = [a for a in unchanged if not map_visualization.needs_gemini_result(a)]
+        pending = new + changed + retry
+        if retry:
+            print(f"Retrying Gemini for {len(retry)} unchanged articles without a result.")
+    print(f"Delta: {len(new)} new, {len(changed)} changed, {len(unchanged)} unchanged articles.")
+    for kind, group in (('new', new), ('changed', changed), ('unchanged', unchanged)):
+        metrics.METRICS.set('delta_articles', len(group), kind=kind)
+    print("Analyzing sentiment...")
+    results = sentiment_analysis.analyze_sentiment(pending)
+    print(f"Processed sentiment for {len(results)} articles.")
+    return {'scored': results, 'unchanged': unchanged}
+
+def dedup_stage(inputs, context):
+    # The same story from several outlets: analyzed, geocoded and mapped once
+    clusters = dedup.find_clusters(inputs['articles'])
+    print(f"Near-duplicates: {len(clusters)} stories reported by more than one outlet.")
+    metrics.METRICS.set('dedup_clusters', len(clusters))
+    return {'clusters': clusters}
+
+def gemini_stage(inputs, context):
+    # Gemini Singapore relevance & place analysis
+    print("Running Gemini Singapore relevance & place analysis...")
+    results_with_gemini = map_visualization.process_articles_with_gemini(inputs['scored'], clusters=inputs['clusters'])
+    metrics.METRICS.set('articles', len(results_with_gemini), stage='gemini')
+    store = analyzed_store()
+    days = store.save(results_with_gemini)
+    print(f"Saved {len(results_with_gemini)} articles with sentiment and Gemini results to {store.root}/ ({', '.join(days) or 'no partitions'}).")
+    return {'enriched': results_with_gemini}
+
+def geocode_stage(inputs, context):
+    # Coordinates of the distinct places of the articles in the current crawl
+    print("Geocoding article places...")
+    places = map_visualization.geocode_articles(inputs['unchanged'] + inputs['enriched'], clusters=inputs['clusters'])
+    metrics.METRICS.set('articles', len(places), stage='geocode')
+    return {'places': places}
+
+def map_stage(inputs, context):
+    # Markers from the geocoded places: no network or cache lookups from here on
+    print("Generating map visualization...")
+    markers = map_visualization.collect_map_markers(inputs['unchanged'] + inputs['enriched'], clusters=inputs['clusters'], places=inputs['places'])
+    metrics.METRICS.set('articles', len(markers), stage='map')
+    map_visualization.render_map(markers)
+    return {'map': {'path': map_visualization.MAP_OUTPUT_PATH, 'mode': map_visualization.MAP_RENDER_MODE}}
+
+def map_files():
+    files = [map_visualization.MAP_OUTPUT_PATH]
+    if map_visualization.MAP_RENDER_MODE == 'shell':
+        files.append(map_visualization.MAP_DATA_PATH)
+    return files
+
+STAGES = [
+    # Re-run once a day: which partitions expire only depends on the date
+    pipeline_runner.Stage('retention', retention_stage, outputs=['retention'],
+                          params=lambda context: article_store.today_sgt().isoformat()),
+    # The news sites are an outside input, so the crawl always runs
+    pipeline_runner.Stage('crawl', crawl_stage, outputs=['crawled'], always_run=True),
+    pipeline_runner.Stage('bodies', bodies_stage, inputs=['crawled'], outputs=['articles'],
+                          params=lambda context: {'enabled': context['bodies'], 'max_chars': news_crawler.BODY_MAX_CHARS}),
+    pipeline_runner.Stage('sentiment', sentiment_stage, inputs=['articles'], outputs=['scored', 'unchanged'],
+                          params=lambda context: {'full_run': context['full_run']}),
+    pipeline_runner.Stage('dedup', dedup_stage, inputs=['articles'], outputs=['clusters'],
+                          params=lambda context: {'threshold': dedup.DEDUP_THRESHOLD, 'bands': dedup.LSH_BANDS, 'ids': dedup.ARTICLE_ID_VERSION}),
+    pipeline_runner.Stage('gemini', gemini_stage, inputs=['scored', 'clusters'], outputs=['enriched'],
+                          params=lambda context: {'model': map_visualization.GEMINI_MODEL_NAME, 'prompt_version': map_visualization.GEMINI_PROMPT_VERSION,
+                                                  'relevance': [sg_relevance.SG_RELATED_SCORE, sg_relevance.SG_UNRELATED_SCORE]}),
+    pipeline_runner.Stage('geocode', geocode_stage, inputs=['unchanged', 'enriched', 'clusters'], outputs=['places']),
+    pipeline_runner.Stage('map', map_stage, inputs=['unchanged', 'enriched', 'clusters', 'places'], outputs=['map'],
+                          params=lambda context: map_visualization.MAP_RENDER_MODE, files=map_files()),
+]
+
+def build_pipeline():
+    return pipeline_runner.Pipeline(STAGES)
+
+def run_pipeline(full_run=False, only=None, force=False, bodies=None):
+    """
+    One pipeline run: every stage in order, or just the stages named in `only`.
+    Delta mode (default): only new or changed articles are analyzed; full_run
+    reprocesses everything. Stages with unchanged inputs are skipped unless
+    force. bodies fetches article text for headline-only outlets (default
+    news_crawler.FETCH_ARTICLE_BODIES). Callers hold the pipeline lock.
+    Stage timings and counters are written to .pipeline/metrics.prom and
+    .pipeline/metrics.jsonl (see metrics.py), also when the run fails.
+    """
+    metrics.METRICS.reset()
+    try:
+        pipeline = build_pipeline()
+        bodies = news_crawler.FETCH_ARTICLE_BODIES if bodies is None else bodies
+        ran = pipeline.run({'full_run': full_run, 'bodies': bodies}, only=only, force=force)
+        metrics.METRICS.set('stages_run', len(ran))
+    finally:
+        metrics.write_metrics()
+    if not only:
+        pipeline_lock.record_success()
+        print("Pipeline complete. Open singapore_news_sentiment_map.html to view the map.")
+    return ran
+
+def run_locked(full_run=False, only=None, force=False, bodies=None):
+    """
+    Run the pipeline under the cross-process lock (single flight).
+    Returns False, without running, if another run is in progress.
+    """
+    lock = pipeline_lock.PipelineLock()
+    if not lock.acquire():
+        print("Another pipeline run is in progress; not starting a second one.")
+        return False
+    try:
+        run_pipeline(full_run=full_run, only=only, force=force, bodies=bodies)
+    except Exception as e:
+        pipeline_runner.emit_progress('error', error=str(e))
+        raise
+    finally:
+        lock.release()
+    return True
 
-def remove_old_articles(json_path, date_key="timestamp", days=3):
-    from dateutil import parser as date_parser
-    import os
-    if not os.path.exists(json_path):
-        return
-    with open(json_path, 'r', encoding='utf-8') as f:
-        try:
-            articles = json.load(f)
-        except Exception:
-            return
-    now = datetime.datetime.now()
-    filtered = []
-    for article in articles:
-        ts = article.get(date_key)
-        if not ts:
-            filtered.append(article)
-            continue
-        try:
-            # Try parsing both ISO and non-ISO formats
-            try:
-                dt = date_parser.parse(ts)
-            except Exception:
-                dt = datetime.datetime.strptime(ts, "%a, %d %b %Y %H:%M:%S %z")
-            if (now - dt).days <= days:
-                filtered.append(article)
-        except Exception:
-            filtered.append(article)
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(filtered, f, ensure_ascii=False, indent=2)
-
-# Remove old articles before pipeline runs
-remove_old_articles('latest_articles.json')
-remove_old_articles('articles_with_sentiment.json')
-
-# Step 1: Crawl news
-print("Crawling news...")
-articles = news_crawler.crawl_news()
-print(f"Crawled {len(articles)} articles.")
-with open('latest_articles.json', 'w', encoding='utf-8') as f:
-    json.dump(articles, f, ensure_ascii=False, indent=2)
-print(f"Saved {len(articles)} articles to latest_articles.json.")
-
-# Step 2: Sentiment analysis
-print("Analyzing sentiment...")
-results = sentiment_analysis.analyze_sentiment(articles)
-print(f"Processed sentiment for {len(results)} articles.")
-with open('articles_with_sentiment.json', 'w', encoding='utf-8') as f:
-    json.dump(results, f, ensure_ascii=False, indent=2)
-print(f"Saved sentiment results to articles_with_sentiment.json.")
-
-# Step 2.5: Gemini Singapore relevance & place analysis
-print("Running Gemini Singapore relevance & place analysis...")
-results_with_gemini = map_visualization.process_articles_with_gemini(results)
-with open('articles_with_sentiment.json', 'w', encoding='utf-8') as f:
-    json.dump(results_with_gemini, f, ensure_ascii=False, indent=2)
-print(f"Saved Gemini-processed results to articles_with_sentiment.json.")
-
-# Step 3: Map visualization
-print("Generating map visualization...")
-map_visualization.plot_emojis_on_map(results_with_gemini)
-print("Pipeline complete. Open singapore_news_sentiment_map.html to view the map.")
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Crawl, analyze and map Singapore news.')
+    parser.add_argument('--full', action='store_true', help='reprocess every crawled article')
+    parser.add_argument('--force', action='store_true', help='run stages even if their inputs are unchanged')
+    parser.add_argument('--bodies', action='store_true', default=None,
+                        help='fetch article text for Today Online and Mothership (same as FETCH_ARTICLE_BODIES=1)')
+    parser.add_argument('--stage', action='append', choices=[stage.name for stage in STAGES],
+                        help='run only this stage (repeatable), using inputs saved by earlier runs')
+    parser.add_argument('--profile', metavar='STAGES',
+                        help="run these stages (comma-separated, or 'all') under cProfile; same as PIPELINE_PROFILE")
+    args = parser.parse_args()
+    if args.profile:
+        metrics.PROFILE_STAGES = args.profile
+    run_locked(full_run=args.full, only=args.stage, force=args.force, bodies=args.bodies)
@@ -5,19 +5,35 @@ Runs the news crawler every hour and saves results for further processing.
 
 import time
 import importlib
-import json
 
 # Import the crawl_news function from news_crawler
 news_crawler = importlib.import_module('news_crawler')
+article_store = importlib.import_module('article_store')
+pipeline_lock = importlib.import_module('pipeline_lock')
 
-def run_hourly():
-    while True:
+def crawl_once():
+    """
+    Crawl and save to the daily partitions under the pipeline lock, like a
+    pipeline run; returns False (and does nothing) while a run holds the lock.
+    """
+    with pipeline_lock.PipelineLock() as acquired:
+        if not acquired:
+            print("A pipeline run is in progress; skipping this crawl.")
+            return False
         print("Crawling news...")
         articles = news_crawler.crawl_news()
-        # Save articles to a file for sentiment analysis
-        with open('latest_articles.json', 'w', encoding='utf-8') as f:
-            json.dump(articles, f, ensure_ascii=False, indent=2)
-        print(f"Saved {len(articles)} articles to latest_articles.json.")
+        if news_crawler.FETCH_ARTICLE_BODIES:
+            articles = news_crawler.fetch_article_bodies(articles)
+        # Save articles to their daily partitions for sentiment analysis
+        store = article_store.PartitionedArticleStore(article_store.LATEST_ARTICLES_DIR, legacy_json='latest_articles.json')
+        store.save(articles)
+        store.prune()
+        print(f"Saved {len(articles)} articles to {store.root}/.")
+        return True
+
+def run_hourly():
+    while True:
+        crawl_once()
         print("Sleeping for 1 hour...")
         time.sleep(3600)
 
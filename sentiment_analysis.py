@@ -3,31 +3,384 @@ sentiment_analysis.py
 Performs sentiment analysis on news articles.
 """
 
+import os
+import re
 import json
-from textblob import TextBlob
+import time
+import abc
+import functools
+import hashlib
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from sqlite_util import connect_sqlite
+from progress import emit_progress
 
-def analyze_sentiment(articles):
+SENTIMENT_CACHE_PATH = 'sentiment_cache.sqlite'
+# Below this many texts to score, a process pool costs more than it saves
+PARALLEL_MIN_TEXTS = 500
+PARALLEL_CHUNK_SIZE = 200
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def score_polarity(text):
+    from textblob import TextBlob
+    return TextBlob(text).sentiment.polarity
+
+def _score_chunk(texts):
+    # Top-level so it can be pickled into worker processes
+    return [score_polarity(text) for text in texts]
+
+def score_texts(texts, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """
+    Polarity for each text, in order. With workers > 1 the texts are scored in
+    chunks across a process pool; workers=None uses one process per CPU.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(texts) <= chunk_size:
+        return _score_chunk(texts)
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    scores = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_scores in executor.map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+    return scores
+
+class SentimentScorer(abc.ABC):
+    """
+    Interface for polarity scorers: score_batch(texts) returns one polarity in
+    [-1, 1] per text. `name` keys the memo cache, so scorers never share scores.
+    """
+    name = None
+
+    @abc.abstractmethod
+    def score_batch(self, texts, workers=1):
+        """Return the polarity of each text, in order."""
+
+class TextBlobScorer(SentimentScorer):
+    """TextBlob's pattern-based analyzer (the reference scorer), optionally across processes."""
+    name = 'textblob'
+
+    def score_batch(self, texts, workers=1):
+        return score_texts(texts, workers=workers)
+
+NEGATIONS = ('no', 'not', "n't", 'never')
+# Quotes are split off as tokens of their own, as in TextBlob
+QUOTES = '\'"\u2018\u2019\u201c\u201d'
+
+@functools.lru_cache(maxsize=None)
+def lexicon_token_pattern():
+    """
+    Regex finding the tokens TextBlob's tokenizer yields: words with the
+    punctuation split off their start and end ("first-generation" stays whole),
+    abbreviations with their final '.' ("Mr."), '...', '(!)' and each other
+    punctuation mark on its own. Built from TextBlob's own punctuation and
+    abbreviation lists.
+    """
+    from textblob import _text
+    leading = re.escape(_text.PUNCTUATION.replace('.', ''))
+    trailing = re.escape(_text.PUNCTUATION)
+    abbreviations = '|'.join(re.escape(a) for a in sorted(_text.ABBREVIATIONS, key=len, reverse=True) if a.endswith('.'))
+    return re.compile(
+        rf"(?<![^\s{leading}])(?:{abbreviations}|(?:[A-Za-z]\.)+|[A-Z][bcdfghjklmnpqrstvwxz]+\.)(?!\.\.)(?=[{trailing}]*(?!\S))"
+        rf"|[^\s{leading}]\S*[^\s{trailing}]|[^\s{trailing}]|\(\s*!\s*\)|\.\.\.|[{trailing}]"
+    )
+
+@functools.lru_cache(maxsize=None)
+def lexicon_emoticons():
+    """
+    {emoticon (lower-cased): polarity} from TextBlob's list, less the forms
+    TextBlob never checks (all letters, over 5 characters, or punctuation);
+    the first mood listing one wins, as in TextBlob.
+    """
+    from textblob import _text
+    emoticons = {}
+    for (_, polarity), forms in _text.EMOTICONS.items():
+        for form in map(str.lower, forms):
+            if not form.isalpha() and len(form) <= 5 and form not in _text.PUNCTUATION:
+                emoticons.setdefault(form, polarity)
+    return emoticons
+
+def lexicon_tokens(text):
+    """
+    Tokens of a text as TextBlob splits them ("don't" -> "do", "n", "t"), not yet lower-cased.
+    TextBlob also joins punctuation spaced out within a sentence into an
+    emoticon (": 3" -> ":3"); the few texts where that can happen are
+    tokenized by TextBlob itself, which knows the sentence boundaries.
+    """
+    from textblob import _text
+    original = text
+    text = text.replace("n't", " n't")
+    for quote in QUOTES:
+        text = text.replace(quote, " ' ")
+    tokens = lexicon_token_pattern().findall(text)
+    if _text.RE_EMOTICONS.search(' '.join(tokens)):
+        return ' '.join(_text.find_tokens(original)).split()
+    return tokens
+
+def load_textblob_lexicon():
+    """
+    Read the en-sentiment.xml lexicon shipped with TextBlob into
+    {word: (polarity, intensity, is_modifier)}, averaged the way TextBlob does
+    (over senses per part of speech, then over parts of speech). Like TextBlob,
+    every adjective also gives its adverb ("terrible" -> "terribly"). Adverbs
+    (RB) modify the word that follows them.
+    """
+    import xml.etree.ElementTree as ElementTree
+    import textblob
+    path = os.path.join(os.path.dirname(textblob.__file__), 'en', 'en-sentiment.xml')
+    senses = {}
+    for word in ElementTree.parse(path).getroot().iter('word'):
+        form = word.get('form')
+        if not form:
+            continue
+        values = (float(word.get('polarity', 0.0)), float(word.get('intensity', 1.0)))
+        senses.setdefault(form, {}).setdefault(word.get('pos'), []).append(values)
+    lexicon = {}
+    adjectives = []
+    for form, by_pos in senses.items():
+        per_pos = {
+            pos: (sum(p for p, _ in values) / len(values), sum(i for _, i in values) / len(values))
+            for pos, values in by_pos.items()
+        }
+        lexicon[form] = (
+            sum(p for p, _ in per_pos.values()) / len(per_pos),
+            sum(i for _, i in per_pos.values()) / len(per_pos),
+            'RB' in by_pos,
+        )
+        if 'JJ' in per_pos:
+            adjectives.append((form, per_pos['JJ']))
+    for form, (polarity, intensity) in adjectives:
+        if form.endswith('y'):
+            form = form[:-1] + 'i'
+        if form.endswith('le'):
+            form = form[:-2]
+        lexicon[form + 'ly'] = (polarity, intensity, True)
+    return lexicon
+
+class LexiconScorer(SentimentScorer):
+    """
+    Vectorized lexicon scorer reproducing TextBlob's pattern analyzer.
+    The whole batch is tokenized once and each distinct token is looked up in
+    the vocabulary once; the analyzer's left-to-right rules are then
+    evaluated for all tokens at once with cumulative sums:
+    - an adverb merges with the known word after it ("very good" scores good x
+      intensity of very), across unknown words of up to two letters;
+    - a negation flips and halves the assessment ("not good" = -0.5 x good) and
+      inverts its intensity, across unknown one-letter words;
+    - each '!' after an assessment multiplies it by 1.25, and '(!)' (irony) is
+      an assessment of 0;
+    - an emoticon (":-)") is an assessment of its mood's polarity, and a word an
+      adverb before it modifies merges into it.
+    A text's score is the mean of its assessments, a bincount reduction rather
+    than a Python loop per article.
+    `lexicon` maps word -> (polarity, intensity, is_modifier); by default
+    TextBlob's own lexicon is used.
+    """
+    # Versioned: polarities memoized under an earlier version of the rules are not reused
+    name = 'lexicon-3'
+
+    def __init__(self, lexicon=None):
+        import numpy as np
+        if lexicon is None:
+            lexicon = load_textblob_lexicon()
+        words = sorted(lexicon)
+        self.vocab = {word: i for i, word in enumerate(words)}
+        # A trailing entry for out-of-vocabulary tokens, so id -1 indexes it
+        self.polarity = np.array([lexicon[w][0] for w in words] + [0.0])
+        self.intensity = np.array([lexicon[w][1] for w in words] + [1.0])
+        self.is_modifier = np.array([bool(lexicon[w][2]) for w in words] + [False])
+
+    def score_batch(self, texts, workers=1):
+        import numpy as np
+        n = len(texts)
+        if n == 0:
+            return []
+        token_lists = [lexicon_tokens(text) for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=n)
+        total = int(lengths.sum())
+        if total == 0:
+            return [0.0] * n
+        distinct = {token: i for i, token in enumerate(dict.fromkeys(chain.from_iterable(token_lists)))}
+        inverse = np.fromiter(map(distinct.__getitem__, chain.from_iterable(token_lists)), dtype=np.int64, count=total)
+        unique_tokens = np.array([t.lower() for t in distinct], dtype=object)
+        ids = np.fromiter((self.vocab.get(t, -1) for t in unique_tokens), dtype=np.int64, count=len(unique_tokens))[inverse]
+        negation = np.fromiter((t in NEGATIONS for t in unique_tokens), dtype=bool, count=len(unique_tokens))[inverse]
+        size = np.fromiter((len(t) for t in unique_tokens), dtype=np.int64, count=len(unique_tokens))[inverse]
+        adverb_ly = np.fromiter((t.endswith('ly') for t in unique_tokens), dtype=bool, count=len(unique_tokens))[inverse]
+        exclaim = (unique_tokens == '!')[inverse]
+        # '(!)' as written, spaces included; a lone '(' is punctuation
+        irony = np.fromiter((t.startswith('(') and len(t) > 1 for t in unique_tokens), dtype=bool, count=len(unique_tokens))[inverse]
+        emoticons = lexicon_emoticons()
+        mood = np.fromiter((emoticons.get(t, np.nan) for t in unique_tokens), dtype=float, count=len(unique_tokens))[inverse]
+        known = ids >= 0
+        emoticon = ~known & ~np.isnan(mood)
+        position = np.arange(total)
+        doc = np.repeat(np.arange(n), lengths)
+        doc_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        doc_end = doc_start + lengths[doc]
+
+        def last_before(flags):
+            # Index of the last flagged token before each token in the same text, or -1
+            last = np.maximum.accumulate(np.where(flags, position, -1))
+            last = np.concatenate(([-1], last[:-1]))
+            return np.where(last >= doc_start, last, -1)
+
+        def count_between(flags, lo, hi):
+            # Flagged tokens strictly between positions lo and hi (lo < hi)
+            total_before = np.concatenate(([0], np.cumsum(flags)))
+            return total_before[hi] - total_before[np.minimum(lo + 1, hi)]
+
+        # The modifier in effect is the last known word, if it is an adverb and no
+        # longer unknown word came since. A negation right after an '-ly' adverb
+        # ("really not good") is absorbed by it and does not end it.
+        prev_known = last_before(known)
+        has_prev = prev_known >= 0
+        safe_prev = np.where(has_prev, prev_known, 0)
+        absorbed_negation = ~known & negation & has_prev & adverb_ly[safe_prev]
+        ends_modifier = ~known & (size > 2) & ~absorbed_negation
+        modifier_on = has_prev & self.is_modifier[ids[safe_prev]] & (count_between(ends_modifier, safe_prev, position) == 0)
+        absorbed_negation &= modifier_on
+        merged = known & modifier_on
+        # The negation in effect is the last one since the previous known word,
+        # unless the modifier absorbed it or a longer unknown word came since
+        prev_negation = last_before(negation)
+        has_negation = (prev_negation >= 0) & (prev_negation >= prev_known)
+        safe_negation = np.where(has_negation, prev_negation, 0)
+        ends_negation = ~known & ~negation & (size > 1)
+        negated = (known & has_negation & ~absorbed_negation[safe_negation]
+                   & (count_between(ends_negation, safe_negation, position) == 0))
+        # An assessment starts at each known word that is not merged into the one
+        # before, at each '(!)' and at each emoticon; a merged word rescales by the
+        # intensity of the assessment it merges into (1 for an emoticon)
+        prev_assessed = last_before(known | emoticon)
+        safe_assessed = np.where(prev_assessed >= 0, prev_assessed, 0)
+        intensity = np.where(negated, 1.0 / self.intensity[ids], self.intensity[ids])
+        polarity = np.where(emoticon, mood, self.polarity[ids])
+        values = np.where(merged, np.clip(polarity * intensity[safe_assessed], -1.0, 1.0), polarity)
+        assessed = known | irony | emoticon
+        assessed_positions = position[assessed]
+        head = ~merged[assessed]
+        assessment = np.cumsum(head) - 1
+        count = int(head.sum())
+        last = np.full(count, -1, dtype=np.int64)
+        np.maximum.at(last, assessment, assessed_positions)
+        # An absorbed negation negates the latest assessment, the adverb's or an emoticon after it
+        negates = negated.copy()
+        negates[prev_assessed[absorbed_negation]] = True
+        assessment_negated = np.bincount(assessment, weights=negates[assessed], minlength=count) > 0
+        # '!' between an assessment's last word and the next assessment boosts it
+        head_positions = assessed_positions[head]
+        next_head = np.append(head_positions[1:], total)
+        assessment_end = np.minimum(next_head, doc_end[head_positions])
+        boosts = count_between(exclaim, last, assessment_end)
+        scores_by_assessment = np.clip(values[last] * 1.25 ** boosts, -1.0, 1.0)
+        scores_by_assessment = np.where(assessment_negated, scores_by_assessment * -0.5, scores_by_assessment)
+        assessment_doc = doc[head_positions]
+        sums = np.bincount(assessment_doc, weights=scores_by_assessment, minlength=n)
+        counts = np.bincount(assessment_doc, minlength=n)
+        scores = np.divide(sums, counts, out=np.zeros(n), where=counts > 0)
+        return scores.tolist()
+
+SCORERS = {'textblob': TextBlobScorer, 'lexicon': LexiconScorer}
+_scorers = {}
+
+def get_scorer(name):
+    """Return a (shared) scorer instance by name: 'textblob' or 'lexicon'."""
+    if name not in _scorers:
+        _scorers[name] = SCORERS[name]()
+    return _scorers[name]
+
+class SentimentCache:
+    """Persistent text hash -> polarity memo, per scoring engine."""
+
+    def __init__(self, path=SENTIMENT_CACHE_PATH):
+        self._conn = connect_sqlite(path)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS polarity (
+                text_hash TEXT NOT NULL,
+                scorer TEXT NOT NULL,
+                polarity REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (text_hash, scorer)
+            )
+        ''')
+
+    def get_many(self, hashes, scorer):
+        found = {}
+        hashes = list(dict.fromkeys(hashes))
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT text_hash, polarity FROM polarity WHERE scorer = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                [scorer, *chunk]
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def put_many(self, scores, scorer):
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO polarity (text_hash, scorer, polarity, updated_at) VALUES (?, ?, ?, ?)',
+                [(h, scorer, polarity, now) for h, polarity in scores.items()]
+            )
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def close(self):
+        self._conn.close()
+
+def label_sentiment(polarity):
+    """Map a polarity score to (sentiment, emoji, reason) using the +/-0.2 thresholds."""
+    if polarity > 0.2:
+        return 'positive', '😊', 'Positive sentiment detected.'
+    elif polarity < -0.2:
+        return 'negative', '😞', 'Negative sentiment detected.'
+    return 'neutral', '😐', 'Neutral sentiment detected.'
+
+def analyze_sentiment(articles, scorer='textblob', engine='auto', workers=None, use_cache=True, cache_path=SENTIMENT_CACHE_PATH):
     """
     Takes a list of articles and returns a list with sentiment scores and reasons.
+
+    scorer: 'textblob' (reference) or 'lexicon' (vectorized NumPy lexicon), or a
+    SentimentScorer instance.
+    engine: 'serial' scores in this process, 'parallel' across a process pool,
+    'auto' goes parallel once there are PARALLEL_MIN_TEXTS uncached texts.
+    With use_cache, polarity is memoized by text hash so identical text is never
+    rescored across runs.
     """
+    if isinstance(scorer, str):
+        scorer = get_scorer(scorer)
+    texts = [article.get('content') or article.get('title') or '' for article in articles]
+    hashes = [text_hash(text) for text in texts]
+    cache = SentimentCache(cache_path) if use_cache else None
+    polarity_by_hash = cache.get_many(hashes, scorer.name) if cache else {}
+    # Score each distinct uncached text once
+    todo = {}
+    for h, text in zip(hashes, texts):
+        if h not in polarity_by_hash:
+            todo.setdefault(h, text)
+    if todo:
+        parallel = engine == 'parallel' or (engine == 'auto' and len(todo) >= PARALLEL_MIN_TEXTS)
+        scores = scorer.score_batch(list(todo.values()), workers=workers if parallel else 1)
+        new_scores = dict(zip(todo.keys(), scores))
+        polarity_by_hash.update(new_scores)
+        if cache:
+            cache.put_many(new_scores, scorer.name)
+    if cache:
+        print(f"Sentiment cache: {len(articles) - len(todo)} cached, {len(todo)} scored.")
+        cache.close()
+    emit_progress('progress', 'sentiment', i=len(articles), n=len(articles), cache_hits=len(articles) - len(todo))
     results = []
-    for article in articles:
-        text = article.get('content') or article.get('title')
-        blob = TextBlob(text)
-        polarity = blob.sentiment.polarity
-        if polarity > 0.2:
-            sentiment = 'positive'
-            emoji = '😊'
-            reason = 'Positive sentiment detected.'
-        elif polarity < -0.2:
-            sentiment = 'negative'
-            emoji = '😞'
-            reason = 'Negative sentiment detected.'
-        else:
-            sentiment = 'neutral'
-            emoji = '😐'
-            reason = 'Neutral sentiment detected.'
+    for article, h in zip(articles, hashes):
+        polarity = polarity_by_hash[h]
+        sentiment, emoji, reason = label_sentiment(polarity)
         results.append({
             **article,
             'sentiment': sentiment,
@@ -37,12 +390,95 @@ def analyze_sentiment(articles):
         })
     return results
 
+def agreement_report(articles, baseline='textblob', candidate='lexicon'):
+    """
+    Score the articles with two scorers and print how often their
+    positive/neutral/negative labels agree, with a confusion matrix and timings.
+    """
+    texts = [article.get('content') or article.get('title') or '' for article in articles]
+    labels = {}
+    for name in (baseline, candidate):
+        scorer = get_scorer(name)
+        start = time.perf_counter()
+        scores = scorer.score_batch(texts)
+        elapsed = time.perf_counter() - start
+        labels[name] = [label_sentiment(score)[0] for score in scores]
+        print(f"{name}: {len(texts)} texts in {elapsed:.3f}s ({elapsed / max(len(texts), 1) * 1e6:.0f} us/text)")
+    classes = ['positive', 'neutral', 'negative']
+    agree = sum(a == b for a, b in zip(labels[baseline], labels[candidate]))
+    print(f"Label agreement: {agree}/{len(texts)} ({agree / max(len(texts), 1):.1%})")
+    header = f"{baseline} \\ {candidate}"
+    print(f"{header:<22}" + ''.join(f"{c:>10}" for c in classes))
+    matrix = {}
+    for a in classes:
+        row = [sum(1 for x, y in zip(labels[baseline], labels[candidate]) if x == a and y == b) for b in classes]
+        matrix[a] = dict(zip(classes, row))
+        print(f"{a:<22}" + ''.join(f"{count:>10}" for count in row))
+    return {'total': len(texts), 'agree': agree, 'confusion': matrix}
+
+# Pieces mixed into the fuzzed sentences: the tokens TextBlob's rules act on,
+# punctuation that can form emoticons, quotes and a paragraph break
+FUZZ_PIECES = ['not', 'never', 'no', "n't", "don't", 'very', 'really', 'terribly', 'good', 'great', 'bad', 'awful',
+               'Mr.', 'U.S.', 'a', 'I', '!', '(!)', '( ! )', '...', "'", '"', '\u2019', "touched'", ':', ';', ')', '(',
+               '-', '3', '8', 'D', 'x', 'o', '.', '=', '>', '*', '^', ':)', ':-)', ":'(", '<3', '\u2665', 'XD', '\n\n']
+
+def fuzz_report(articles, count=3000, seed=0):
+    """
+    Score `count` random sentences, built from the articles' words and
+    FUZZ_PIECES, with TextBlob and the lexicon scorer and print the ones whose
+    polarity differs. Returns the number of mismatches.
+    """
+    import random
+    rng = random.Random(seed)
+    words = ' '.join(f"{article.get('title') or ''} {article.get('content') or ''}" for article in articles).split()
+    pool = words + FUZZ_PIECES * max(1, len(words) // (2 * len(FUZZ_PIECES)))
+    texts = [rng.choice([' ', '']).join(rng.choice(pool) for _ in range(rng.randint(1, 30))) for _ in range(count)]
+    expected = get_scorer('textblob').score_batch(texts)
+    actual = get_scorer('lexicon').score_batch(texts)
+    mismatches = [(text, a, b) for text, a, b in zip(texts, expected, actual) if abs(a - b) > 1e-9]
+    for text, a, b in mismatches[:10]:
+        print(f"  textblob {a:.4f} lexicon {b:.4f}: {text!r}")
+    print(f"Polarity mismatches: {len(mismatches)}/{count} fuzzed sentences (seed {seed})")
+    return len(mismatches)
+
 if __name__ == "__main__":
-    # Load articles from latest_articles.json
-    with open('latest_articles.json', 'r', encoding='utf-8') as f:
-        articles = json.load(f)
-    results = analyze_sentiment(articles)
-    # Save results to a new file
-    with open('articles_with_sentiment.json', 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"Analyzed sentiment for {len(results)} articles. Results saved to articles_with_sentiment.json.")
+    import argparse
+    from article_store import PartitionedArticleStore, LATEST_ARTICLES_DIR, ANALYZED_ARTICLES_DIR
+    parser = argparse.ArgumentParser(description='Score sentiment of crawled articles.')
+    parser.add_argument('input', nargs='?', default=LATEST_ARTICLES_DIR,
+                        help='JSON file or partition directory to read')
+    parser.add_argument('output', nargs='?', default=ANALYZED_ARTICLES_DIR,
+                        help='JSON file or partition directory to write')
+    parser.add_argument('--scorer', choices=sorted(SCORERS), default='textblob')
+    parser.add_argument('--engine', choices=['auto', 'serial', 'parallel'], default='auto')
+    parser.add_argument('--agreement', action='store_true',
+                        help=f'compare TextBlob and lexicon labels on the input (default {ANALYZED_ARTICLES_DIR}) and exit')
+    parser.add_argument('--fuzz', type=int, nargs='?', const=3000, metavar='N',
+                        help='compare TextBlob and lexicon polarity on N random sentences (default 3000) and exit; status 1 on any mismatch')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for --fuzz')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+    def read(path):
+        if not path.endswith('.json'):
+            # A partition directory; split the legacy <dir>.json file on first use
+            return PartitionedArticleStore(path, legacy_json=path + '.json').load()
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if args.agreement:
+        input_path = args.input if args.input != LATEST_ARTICLES_DIR else ANALYZED_ARTICLES_DIR
+        agreement_report(read(input_path))
+        raise SystemExit(0)
+    if args.fuzz is not None:
+        input_path = args.input if args.input != LATEST_ARTICLES_DIR else ANALYZED_ARTICLES_DIR
+        raise SystemExit(1 if fuzz_report(read(input_path), args.fuzz, args.seed) else 0)
+    # Load the crawled articles (all stored days of a partition directory)
+    articles = read(args.input)
+    results = analyze_sentiment(articles, scorer=args.scorer, engine=args.engine, workers=args.workers, use_cache=not args.no_cache)
+    # Save results next to the analyzed articles
+    if args.output.endswith('.json'):
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        PartitionedArticleStore(args.output).save(results)
+    print(f"Analyzed sentiment for {len(results)} articles. Results saved to {args.output}.")
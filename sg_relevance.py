@@ -0,0 +1,223 @@
+"""
+sg_relevance.py
+Local Singapore-relevance classifier, run before Gemini. Every gazetteer place,
+a list of Singapore agencies and terms, and a list of foreign countries and
+cities are compiled into one Aho-Corasick automaton over word tokens, so an
+article is scanned once for all of them.
+Matches are combined into a score: 1.0 means certainly about Singapore, 0.0
+certainly not, 0.5 no evidence either way. Only articles in between the two
+thresholds (see classify) still need Gemini to decide.
+"""
+
+import re
+import threading
+from collections import deque
+
+# Score at or above which an article is Singapore-related without asking Gemini
+SG_RELATED_SCORE = 0.9
+# Score at or below which an article is unrelated and is not sent to Gemini
+SG_UNRELATED_SCORE = 0.15
+
+# (weight, names): how sure a single mention makes us. Matching ignores case.
+SG_TERMS = [
+    (0.95, ['singapore', 'singaporean', 'singaporeans', "s'pore", "s'porean", "s'poreans",
+            'singlish', 'national day parade', 'housing and development board',
+            'central provident fund', 'land transport authority', 'urban redevelopment authority',
+            'national environment agency', 'national parks board', 'nparks', 'mindef',
+            'medisave', 'medishield', 'singpass', 'mediacorp', 'straits times']),
+    (0.8, ['hdb flat', 'hdb flats', 'void deck', 'hawker centre', 'hawker centres', 'kopitiam',
+           'comcare', 'cdc vouchers', 'gst vouchers', 'gstv', 'pioneer generation', 'merdeka generation',
+           'smrt', 'sbs transit', 'national service', 'nsf', 'nsmen', 'psle', 'temasek', 'gic',
+           'causeway', 'sentosa', 'jurong', 'changi', 'punggol', 'tampines', 'woodlands']),
+    # Office holders and public figures
+    (0.8, ['lawrence wong', 'lee hsien loong', 'lee kuan yew', 'tharman shanmugaratnam', 'gan kim yong',
+           'shanmugam', 'vivian balakrishnan', 'ong ye kung', 'chan chun sing', 'indranee rajah', 'indranee',
+           'faishal ibrahim', 'desmond lee', 'josephine teo', 'grace fu', 'edwin tong', 'pritam singh']),
+]
+# Agency acronyms, matched case-sensitively ('PUB' but not 'pub')
+SG_ACRONYMS = [
+    (0.8, ['HDB', 'CPF', 'LTA', 'URA', 'NEA', 'PUB', 'IRAS', 'SPF', 'SCDF', 'MOH', 'MOE', 'MOM',
+           'MHA', 'MFA', 'MND', 'MTI', 'MSF', 'MCCY', 'MDDI', 'CPIB', 'CAAS', 'JTC', 'EDB', 'IMDA',
+           'ICA', 'AGC', 'NUS', 'NTU', 'SMU', 'SUTD', 'SUSS', 'PAP', 'NDP', 'BTO', 'COE', 'ERP',
+           'TTSH', 'SGH', 'KKH', 'NUH', 'CNA']),
+]
+# Gazetteer places: names of several words rarely mean anything else, single
+# words ('Orchard', 'Newton', 'Jewel') often do
+SG_PLACE_WEIGHT = 0.9
+SG_PLACE_SINGLE_WORD_WEIGHT = 0.6
+FOREIGN_TERMS = [
+    (0.6, ['malaysia', 'malaysian', 'indonesia', 'indonesian', 'thailand', 'thai', 'vietnam',
+           'philippines', 'myanmar', 'cambodia', 'laos', 'brunei', 'china', 'chinese government',
+           'hong kong', 'taiwan', 'japan', 'japanese', 'south korea', 'north korea', 'india', 'indian government',
+           'pakistan', 'bangladesh', 'sri lanka', 'australia', 'new zealand', 'united states', 'america',
+           'canada', 'mexico', 'brazil', 'argentina', 'britain', 'united kingdom', 'england', 'france',
+           'germany', 'italy', 'spain', 'netherlands', 'switzerland', 'sweden', 'norway', 'russia',
+           'ukraine', 'turkey', 'iran', 'iraq', 'israel', 'gaza', 'saudi arabia', 'qatar',
+           'united arab emirates', 'egypt', 'nigeria', 'south africa', 'european union', 'opec',
+           'kuala lumpur', 'johor bahru', 'jakarta', 'bangkok', 'manila', 'hanoi', 'beijing', 'shanghai',
+           'shenzhen', 'tokyo', 'osaka', 'seoul', 'taipei', 'mumbai', 'new delhi', 'sydney', 'melbourne',
+           'london', 'paris', 'berlin', 'washington', 'new york', 'california', 'wall street', 'moscow',
+           'dubai', 'white house', 'kremlin', 'nasdaq', 'nikkei']),
+]
+FOREIGN_ACRONYMS = [(0.6, ['US', 'UK', 'EU', 'UAE'])]
+
+TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)?")
+
+def tokenize(text):
+    """Word tokens of the text, with curly apostrophes straightened and a possessive 's dropped."""
+    tokens = TOKEN_PATTERN.findall(text.replace('’', "'"))
+    return [token[:-2] if token.endswith("'s") and len(token) > 2 else token for token in tokens]
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over word tokens: finds every occurrence of every
+    phrase in one pass over the text. Overlapping matches are resolved
+    leftmost-longest, so 'Little India' is not also counted as 'India'.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self.phrases = []
+
+    def add(self, phrase, value):
+        """Add a phrase (a sequence of tokens) yielding `value` when found; the first value added wins."""
+        state = 0
+        for token in phrase:
+            if token not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][token] = len(self._goto) - 1
+            state = self._goto[state][token]
+        if not self._out[state]:
+            self._out[state].append(len(self.phrases))
+            self.phrases.append((len(phrase), value))
+
+    def build(self):
+        """Compute the failure links; call once after the last add()."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                # A phrase ending here may also end a shorter phrase (its suffix)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        return self
+
+    def find(self, tokens):
+        """Return [(start, end, value)] of non-overlapping matches, leftmost-longest."""
+        goto, fail, out, phrases = self._goto, self._fail, self._out, self.phrases
+        found = []
+        state = 0
+        for end, token in enumerate(tokens, 1):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for phrase_id in out[state]:
+                length, value = phrases[phrase_id]
+                found.append((end - length, end, value))
+        found.sort(key=lambda match: (match[0], match[0] - match[1]))
+        matches = []
+        last_end = 0
+        for start, end, value in found:
+            if start >= last_end:
+                matches.append((start, end, value))
+                last_end = end
+        return matches
+
+def combine(weights):
+    """Noisy-or: the chance that at least one of the independent pieces of evidence is right."""
+    remaining = 1.0
+    for weight in weights:
+        remaining *= 1.0 - weight
+    return 1.0 - remaining
+
+class RelevanceClassifier:
+    """
+    Scores articles for Singapore relevance from the entities they mention.
+    Each distinct entity counts once; Singapore evidence and foreign evidence
+    are each combined by noisy-or, and foreign mentions only pull the score
+    down as far as there is no Singapore evidence.
+    """
+
+    def __init__(self, places=(), related_score=SG_RELATED_SCORE, unrelated_score=SG_UNRELATED_SCORE):
+        self.related_score = related_score
+        self.unrelated_score = unrelated_score
+        self.counts = {'related': 0, 'unrelated': 0, 'ambiguous': 0}
+        self._lock = threading.Lock()
+        self._words = PhraseMatcher()
+        self._acronyms = PhraseMatcher()
+        for weight, names in SG_TERMS:
+            self._add(self._words, names, 'sg', weight)
+        for weight, names in SG_ACRONYMS:
+            self._add(self._acronyms, names, 'sg', weight, case_sensitive=True)
+        for place in places:
+            for name in [place['name'], *place.get('aliases', [])]:
+                tokens = tokenize(name.lower())
+                if tokens and tokens != ['singapore']:
+                    weight = SG_PLACE_WEIGHT if len(tokens) > 1 else SG_PLACE_SINGLE_WORD_WEIGHT
+                    self._words.add(tuple(tokens), ('sg', weight, place['name']))
+        for weight, names in FOREIGN_TERMS:
+            self._add(self._words, names, 'foreign', weight)
+        for weight, names in FOREIGN_ACRONYMS:
+            self._add(self._acronyms, names, 'foreign', weight, case_sensitive=True)
+        self._words.build()
+        self._acronyms.build()
+
+    @staticmethod
+    def _add(matcher, names, kind, weight, case_sensitive=False):
+        for name in names:
+            matcher.add(tuple(tokenize(name if case_sensitive else name.lower())), (kind, weight, name))
+
+    def score(self, text):
+        """Return (score, {entity name: 'sg' or 'foreign'}) for a piece of text."""
+        tokens = tokenize(text)
+        entities = {}
+        for matcher, words in ((self._words, [token.lower() for token in tokens]), (self._acronyms, tokens)):
+            for _, _, (kind, weight, name) in matcher.find(words):
+                entities[name] = (kind, weight)
+        sg = combine(weight for kind, weight in entities.values() if kind == 'sg')
+        foreign = combine(weight for kind, weight in entities.values() if kind == 'foreign')
+        score = 0.5 + 0.5 * sg - 0.5 * foreign * (1.0 - sg)
+        return score, {name: kind for name, (kind, _) in entities.items()}
+
+    def classify(self, article):
+        """
+        Return (label, score, entities) for an article: label is 'related' at
+        or above related_score, 'unrelated' at or below unrelated_score, and
+        'ambiguous' otherwise. A 'Singapore'/'local' category counts as certain
+        Singapore evidence. The `location` field is not evidence: the crawler
+        sets it to the outlet's location, 'Singapore', on every article.
+        """
+        category = article.get('category') if isinstance(article.get('category'), str) else ''
+        if 'singapore' in category.lower() or 'local' in category.lower():
+            label, score, entities = 'related', 1.0, {}
+        else:
+            score, entities = self.score(f"{article.get('title') or ''}\n{article.get('content') or ''}")
+            if score >= self.related_score:
+                label = 'related'
+            elif score <= self.unrelated_score:
+                label = 'unrelated'
+            else:
+                label = 'ambiguous'
+        with self._lock:
+            self.counts[label] += 1
+        return label, round(score, 3), entities
+
+_default_classifier = None
+_default_classifier_lock = threading.Lock()
+
+def get_relevance_classifier():
+    """Return the process-wide classifier over the bundled gazetteer, building it on first use."""
+    global _default_classifier
+    with _default_classifier_lock:
+        if _default_classifier is None:
+            from gazetteer import get_gazetteer
+            _default_classifier = RelevanceClassifier(get_gazetteer().places)
+    return _default_classifier
@@ -0,0 +1,14 @@
+"""
+sqlite_util.py
+Connection setup shared by the SQLite caches (geocodes, Gemini results,
+article bodies, sentiment scores).
+"""
+
+import sqlite3
+
+def connect_sqlite(path):
+    """Open a SQLite database shared between threads and processes (WAL, busy timeout)."""
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
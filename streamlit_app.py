@@ -1,9 +1,15 @@
 import streamlit as st
 import subprocess
+import threading
 import time
+import sys
 import os
 from streamlit.components.v1 import html
+from streamlit_autorefresh import st_autorefresh
 from datetime import datetime
+from pipeline_lock import PipelineLock, last_success
+from progress import PROGRESS_ENV, ProgressState, read_progress
+from pipeline_worker import request_run, request_worker, WORKER_LOG_FILE, WORKER_PROGRESS_FILE
 
 # Set Streamlit page config
 def set_page_config():
@@ -24,9 +30,8 @@ This app visualizes the latest sentiment of Singapore news articles on an intera
 **How to use this app:**
 - The map below shows the latest sentiment analysis of Singapore news articles.
 - Click on the emoji on the map to view the news details.
-- The data and map refresh every time you open or refresh the page.
-- When the data is being updated, a progress bar and log output will be shown.
-- Once the update is complete, the map will be displayed in wide screen.
+- The last available map is shown immediately. If its data is older than the refresh threshold, an update starts in the background.
+- While the data is being updated, the page checks for the new map every few seconds and shows it as soon as it is ready.
 """)
 
 st.markdown(
@@ -39,46 +44,162 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-LOG_FILE = "pipeline_log.txt"
+# The same files the pipeline worker writes to
+LOG_FILE = WORKER_LOG_FILE
+PROGRESS_FILE = WORKER_PROGRESS_FILE
+# Only the end of the log is shown: at most this many lines, read from at most this many bytes
+LOG_TAIL_LINES = 40
+LOG_TAIL_BYTES = 16 * 1024
 MAP_FILE = "singapore_news_sentiment_map.html"
+MAP_DATA_FILE = "singapore_news_sentiment_map.json"
 PIPELINE_SCRIPT = "run_pipeline.py"
+WORKER_SCRIPT = "pipeline_worker.py"
+# Run refreshes in a warm, long-lived worker process (started on demand); 0 = fresh process per refresh
+USE_WORKER = os.environ.get("PIPELINE_WORKER", "1") != "0"
+# Data older than this (seconds) triggers a background refresh
+STALE_AFTER = int(os.environ.get("MAP_STALE_AFTER", 30 * 60))
+# Do not start another refresh sooner than this after the previous start (e.g. if it failed)
+RETRY_AFTER = int(os.environ.get("MAP_RETRY_AFTER", 5 * 60))
+# How often (ms) a page polls for the new map while a refresh is running
+REFRESH_POLL_MS = 2000
 
-# Function to run pipeline and capture output
-def run_pipeline_with_progress():
-    progress = st.progress(0)
-    log_box = st.empty()
-    logs = []
-    process = subprocess.Popen(
-        ["python", PIPELINE_SCRIPT],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
+@st.cache_resource
+def refresh_state():
+    """State shared by every session in this server process."""
+    return {"lock": threading.Lock(), "process": None, "worker": None, "worker_run": False, "started_at": 0.0}
+
+def refresh_running():
+    """True while a pipeline run (from this or any other process) holds the pipeline lock."""
+    state = refresh_state()
+    process = state["process"]
+    if process is not None and process.poll() is None:
+        return True
+    if state["worker_run"]:
+        reply = request_worker({"cmd": "status"})
+        if reply and reply.get("busy"):
+            return True
+    return PipelineLock().is_locked()
+
+def start_background_refresh():
+    """
+    Start a pipeline run in the background unless one is already in progress.
+    The run goes to the warm pipeline worker when one is listening; otherwise
+    run_pipeline.py is started as a fresh process (and a worker is started for
+    the next refresh). Sessions of this server start at most one run, and the
+    pipeline itself holds a cross-process lock, so a second server or the
+    scheduler cannot overlap with it either. Output goes to LOG_FILE and
+    progress events to PROGRESS_FILE.
+    """
+    state = refresh_state()
+    with state["lock"]:
+        if refresh_running() or time.time() - state["started_at"] < RETRY_AFTER:
+            return False
+        open(PROGRESS_FILE, "w").close()
+        state["started_at"] = time.time()
+        state["worker_run"] = False
+        if USE_WORKER:
+            outcome = request_run()
+            if outcome is not None:
+                state["worker_run"] = True
+                return outcome == "started"
+            start_worker()
+        env = {**os.environ, PROGRESS_ENV: os.path.abspath(PROGRESS_FILE), "PYTHONUNBUFFERED": "1"}
+        with open(LOG_FILE, "w", encoding="utf-8") as log:
+            state["process"] = subprocess.Popen(
+                [sys.executable, PIPELINE_SCRIPT],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                env=env,
+            )
+        return True
+
+def start_worker():
+    """Start the long-lived pipeline worker, once per server process."""
+    state = refresh_state()
+    worker = state["worker"]
+    if worker is not None and worker.poll() is None:
+        return
+    state["worker"] = subprocess.Popen(
+        [sys.executable, WORKER_SCRIPT],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
     )
-    total_steps = 100  # Dummy steps for progress bar
-    step = 0
-    for line in process.stdout:
-        logs.append(line)
-        log_box.text_area("Pipeline Output", value="".join(logs), height=300)
-        step = min(step + 1, total_steps)
-        progress.progress(step / total_steps)
-    process.wait()
-    progress.progress(1.0)
-    return logs
+
+def read_log_tail(path=LOG_FILE, lines=LOG_TAIL_LINES, max_bytes=LOG_TAIL_BYTES):
+    """Last `lines` lines of the log, reading only its last `max_bytes` bytes."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            tail = f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+    return "\n".join(tail.splitlines()[-lines:])
+
+def show_progress():
+    """
+    Progress bar and log tail of the running refresh. Each rerun reads only the
+    progress events appended since the previous one (offset kept per session).
+    """
+    try:
+        size = os.path.getsize(PROGRESS_FILE)
+    except OSError:
+        size = 0
+    # A new run truncates the progress file: start folding events afresh
+    if "progress_offset" not in st.session_state or size < st.session_state.progress_offset:
+        st.session_state.progress_offset = 0
+        st.session_state.progress_state = ProgressState()
+    events, st.session_state.progress_offset = read_progress(PROGRESS_FILE, st.session_state.progress_offset)
+    state = st.session_state.progress_state
+    for event in events:
+        state.apply(event)
+    st.progress(state.fraction(), text=state.describe())
+    st.code(read_log_tail() or "Waiting for output...", language=None)
+
+def data_age():
+    """Seconds since the last completed pipeline run (map file age as a fallback), or None."""
+    finished = last_success()
+    if finished is None and os.path.exists(MAP_FILE):
+        finished = os.path.getmtime(MAP_FILE)
+    return None if finished is None else time.time() - finished
+
+@st.cache_data(max_entries=4)
+def load_map_html(map_mtime, data_mtime):
+    """Read the map (keyed by file mtimes, so a new map is picked up as soon as it lands)."""
+    with open(MAP_FILE, "r", encoding="utf-8") as f:
+        map_html = f.read()
+    # A map shell fetches its data file, which the embedded component cannot reach: inline it
+    if '<meta name="sg-map-shell"' in map_html and data_mtime:
+        with open(MAP_DATA_FILE, "r", encoding="utf-8") as f:
+            data = f.read().replace("</", "<\\/")
+        map_html = map_html.replace("<head>", f"<head><script>window.SG_MAP_DATA = {data};</script>", 1)
+    return map_html
 
 def show_map():
-    st.empty()
     if os.path.exists(MAP_FILE):
-        with open(MAP_FILE, "r", encoding="utf-8") as f:
-            map_html = f.read()
-        html(map_html, height=800, width=None)
-    else:
-        st.error(f"Map file {MAP_FILE} not found.")
+        data_mtime = os.path.getmtime(MAP_DATA_FILE) if os.path.exists(MAP_DATA_FILE) else 0
+        html(load_map_html(os.path.getmtime(MAP_FILE), data_mtime), height=800, width=None)
+        return True
+    return False
 
 def main():
-    st.info("Updating data, please wait...")
-    run_pipeline_with_progress()
-    show_map()
+    age = data_age()
+    if age is None or age > STALE_AFTER:
+        start_background_refresh()
+    if refresh_running():
+        st.info("Updating data in the background; the map below will be replaced when the update is complete.")
+        show_progress()
+        # Rerun periodically so this session picks up the new map
+        st_autorefresh(interval=REFRESH_POLL_MS, key="map_refresh")
+    elif age is not None:
+        updated = datetime.fromtimestamp(time.time() - age).strftime("%d-%m-%Y %I:%M %p")
+        st.caption(f"Data last updated {updated}.")
+    if not show_map():
+        if refresh_running():
+            st.warning("No map is available yet; it will appear here once the first update is complete.")
+        else:
+            st.error(f"Map file {MAP_FILE} not found.")
 
 if __name__ == "__main__":
     main()